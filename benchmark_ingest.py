@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+取り込みベンチマーク
+statsapi_stub.py の代替サーバー（合成データ）に対して取り込み処理を実行し、
+リクエスト/秒と取り込み全体の所要時間を計測する（本番APIには接続しない）
+
+  python3 benchmark_ingest.py                                   # プロセス内で代替サーバーを起動
+  python3 benchmark_ingest.py --latency 80 --error-rate 0.02    # 遅延・エラーを注入
+  python3 benchmark_ingest.py --server http://127.0.0.1:8089/api/v1   # 別プロセスのサーバーを使う
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fetch_player_stats import PlayerStatsFetcher
+from game_log_ingest import ingest_game_logs
+from metrics import STATSAPI_RETRIES
+from statsapi_client import StatsApiClient
+from statsapi_stub import StubConfig, start_server
+
+FIRST_PLAYER_ID = 600000
+
+
+def _client(base_url, cache_dir):
+    # 代替サーバーの処理能力を測るのでレート制限はかけない
+    return StatsApiClient(base_url=base_url, cache_dir=cache_dir, rate_limit=0)
+
+
+def _retries():
+    return STATSAPI_RETRIES.total()
+
+
+def percentile(sorted_values, pct):
+    """ソート済みリストのパーセンタイル（最近傍順位法）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100.0 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def bench_throughput(base_url, requests_count, concurrency, season):
+    """単発のgameLogリクエストを並行に送ってリクエスト/秒を計測"""
+    client = _client(base_url, None)
+    params = {'stats': 'gameLog', 'group': 'hitting', 'season': str(season), 'sportIds': '1'}
+
+    def send(index):
+        started = time.perf_counter()
+        client.get_json(f"people/{FIRST_PLAYER_ID + index % 50}/stats", params=params)
+        return time.perf_counter() - started
+
+    retries_before = _retries()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(send, range(requests_count)))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': requests_count,
+        'seconds': elapsed,
+        'requests_per_second': requests_count / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'retries': _retries() - retries_before,
+        'connections': client.connection_stats(),
+    }
+
+
+def bench_bulk_stats(base_url, players, seasons):
+    """複数選手・複数シーズンの一括取得（fetch_player_stats）"""
+    client = _client(base_url, None)
+    fetcher = PlayerStatsFetcher(client=client)
+    started = time.perf_counter()
+    frames = fetcher.fetch_season_stats(range(FIRST_PLAYER_ID, FIRST_PLAYER_ID + players), seasons)
+    elapsed = time.perf_counter() - started
+    return {
+        'players': players,
+        'seasons': len(seasons),
+        'rows': sum(len(df) for df in frames.values()),
+        'seconds': elapsed,
+        'requests': client.connection_stats()['requests'],
+    }
+
+
+def bench_game_log_ingest(base_url, players, season, work_dir, cache_dir):
+    """選手ごとのゲームログ取り込み（初回の全件取得と2回目の差分取得）"""
+    client = _client(base_url, cache_dir)
+    state_path = os.path.join(work_dir, 'game_log_state.json')
+
+    def ingest(player_id):
+        csv_path = os.path.join(work_dir, f"gamelog_{player_id}_{season}.csv")
+        # 作業ディレクトリの外（data/parquet・成績DB）には書き出さない
+        return ingest_game_logs(csv_path, player_id, season, 'hitting', client=client, state_path=state_path,
+                                publish=False)
+
+    results = {}
+    for phase in ('full', 'incremental'):
+        requests_before = client.connection_stats()['requests']
+        started = time.perf_counter()
+        # 状態ファイルを共有するので選手ごとに順に取り込む
+        games = sum(ingest(player_id) for player_id in range(FIRST_PLAYER_ID, FIRST_PLAYER_ID + players))
+        elapsed = time.perf_counter() - started
+        results[phase] = {
+            'games': games,
+            'seconds': elapsed,
+            'requests': client.connection_stats()['requests'] - requests_before,
+        }
+    return results
+
+
+def print_report(report):
+    """計測結果を表示"""
+    throughput = report['throughput']
+    print(f"\n📊 取り込みベンチマーク結果（サーバー: {report['base_url']}）")
+    print(f"単発リクエスト: {throughput['requests']}件 / {throughput['seconds']:.2f}秒 "
+          f"= {throughput['requests_per_second']:.1f} req/s（p50 {throughput['p50_ms']:.1f}ms, "
+          f"p95 {throughput['p95_ms']:.1f}ms, リトライ{throughput['retries']}回, "
+          f"新規接続{throughput['connections']['connections']}）")
+    bulk = report['bulk_stats']
+    print(f"一括成績取得: {bulk['players']}選手 × {bulk['seasons']}シーズン → {bulk['rows']}行 / "
+          f"{bulk['requests']}リクエスト / {bulk['seconds']:.2f}秒")
+    for phase, result in report['game_log_ingest'].items():
+        print(f"ゲームログ取り込み（{phase}）: {result['games']}試合 / {result['requests']}リクエスト / "
+              f"{result['seconds']:.2f}秒")
+
+
+def main():
+    """メイン実行関数"""
+    parser = argparse.ArgumentParser(description='statsapi代替サーバーに対する取り込みベンチマーク')
+    parser.add_argument('--server', help='起動済みの代替サーバーのベースURL（省略時はプロセス内で起動）')
+    parser.add_argument('--latency', type=float, default=20.0, help='応答ごとの遅延（ミリ秒）')
+    parser.add_argument('--jitter', type=float, default=10.0, help='遅延のランダム幅（ミリ秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='エラーを返す割合（0〜1）')
+    parser.add_argument('--requests', type=int, default=500, help='単発リクエストの件数')
+    parser.add_argument('--concurrency', type=int, default=8, help='単発リクエストの同時実行数')
+    parser.add_argument('--players', type=int, default=50, help='選手数')
+    parser.add_argument('--seasons', nargs='+', type=int, default=[2022, 2023, 2024, 2025])
+    parser.add_argument('--cache', action='store_true', help='ディスクキャッシュを有効にする')
+    parser.add_argument('--json', dest='json_path', help='結果をJSONで保存するパス')
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.server
+    if base_url is None:
+        config = StubConfig(synthetic=True, latency=args.latency / 1000, jitter=args.jitter / 1000,
+                            error_rate=args.error_rate, seed=0)
+        server, base_url = start_server(config)
+        print(f"🧪 statsapi代替サーバーを起動しました: {base_url}")
+
+    work_dir = tempfile.mkdtemp(prefix='benchmark_ingest_')
+    cache_dir = os.path.join(work_dir, 'cache') if args.cache else None
+    try:
+        report = {
+            'base_url': base_url,
+            'throughput': bench_throughput(base_url, args.requests, args.concurrency, args.seasons[-1]),
+            'bulk_stats': bench_bulk_stats(base_url, args.players, args.seasons),
+            'game_log_ingest': bench_game_log_ingest(base_url, min(args.players, 10), args.seasons[-1],
+                                                     work_dir, cache_dir),
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if server is not None:
+            server.shutdown()
+
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 結果を保存しました: {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
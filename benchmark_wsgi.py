@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+WSGI負荷ベンチマーク
+ネットワークを介さずにプロセス内でFlaskアプリ（test_app.app）を直接呼び出し、
+ルートごとのスループット・レイテンシ（p50/p95/p99）・RSSの増分とピーク、ワーカーごとのRSSを計測する
+
+ルートごとのRSSは、そのルートを計測している間（フェーズ）の前後とピークをサンプリングした値。
+--replay ではルートが混ざった1フェーズになるので、RSSはリクエスト構成全体の値になる。
+
+使い方:
+  python benchmark_wsgi.py                                 # 主要ルートを計測
+  python benchmark_wsgi.py --workers 4 --concurrency 8     # gunicornのワーカー数・同時接続数を想定
+  python benchmark_wsgi.py --replay access.log             # 本番のリクエスト構成を再生
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import re
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.test import EnvironBuilder
+
+# 計測対象のデフォルトルート（SSEのようなストリーミングは除く）
+DEFAULT_ROUTES = [
+    '/',
+    '/home-run-comparison',
+    '/api/v1/season-summary',
+    '/api/v1/home-runs/weekly',
+    '/api/v1/prediction',
+    '/api/v1/home-runs/figure',
+    '/api/status',
+]
+
+# フェーズ中にRSSをサンプリングする間隔（秒）
+RSS_SAMPLE_INTERVAL = 0.01
+
+# gunicorn/nginxのアクセスログ中のリクエスト行
+ACCESS_LOG_PATTERN = re.compile(r'"(GET|HEAD|POST|PUT|DELETE) (\S+) HTTP/[\d.]+"')
+
+
+def current_rss_kb():
+    """現在のRSS（KB）。/procが無い環境では最大RSSで代用"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOSはバイト単位
+    return maxrss // 1024 if sys.platform == 'darwin' else maxrss
+
+
+def percentile(sorted_values, pct):
+    """ソート済みリストのパーセンタイル（最近傍順位法）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100.0 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def load_replay_requests(path):
+    """記録済みリクエストを読み込み
+
+    JSON Lines（{"method": "GET", "path": "/", "headers": {...}}）または
+    アクセスログ形式（"GET /path HTTP/1.1" を含む行）に対応する。
+    """
+    replay = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                record = json.loads(line)
+                replay.append((record.get('method', 'GET'), record['path'], record.get('headers', {})))
+                continue
+            match = ACCESS_LOG_PATTERN.search(line)
+            if match:
+                replay.append((match.group(1), match.group(2), {}))
+    return replay
+
+
+def call_wsgi(app, method, path, headers):
+    """WSGIアプリを1回呼び出して (ステータスコード, 本文バイト数) を返す"""
+    environ = EnvironBuilder(path=path, method=method, headers=headers).get_environ()
+    status_holder = []
+
+    def start_response(status, response_headers, exc_info=None):
+        status_holder.append(status)
+        return lambda data: None
+
+    body_size = 0
+    app_iter = app(environ, start_response)
+    try:
+        for chunk in app_iter:
+            body_size += len(chunk)
+    finally:
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
+    return int(status_holder[0].split(' ', 1)[0]), body_size
+
+
+class RssSampler:
+    """withブロックの前後とその間のピークのRSS（KB）を計測する"""
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.before = self.after = self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_kb())
+
+    def __enter__(self):
+        self.before = self.peak = current_rss_kb()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.after = current_rss_kb()
+        self.peak = max(self.peak, self.after)
+        return False
+
+    def to_dict(self):
+        return {'before_kb': self.before, 'after_kb': self.after, 'peak_kb': self.peak}
+
+
+def run_worker(phases, concurrency, headers, warmup, result_queue=None):
+    """1ワーカー分の負荷をかけて計測結果を返す（gunicornのワーカー1つに相当）
+
+    phasesは [(フェーズ名, [(メソッド, パス, ヘッダー), ...]), ...]。
+    フェーズごとにconcurrency本のスレッドで送信し、経過時間を計測する。
+    """
+    from test_app import app
+
+    # キャッシュの初回構築は計測から除く
+    warmup_paths = sorted({path for _, requests_to_send in phases
+                           for method, path, _ in requests_to_send if method == 'GET'})
+    for path in warmup_paths:
+        for _ in range(warmup):
+            call_wsgi(app, 'GET', path, headers)
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    route_phase = {}
+    phase_times = {}
+    phase_rss = {}
+    lock = threading.Lock()
+
+    def send(request):
+        method, path, request_headers = request
+        started = time.perf_counter()
+        status, _ = call_wsgi(app, method, path, dict(headers, **request_headers))
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies[path].append(elapsed)
+            if status >= 500:
+                errors[path] += 1
+
+    for phase_name, requests_to_send in phases:
+        for _, path, _ in requests_to_send:
+            route_phase[path] = phase_name
+        with RssSampler() as rss:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(send, requests_to_send))
+            phase_times[phase_name] = time.perf_counter() - started
+        phase_rss[phase_name] = rss.to_dict()
+
+    result = {
+        'phase_times': phase_times,
+        'phase_rss': phase_rss,
+        'route_phase': route_phase,
+        'latencies': dict(latencies),
+        'errors': dict(errors),
+        'rss_kb': current_rss_kb(),
+    }
+    if result_queue is not None:
+        result_queue.put(result)
+    return result
+
+
+def summarize(results):
+    """ワーカーの結果をルートごとに集計（ワーカーは並列に動くので経過時間は最大値を使う）"""
+    phase_times = defaultdict(float)
+    phase_rss = defaultdict(lambda: {'delta_kb': 0, 'peak_kb': 0})
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    route_phase = {}
+    for result in results:
+        for phase_name, elapsed in result['phase_times'].items():
+            phase_times[phase_name] = max(phase_times[phase_name], elapsed)
+        # RSSはワーカーの中で最も大きかった値
+        for phase_name, rss in result['phase_rss'].items():
+            phase_rss[phase_name]['delta_kb'] = max(phase_rss[phase_name]['delta_kb'],
+                                                    rss['after_kb'] - rss['before_kb'])
+            phase_rss[phase_name]['peak_kb'] = max(phase_rss[phase_name]['peak_kb'], rss['peak_kb'])
+        for path, values in result['latencies'].items():
+            latencies[path].extend(values)
+        for path, count in result['errors'].items():
+            errors[path] += count
+        route_phase.update(result['route_phase'])
+
+    routes = {}
+    for path in sorted(latencies):
+        values = sorted(latencies[path])
+        phase_time = phase_times[route_phase[path]]
+        routes[path] = {
+            'requests': len(values),
+            'errors': errors.get(path, 0),
+            'throughput_rps': len(values) / phase_time if phase_time else 0.0,
+            'p50_ms': percentile(values, 50) * 1000,
+            'p95_ms': percentile(values, 95) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+            'rss_delta_kb': phase_rss[route_phase[path]]['delta_kb'],
+            'rss_peak_kb': phase_rss[route_phase[path]]['peak_kb'],
+        }
+
+    wall_time = sum(phase_times.values())
+    total_requests = sum(route['requests'] for route in routes.values())
+    return {
+        'wall_time': wall_time,
+        'total_requests': total_requests,
+        'overall_rps': total_requests / wall_time if wall_time else 0.0,
+        'routes': routes,
+        'worker_rss_kb': [r['rss_kb'] for r in results],
+    }
+
+
+def print_report(summary):
+    """計測結果を表示"""
+    print(f"\n📊 WSGIベンチマーク結果（{summary['total_requests']}リクエスト / {summary['wall_time']:.2f}秒）")
+    print(f"全体スループット: {summary['overall_rps']:.1f} req/s")
+    print(f"\n{'ルート':<32}{'件数':>8}{'エラー':>8}{'req/s':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'RSS増(MB)':>11}{'RSSピーク(MB)':>13}")
+    for path, route in summary['routes'].items():
+        print(f"{path:<32}{route['requests']:>8}{route['errors']:>8}{route['throughput_rps']:>10.1f}"
+              f"{route['p50_ms']:>10.2f}{route['p95_ms']:>10.2f}{route['p99_ms']:>10.2f}"
+              f"{route['rss_delta_kb'] / 1024:>11.1f}{route['rss_peak_kb'] / 1024:>13.1f}")
+    print("\nワーカーごとのRSS:")
+    for i, rss_kb in enumerate(summary['worker_rss_kb']):
+        print(f"  worker {i}: {rss_kb / 1024:.1f}MB")
+
+
+def main():
+    """メイン実行関数"""
+    parser = argparse.ArgumentParser(description='Flaskアプリのプロセス内WSGI負荷ベンチマーク')
+    parser.add_argument('--routes', nargs='+', default=DEFAULT_ROUTES, help='計測するルート')
+    parser.add_argument('--requests', type=int, default=500, help='ワーカーごと・ルートごとのリクエスト数')
+    parser.add_argument('--concurrency', type=int, default=4, help='ワーカーごとの同時実行スレッド数')
+    parser.add_argument('--workers', type=int, default=1, help='ワーカープロセス数')
+    parser.add_argument('--warmup', type=int, default=3, help='計測前にルートごとに送るリクエスト数')
+    parser.add_argument('--accept-encoding', default='gzip, br', help='送信するAccept-Encoding')
+    parser.add_argument('--replay', help='記録済みリクエスト（JSON Linesまたはアクセスログ）を再生')
+    parser.add_argument('--json', dest='json_path', help='結果をJSONで保存するパス')
+    args = parser.parse_args()
+
+    if args.replay:
+        # 記録された順序・構成のまま1フェーズで再生する
+        replay = load_replay_requests(args.replay)
+        print(f"🔁 {args.replay} から {len(replay)}件のリクエストを再生します")
+        phases = [('replay', replay)] if replay else []
+    else:
+        # ルートごとに別フェーズで計測する
+        phases = [(path, [('GET', path, {})] * args.requests) for path in args.routes]
+    if not phases:
+        print("❌ 送信するリクエストがありません")
+        sys.exit(1)
+
+    headers = {'Accept-Encoding': args.accept_encoding} if args.accept_encoding else {}
+    print(f"🏁 {args.workers}ワーカー × {args.concurrency}スレッドで計測中...")
+
+    if args.workers == 1:
+        results = [run_worker(phases, args.concurrency, headers, args.warmup)]
+    else:
+        # 各ワーカーが独立したプロセスでアプリを読み込み、RSSを個別に計測する
+        result_queue = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=run_worker,
+                                    args=(phases, args.concurrency, headers, args.warmup, result_queue))
+            for _ in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        results = [result_queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    summary = summarize(results)
+    print_report(summary)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 結果を保存しました: {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
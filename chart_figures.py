@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+ホームラン推移チャートのPlotly図定義
+トレース・レイアウトをサーバー側で組み立て、JSONとしてそのままPlotly.newPlotに渡せる形で返す
+"""
+
+# 実績と予測の境目が分からない場合の週番号
+DEFAULT_CURRENT_WEEK = 23
+
+CHART_TITLE = 'ホームラン累積推移比較 - 2024年 vs 2025年（週番号ベース）'
+
+CHART_CONFIG = {
+    'responsive': True,
+    'displayModeBar': False
+}
+
+
+def _scatter_trace(x, y, name, color, width, marker_size, dash=None):
+    line = {'color': color, 'width': width}
+    if dash:
+        line['dash'] = dash
+    return {
+        'x': list(x),
+        'y': list(y),
+        'type': 'scatter',
+        'mode': 'lines+markers',
+        'line': line,
+        'marker': {'color': color, 'size': marker_size},
+        'name': name
+    }
+
+
+def _layout():
+    return {
+        'title': {
+            'text': CHART_TITLE,
+            'font': {'size': 18, 'color': '#2c3e50'}
+        },
+        'xaxis': {'title': 'シーズン開始からの週数', 'rangemode': 'tozero'},
+        'yaxis': {'title': '累積ホームラン数', 'rangemode': 'tozero'},
+        'plot_bgcolor': 'white',
+        'paper_bgcolor': 'white',
+        'margin': {'l': 60, 'r': 40, 't': 80, 'b': 80},
+        'showlegend': True,
+        'legend': {
+            'x': 0.02,
+            'y': 0.98,
+            'bgcolor': 'rgba(255,255,255,0.8)',
+            'bordercolor': '#ccc',
+            'borderwidth': 1
+        }
+    }
+
+
+def build_comparison_figure(chart_data):
+    """2024年と2025年の週次累積ホームラン比較図（予測なし）"""
+    trace_2024 = _scatter_trace(chart_data['weeks'], chart_data['2024'], '2024年', '#95a5a6', 2, 6, dash='dash')
+    trace_2025 = _scatter_trace(chart_data['weeks'], chart_data['2025'], '2025年', '#e74c3c', 3, 8)
+    return {'data': [trace_2024, trace_2025], 'layout': _layout(), 'config': CHART_CONFIG}
+
+
+def build_prediction_figure(chart_data, prediction_info):
+    """2025年を実績と予測に分けた週次累積ホームラン比較図"""
+    current_week = prediction_info.get('current_week') or DEFAULT_CURRENT_WEEK
+    weeks_2025 = chart_data['weeks']
+    data_2025 = chart_data['2025']
+
+    # 実績データ（現在の週まで）
+    actual_weeks = [w for w in weeks_2025 if w <= current_week]
+    actual_data = data_2025[:len(actual_weeks)]
+
+    # 予測データ（現在の週から最後まで。接続のため実績の最後の点から開始）
+    prediction_weeks = [w for w in weeks_2025 if w >= current_week]
+    prediction_data = data_2025[max(len(actual_weeks) - 1, 0):]
+
+    trace_2024 = _scatter_trace(chart_data['weeks'], chart_data['2024'], '2024年', '#95a5a6', 2, 6, dash='dash')
+    trace_actual = _scatter_trace(actual_weeks, actual_data, '2025年（実績）', '#e74c3c', 3, 8)
+    trace_prediction = _scatter_trace(prediction_weeks, prediction_data, '2025年（予測）', '#3498db', 3, 6, dash='dot')
+    return {'data': [trace_2024, trace_actual, trace_prediction], 'layout': _layout(), 'config': CHART_CONFIG}
@@ -3,37 +3,30 @@ import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import json
-import ast
+
+from chart_figures import build_comparison_figure
+from game_log_store import read_game_logs
+from plotly_assets import bundle_url as plotly_bundle_url
+
+PLAYER_ID = 660271  # 大谷翔平のMLB ID
 
 def create_home_run_progression_by_week():
     """週番号ベースで2024年と2025年のホームラン累積推移データを作成"""
     
     # 2024年のデータを処理
-    df_2024 = pd.read_csv('data/raw/ohtani_batting_gamelogs_2024.csv')
-    df_2024['date'] = pd.to_datetime(df_2024['date'])
-    
-    # stat列からホームラン数を抽出
-    home_runs_2024 = []
-    for stat_str in df_2024['stat']:
-        try:
-            stat_dict = ast.literal_eval(stat_str)
-            home_runs_2024.append(stat_dict.get('homeRuns', 0))
-        except:
-            home_runs_2024.append(0)
-    
-    df_2024['home_runs'] = home_runs_2024
+    df_2024 = read_game_logs('data/raw/ohtani_batting_gamelogs_2024.csv', 'hitting', 2024, PLAYER_ID,
+                             columns=['game_date', 'home_runs'])
     df_2024['cumulative_home_runs'] = df_2024['home_runs'].cumsum()
     
     # 週番号を計算（シーズン開始からの週数）
-    df_2024['week_number'] = ((df_2024['date'] - df_2024['date'].min()).dt.days // 7) + 1
+    df_2024['week_number'] = ((df_2024['game_date'] - df_2024['game_date'].min()).dt.days // 7) + 1
     
     # 週ごとにグループ化して累積ホームラン数を取得
     weekly_2024 = df_2024.groupby('week_number')['cumulative_home_runs'].max().reset_index()
     
     # 2025年のデータを処理
-    df_2025 = pd.read_csv('data/raw/ohtani_batting_api_2025.csv')
-    df_2025['game_date'] = pd.to_datetime(df_2025['game_date'])
-    df_2025['home_runs'] = pd.to_numeric(df_2025['home_runs'], errors='coerce').fillna(0)
+    df_2025 = read_game_logs('data/raw/ohtani_batting_api_2025.csv', 'hitting', 2025, PLAYER_ID,
+                             columns=['game_date', 'home_runs'])
     df_2025['cumulative_home_runs'] = df_2025['home_runs'].cumsum()
     
     # 週番号を計算（シーズン開始からの週数）
@@ -75,6 +68,9 @@ def create_home_run_progression_by_week():
 def create_comparison_chart_html(csv_data, chart_data):
     """週番号ベースの比較折れ線グラフのHTMLを生成"""
     
+    # 図の定義（トレース・レイアウト）はPython側で組み立てる
+    figure = build_comparison_figure(chart_data)
+    
     # CSVデータを表示用のテーブルに変換
     table_html = ""
     for row in csv_data:
@@ -89,7 +85,7 @@ def create_comparison_chart_html(csv_data, chart_data):
     <head>
         <title>大谷翔平 ホームラン累積推移比較 - 2024年 vs 2025年（週番号ベース）</title>
         <meta charset="utf-8">
-        <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
+        <script src="{plotly_bundle_url()}"></script>
         <style>
             body {{
                 font-family: Arial, sans-serif;
@@ -234,81 +230,8 @@ def create_comparison_chart_html(csv_data, chart_data):
         </div>
         
         <script>
-            const chartData = {json.dumps(chart_data)};
-            
-            const trace2024 = {{
-                x: chartData.weeks,
-                y: chartData['2024'].map(val => val === null ? null : val),
-                type: 'scatter',
-                mode: 'lines+markers',
-                line: {{
-                    color: '#95a5a6',
-                    width: 2,
-                    dash: 'dash'
-                }},
-                marker: {{
-                    color: '#95a5a6',
-                    size: 6
-                }},
-                name: '2024年'
-            }};
-            
-            const trace2025 = {{
-                x: chartData.weeks,
-                y: chartData['2025'].map(val => val === null ? null : val),
-                type: 'scatter',
-                mode: 'lines+markers',
-                line: {{
-                    color: '#e74c3c',
-                    width: 3
-                }},
-                marker: {{
-                    color: '#e74c3c',
-                    size: 8
-                }},
-                name: '2025年'
-            }};
-            
-            const layout = {{
-                title: {{
-                    text: 'ホームラン累積推移比較 - 2024年 vs 2025年（週番号ベース）',
-                    font: {{
-                        size: 18,
-                        color: '#2c3e50'
-                    }}
-                }},
-                xaxis: {{
-                    title: 'シーズン開始からの週数',
-                    rangemode: 'tozero'
-                }},
-                yaxis: {{
-                    title: '累積ホームラン数',
-                    rangemode: 'tozero'
-                }},
-                plot_bgcolor: 'white',
-                paper_bgcolor: 'white',
-                margin: {{
-                    l: 60,
-                    r: 40,
-                    t: 80,
-                    b: 80
-                }},
-                showlegend: true,
-                legend: {{
-                    x: 0.02,
-                    y: 0.98,
-                    bgcolor: 'rgba(255,255,255,0.8)',
-                    bordercolor: '#ccc',
-                    borderwidth: 1
-                }}
-            }};
-            
-            const config = {{
-                responsive: true,
-                displayModeBar: false
-            }};
-            
-            Plotly.newPlot('chart', [trace2024, trace2025], layout, config);
+            const figure = {json.dumps(figure, ensure_ascii=False)};
+            Plotly.newPlot('chart', figure.data, figure.layout, figure.config);
         </script>
     </body>
     </html>
@@ -3,16 +3,20 @@ import pandas as pd
 import json
 from datetime import datetime, timedelta
 
+from game_log_store import read_game_logs
+
+PLAYER_ID = 660271  # 大谷翔平のMLB ID
+
 def create_home_run_prediction():
     """2025年の残り試合でのホームラン予測を生成"""
     
     # 2024年のデータを読み込み
-    df_2024 = pd.read_csv('data/raw/ohtani_batting_gamelogs_2024.csv')
-    df_2024['date'] = pd.to_datetime(df_2024['date'])
+    df_2024 = read_game_logs('data/raw/ohtani_batting_gamelogs_2024.csv', 'hitting', 2024, PLAYER_ID,
+                             columns=['game_date', 'home_runs'])
     
     # 2025年のデータを読み込み
-    df_2025 = pd.read_csv('data/raw/ohtani_batting_api_2025.csv')
-    df_2025['game_date'] = pd.to_datetime(df_2025['game_date'])
+    df_2025 = read_game_logs('data/raw/ohtani_batting_api_2025.csv', 'hitting', 2025, PLAYER_ID,
+                             columns=['game_date', 'home_runs'])
     
     # ドジャースの試合数を取得
     with open('data/processed/dodgers_games_2025.json', 'r', encoding='utf-8') as f:
@@ -23,10 +27,7 @@ def create_home_run_prediction():
     remaining_games = dodgers_data['remaining_games']
     
     # 2024年の週次ホームラン率を計算
-    import ast
-    df_2024['stat_dict'] = df_2024['stat'].apply(ast.literal_eval)
-    df_2024['home_runs'] = df_2024['stat_dict'].apply(lambda x: x.get('homeRuns', 0))
-    df_2024['week_number'] = ((df_2024['date'] - df_2024['date'].min()).dt.days // 7) + 1
+    df_2024['week_number'] = ((df_2024['game_date'] - df_2024['game_date'].min()).dt.days // 7) + 1
     weekly_2024 = df_2024.groupby('week_number')['home_runs'].sum().reset_index()
     
     # 2025年の現在の週次ホームラン率を計算
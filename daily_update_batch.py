@@ -66,9 +66,13 @@ def daily_update():
     # 更新スクリプトのリスト
     update_scripts = [
         ('fetch_dodgers_games.py', 'ドジャース試合データ取得'),
+        ('fetch_2025_data.py', '2025年ゲームログ差分取得'),
         ('create_home_run_chart_comparison.py', 'ホームラン比較データ生成'),
         ('create_home_run_prediction.py', 'ホームラン予測データ生成'),
         ('create_home_run_with_prediction.py', 'ホームラン予測統合データ生成'),
+        ('processed_snapshots.py', '成果物のスナップショット公開'),
+        ('static_site.py', '静的サイト書き出し'),
+        ('snapshot_file.py', '共有スナップショットファイル作成'),
         ('twitter_bot.py', 'Twitter自動投稿')
     ]
     
@@ -4,36 +4,42 @@
 MLB.comから2024年の投手・打撃成績を取得
 """
 
-import requests
 import pandas as pd
 import json
 from datetime import datetime
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from game_log_ingest import ingest_game_logs, publish_game_log
+from game_log_schema import flatten_splits
+from statsapi_client import CoalescedStats, get_client
+
+# 同時に投げるリクエストの上限（statsapi_clientの接続プールより小さくする）
+FETCH_MAX_WORKERS = 4
+
+# people/{id}/stats への取得はこの組み合わせを1リクエストにまとめる
+STATS_QUERIES = (
+    ('season', 'pitching'),
+    ('season', 'hitting'),
+    ('gameLog', 'pitching'),
+    ('gameLog', 'hitting'),
+)
 
 class OhtaniDataFetcher2024:
     def __init__(self):
-        self.base_url = "https://statsapi.mlb.com/api/v1"
         self.player_id = "660271"  # 大谷翔平のMLB ID
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
+        # 接続プール・タイムアウト・リトライはstatsapi_clientに任せる
+        self.client = get_client()
+        # 投手成績・打撃成績・ゲームログ（投手・打撃）を1リクエストで取得して分配する
+        self.stats_2024 = CoalescedStats(self.client, f"people/{self.player_id}/stats", STATS_QUERIES,
+                                         params={'season': '2024', 'sportIds': '1'})
         
     def get_pitching_stats_2024(self):
         """2024年投手成績を取得"""
         try:
-            # 2024年投手成績API
-            url = f"{self.base_url}/people/{self.player_id}/stats"
-            params = {
-                'stats': 'pitching',
-                'group': 'pitching',
-                'season': '2024',
-                'sportIds': '1'  # MLB
-            }
-            
-            response = requests.get(url, headers=self.headers, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
+            # 2024年投手成績API（stats=season&group=pitching）
+            data = self.stats_2024.get('season', 'pitching')
             
             if 'stats' in data and data['stats']:
                 stats = data['stats'][0]['splits'][0]['stat']
@@ -63,19 +69,8 @@ class OhtaniDataFetcher2024:
     def get_batting_stats_2024(self):
         """2024年打撃成績を取得"""
         try:
-            # 2024年打撃成績API
-            url = f"{self.base_url}/people/{self.player_id}/stats"
-            params = {
-                'stats': 'batting',
-                'group': 'hitting',
-                'season': '2024',
-                'sportIds': '1'  # MLB
-            }
-            
-            response = requests.get(url, headers=self.headers, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
+            # 2024年打撃成績API（stats=season&group=hitting）
+            data = self.stats_2024.get('season', 'hitting')
             
             if 'stats' in data and data['stats']:
                 stats = data['stats'][0]['splits'][0]['stat']
@@ -107,33 +102,9 @@ class OhtaniDataFetcher2024:
     def get_game_logs_2024(self):
         """2024年ゲームログを取得"""
         try:
-            # 投手ゲームログ
-            pitching_url = f"{self.base_url}/people/{self.player_id}/stats"
-            pitching_params = {
-                'stats': 'gameLog',
-                'group': 'pitching',
-                'season': '2024',
-                'sportIds': '1'
-            }
-            
-            response = requests.get(pitching_url, headers=self.headers, params=pitching_params)
-            response.raise_for_status()
-            
-            pitching_data = response.json()
-            
-            # 打撃ゲームログ
-            batting_url = f"{self.base_url}/people/{self.player_id}/stats"
-            batting_params = {
-                'stats': 'gameLog',
-                'group': 'hitting',
-                'season': '2024',
-                'sportIds': '1'
-            }
-            
-            response = requests.get(batting_url, headers=self.headers, params=batting_params)
-            response.raise_for_status()
-            
-            batting_data = response.json()
+            # 投手・打撃ゲームログ（成績と同じリクエストで取得済み）
+            pitching_data = self.stats_2024.get('gameLog', 'pitching')
+            batting_data = self.stats_2024.get('gameLog', 'hitting')
             
             return {
                 'pitching_games': pitching_data.get('stats', []),
@@ -144,6 +115,34 @@ class OhtaniDataFetcher2024:
             print(f"ゲームログ取得エラー: {e}")
             return None
     
+    def _game_log_splits(self, group):
+        """まとめて取得したゲームログのsplits（取得できなければNone = ingest_game_logsが個別に取得）"""
+        try:
+            stats = self.stats_2024.get('gameLog', group).get('stats', [])
+        except Exception as e:
+            print(f"ゲームログ取得エラー ({group}): {e}")
+            return None
+        return stats[0].get('splits', []) if stats else []
+    
+    def update_game_logs_2024(self):
+        """2024年ゲームログを差分取り込み（成績とまとめて取得したゲームログのうち前回の最終試合以降をCSVに追記）"""
+        targets = (
+            ('pitching', 'data/raw/ohtani_pitching_gamelogs_2024.csv'),
+            ('hitting', 'data/raw/ohtani_batting_gamelogs_2024.csv'),
+        )
+        results = {}
+        with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+            futures = {group: executor.submit(ingest_game_logs, csv_path, self.player_id, 2024, group,
+                                              client=self.client, splits=self._game_log_splits(group))
+                       for group, csv_path in targets}
+            for group, future in futures.items():
+                try:
+                    results[group] = future.result()
+                except Exception as e:
+                    print(f"ゲームログ取り込みエラー ({group}): {e}")
+                    results[group] = None
+        return results
+    
     def save_data_to_csv(self, pitching_stats, batting_stats, game_logs):
         """データをCSVファイルに保存"""
         try:
@@ -166,39 +165,41 @@ class OhtaniDataFetcher2024:
             if game_logs and game_logs.get('pitching_games'):
                 pitching_games = game_logs['pitching_games']
                 if pitching_games:
-                    df_pitching_logs = pd.DataFrame(pitching_games[0].get('splits', []))
+                    df_pitching_logs = pd.DataFrame(flatten_splits(pitching_games[0].get('splits', []), 'pitching'))
                     df_pitching_logs.to_csv('data/raw/ohtani_pitching_gamelogs_2024.csv', index=False, encoding='utf-8')
+                    publish_game_log('data/raw/ohtani_pitching_gamelogs_2024.csv', 'pitching', 2024, self.player_id)
                     print("✅ 2024年投手ゲームログを保存しました: data/raw/ohtani_pitching_gamelogs_2024.csv")
             
             if game_logs and game_logs.get('batting_games'):
                 batting_games = game_logs['batting_games']
                 if batting_games:
-                    df_batting_logs = pd.DataFrame(batting_games[0].get('splits', []))
+                    df_batting_logs = pd.DataFrame(flatten_splits(batting_games[0].get('splits', []), 'hitting'))
                     df_batting_logs.to_csv('data/raw/ohtani_batting_gamelogs_2024.csv', index=False, encoding='utf-8')
+                    publish_game_log('data/raw/ohtani_batting_gamelogs_2024.csv', 'hitting', 2024, self.player_id)
                     print("✅ 2024年打撃ゲームログを保存しました: data/raw/ohtani_batting_gamelogs_2024.csv")
                     
         except Exception as e:
             print(f"データ保存エラー: {e}")
     
-    def fetch_all_2024_data(self):
-        """2024年の全データを取得"""
+    def fetch_all_2024_data(self, incremental=True):
+        """2024年の全データを取得（incremental=Trueならゲームログは差分取り込み）"""
         print("🔄 2024年大谷翔平データを取得中...")
         
-        # 投手成績取得
-        print("📊 投手成績を取得中...")
-        pitching_stats = self.get_pitching_stats_2024()
-        
-        # 打撃成績取得
-        print("🏏 打撃成績を取得中...")
-        batting_stats = self.get_batting_stats_2024()
-        
-        # ゲームログ取得
-        print("📈 ゲームログを取得中...")
-        game_logs = self.get_game_logs_2024()
+        # 投手成績・打撃成績・ゲームログを並行して取得
+        # （各メソッドが自分の例外を処理してNoneを返すので、1つの失敗は他に影響しない）
+        print("📊 投手成績・🏏 打撃成績・📈 ゲームログを取得中...")
+        with ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS) as executor:
+            pitching_future = executor.submit(self.get_pitching_stats_2024)
+            batting_future = executor.submit(self.get_batting_stats_2024)
+            game_logs_future = executor.submit(self.update_game_logs_2024 if incremental else self.get_game_logs_2024)
+            pitching_stats = pitching_future.result()
+            batting_stats = batting_future.result()
+            game_logs = game_logs_future.result()
         
         # データ保存
         print("💾 データを保存中...")
-        self.save_data_to_csv(pitching_stats, batting_stats, game_logs)
+        # 差分取り込みの場合、ゲームログはupdate_game_logs_2024が保存済み
+        self.save_data_to_csv(pitching_stats, batting_stats, None if incremental else game_logs)
         
         # 結果表示
         print("\n📋 取得結果:")
@@ -206,6 +207,7 @@ class OhtaniDataFetcher2024:
             print(f"投手成績: ERA {pitching_stats['era']}, {pitching_stats['wins']}-{pitching_stats['losses']}, {pitching_stats['strikeouts']}奪三振")
         if batting_stats:
             print(f"打撃成績: 打率 {batting_stats['avg']}, {batting_stats['home_runs']}本塁打, {batting_stats['rbi']}打点")
+        self.client.print_connection_stats()
         
         return {
             'pitching': pitching_stats,
@@ -216,7 +218,7 @@ class OhtaniDataFetcher2024:
 def main():
     """メイン実行関数"""
     fetcher = OhtaniDataFetcher2024()
-    data = fetcher.fetch_all_2024_data()
+    data = fetcher.fetch_all_2024_data(incremental='--full' not in sys.argv[1:])
     
     print("\n🎉 2024年データ取得完了！")
     print("データファイルは 'data/raw/' ディレクトリに保存されました。")
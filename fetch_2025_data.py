@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+2025年大谷翔平ゲームログ取得スクリプト
+前回取り込んだ試合以降の打撃ゲームログだけを取得して data/raw/ohtani_batting_api_2025.csv に追記する
+
+  python3 fetch_2025_data.py          # 差分取り込み
+  python3 fetch_2025_data.py --full   # シーズン全体を取り直す
+"""
+
+import sys
+
+from game_log_ingest import batting_api_rows, ingest_game_logs
+from statsapi_client import get_client
+
+PLAYER_ID = "660271"  # 大谷翔平のMLB ID
+SEASON = 2025
+BATTING_API_CSV = 'data/raw/ohtani_batting_api_2025.csv'
+
+
+def main():
+    """メイン実行関数"""
+    full = '--full' in sys.argv[1:]
+    try:
+        ingest_game_logs(BATTING_API_CSV, PLAYER_ID, SEASON, 'hitting', to_rows=batting_api_rows, full=full)
+        get_client().print_connection_stats()
+        return True
+    except Exception as e:
+        print(f"❌ 2025年ゲームログ取得エラー: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
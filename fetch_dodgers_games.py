@@ -4,6 +4,11 @@ import pandas as pd
 from datetime import datetime
 import json
 
+from schedule_store import ScheduleStore
+
+# 試合単位のスケジュール（gamePkで索引）
+SCHEDULE_STORE_PATH = 'data/processed/dodgers_schedule_2025.json'
+
 def fetch_dodgers_games_2025():
     """ドジャースの2025年シーズンの試合数を取得"""
     
@@ -13,38 +18,17 @@ def fetch_dodgers_games_2025():
     season = 2025
     
     try:
-        # ドジャースの試合スケジュールを取得
-        url = f"https://statsapi.mlb.com/api/v1/schedule"
-        params = {
-            'sportId': 1,  # MLB
-            'teamId': team_id,
-            'season': season,
-            'gameType': 'R',  # Regular Season
-            'fields': 'dates,games,gamePk,gameDate,status,abstractGameState'
-        }
-        
+        # 試合単位のスケジュールストアを更新（2回目以降は未完了の試合の日付範囲だけ取得）
         print(f"ドジャースの2025年シーズンデータを取得中...")
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        
-        data = response.json()
+        store = ScheduleStore.load(team_id, season, SCHEDULE_STORE_PATH)
+        changed = store.refresh()
+        print(f"更新された試合: {changed}試合")
         
-        # 試合データを解析
-        total_games = 0
-        completed_games = 0
+        total_games = store.total_games()
+        completed_games = store.completed_games()
         today = datetime.now().strftime('%Y-%m-%d')
-        
-        if 'dates' in data:
-            for date_info in data['dates']:
-                for game in date_info.get('games', []):
-                    total_games += 1
-                    game_date = game.get('gameDate', '')[:10]  # YYYY-MM-DD形式
-                    game_status = game.get('status', {}).get('abstractGameState', '')
-                    
-                    # 完了した試合をカウント
-                    if game_status == 'Final':
-                        completed_games += 1
-                        print(f"完了試合: {game_date} - {game_status}")
+        next_game = store.next_game()
+        games_today = store.games_on(today)
         
         # 結果を表示
         print(f"\n📊 ドジャース2025年シーズン試合状況:")
@@ -52,6 +36,8 @@ def fetch_dodgers_games_2025():
         print(f"完了試合数: {completed_games}試合")
         print(f"残り試合数: {total_games - completed_games}試合")
         print(f"進捗率: {round(completed_games/total_games*100, 1)}%")
+        if next_game:
+            print(f"次の試合: {next_game['official_date']} vs {next_game['opponent']}（{next_game['home_away']}）")
         
         # データを保存
         dodgers_data = {
@@ -61,7 +47,14 @@ def fetch_dodgers_games_2025():
             'completed_games': completed_games,
             'remaining_games': total_games - completed_games,
             'progress_percentage': round(completed_games/total_games*100, 1),
-            'last_updated': today
+            'last_updated': today,
+            'games_today': len(games_today),
+            'next_game': {
+                'game_pk': next_game['game_pk'],
+                'date': next_game['official_date'],
+                'opponent': next_game['opponent'],
+                'home_away': next_game['home_away']
+            } if next_game else None
         }
         
         with open('data/processed/dodgers_games_2025.json', 'w', encoding='utf-8') as f:
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+複数選手・複数シーズンの成績一括取得スクリプト
+statsapiの people?personIds=...&hydrate=stats(...) で、最大BATCH_SIZE人分の
+シーズン成績を1リクエストでまとめて取得する（50人×4シーズンでも4リクエスト）
+
+  python3 fetch_player_stats.py --players 660271 592450 --seasons 2024 2025
+  python3 fetch_player_stats.py --players-file cohort.txt --seasons 2023 2024 2025 --groups hitting
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from statsapi_client import get_client
+
+# 1リクエストでまとめる選手数（URLが長くなりすぎない範囲）
+BATCH_SIZE = 50
+
+# 同時に投げるリクエストの上限
+FETCH_MAX_WORKERS = 4
+
+DEFAULT_GROUPS = ('hitting', 'pitching')
+OUTPUT_DIR = 'data/raw'
+
+
+def chunked(items, size):
+    """リストをsize件ずつに分割"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _season_split(splits, season):
+    """指定シーズンのsplitを選ぶ（移籍した選手はチーム別と合算があるので合算を優先）"""
+    season_splits = [split for split in splits if str(split.get('season')) == str(season)]
+    if not season_splits:
+        return None
+    combined = [split for split in season_splits if 'team' not in split]
+    return combined[0] if combined else season_splits[-1]
+
+
+class PlayerStatsFetcher:
+    """選手IDとシーズンのリストからシーズン成績をまとめて取得する"""
+
+    def __init__(self, client=None, batch_size=BATCH_SIZE, max_workers=FETCH_MAX_WORKERS):
+        self.client = client or get_client()
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+
+    def fetch_batch(self, player_ids, season, groups=DEFAULT_GROUPS):
+        """1バッチ分（1リクエスト）の選手のシーズン成績を {group: [行, ...]} で返す"""
+        params = {
+            'personIds': ','.join(str(player_id) for player_id in player_ids),
+            'hydrate': f"stats(group=[{','.join(groups)}],type=[season],season={season},sportId=1)",
+        }
+        data = self.client.get_json('people', params=params)
+
+        rows = {group: [] for group in groups}
+        for person in data.get('people', []):
+            for stats in person.get('stats', []):
+                group = stats.get('group', {}).get('displayName')
+                if group not in rows:
+                    continue
+                split = _season_split(stats.get('splits', []), season)
+                if split is None:
+                    continue
+                row = {
+                    'player_id': person.get('id'),
+                    'full_name': person.get('fullName', ''),
+                    'season': int(season),
+                    'team': split.get('team', {}).get('name', ''),
+                }
+                row.update(split.get('stat', {}))
+                rows[group].append(row)
+        return rows
+
+    def fetch_season_stats(self, player_ids, seasons, groups=DEFAULT_GROUPS):
+        """全選手・全シーズンの成績を {group: DataFrame} で返す
+
+        リクエスト数は シーズン数 × ceil(選手数 / batch_size)。失敗したバッチは表示して飛ばす。
+        """
+        player_ids = list(dict.fromkeys(str(player_id) for player_id in player_ids))
+        jobs = [(batch, season) for season in seasons for batch in chunked(player_ids, self.batch_size)]
+        print(f"🔄 {len(player_ids)}選手 × {len(seasons)}シーズンを{len(jobs)}リクエストで取得中...")
+
+        results = {group: [] for group in groups}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [(batch, season, executor.submit(self.fetch_batch, batch, season, groups))
+                       for batch, season in jobs]
+            for batch, season, future in futures:
+                try:
+                    batch_rows = future.result()
+                except Exception as e:
+                    print(f"成績取得エラー ({season}年, {len(batch)}選手): {e}")
+                    continue
+                for group, rows in batch_rows.items():
+                    results[group].extend(rows)
+
+        return {group: pd.DataFrame(rows) for group, rows in results.items()}
+
+    def save_to_csv(self, frames, output_dir=OUTPUT_DIR):
+        """グループごとに data/raw/player_season_stats_<group>.csv に保存"""
+        os.makedirs(output_dir, exist_ok=True)
+        paths = []
+        for group, df in frames.items():
+            if df.empty:
+                print(f"⚠️ {group}の成績はありませんでした")
+                continue
+            path = os.path.join(output_dir, f"player_season_stats_{group}.csv")
+            df.sort_values(['season', 'player_id']).to_csv(path, index=False, encoding='utf-8')
+            print(f"✅ {group}成績を保存しました: {path}（{len(df)}行）")
+            paths.append(path)
+        return paths
+
+
+def read_player_ids(path):
+    """1行1選手ID（#以降はコメント）のファイルを読み込み"""
+    player_ids = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            player_id = line.split('#', 1)[0].strip()
+            if player_id:
+                player_ids.append(player_id)
+    return player_ids
+
+
+def main():
+    """メイン実行関数"""
+    parser = argparse.ArgumentParser(description='複数選手・複数シーズンの成績を一括取得')
+    parser.add_argument('--players', nargs='*', default=[], help='選手ID')
+    parser.add_argument('--players-file', help='選手IDを1行ずつ書いたファイル')
+    parser.add_argument('--seasons', nargs='+', type=int, required=True, help='シーズン')
+    parser.add_argument('--groups', nargs='+', default=list(DEFAULT_GROUPS), choices=DEFAULT_GROUPS)
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    player_ids = list(args.players)
+    if args.players_file:
+        player_ids.extend(read_player_ids(args.players_file))
+    if not player_ids:
+        print("❌ 選手IDを指定してください（--players または --players-file）")
+        return False
+
+    fetcher = PlayerStatsFetcher()
+    frames = fetcher.fetch_season_stats(player_ids, args.seasons, args.groups)
+    fetcher.save_to_csv(frames, args.output_dir)
+    fetcher.client.print_connection_stats()
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
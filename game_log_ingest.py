@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+ゲームログの差分取り込み
+最後に取り込んだ試合の日付とgamePkを状態ファイルに記録し、次回はその日付以降の
+試合だけをstatsapiに問い合わせて、gamePkで重複を除いてCSVに追記する
+
+状態ファイル: data/raw/game_log_state.json
+  {"<選手ID>:<シーズン>:<group>:<CSV名>": {"last_date", "last_game_pk", "games", "updated_at"}}
+
+最後の日付の試合は再取得する（ダブルヘッダーや取り込み時点で未確定だった試合のため）。
+既存のgamePkと重なった行は新しい内容で置き換える。
+
+成績DBにそのシーズンの盗塁・死球・犠飛が入っていない行（列を足す前から入っている行）があれば、
+差分ではなくシーズン全体を取り直してそれらの行を埋める（集計が常に数から計算できるように）。
+
+シーズン全体の取得（初回・--full・上記の埋め直し）はストリーミングで行う。応答の stats[].splits[] を
+1件ずつ解析し、INGEST_BATCH_SIZE件ごとにCSVへ書き出すので、応答の大きさに関わらず
+メモリ使用量は一定になる（ストリーミング時はディスクキャッシュを使わない）。
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from game_log_schema import ROW_CONVERTERS, flatten_split, read_game_log
+from game_log_store import write_game_log
+from stats_db import get_db
+from statsapi_client import get_client
+
+STATE_PATH = 'data/raw/game_log_state.json'
+
+# statsapiの日付パラメータの形式
+API_DATE_FORMAT = '%m/%d/%Y'
+
+# ストリーミング取り込みで一度にCSVへ書き出す行数
+INGEST_BATCH_SIZE = 500
+
+SPLITS_PREFIX = 'stats.item.splits.item'
+
+# 投手・打撃を並行して取り込むので状態ファイルの読み書きは直列にする
+_state_lock = threading.Lock()
+
+
+def load_state(path=STATE_PATH):
+    """取り込み状態を読み込み（無ければ空）"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(states, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(states, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def split_game_pk(split):
+    return split.get('game', {}).get('gamePk')
+
+
+def _game_log_params(season, group, start_date=None, end_date=None):
+    params = {
+        'stats': 'gameLog',
+        'group': group,
+        'season': str(season),
+        'sportIds': '1',
+    }
+    if start_date:
+        params['startDate'] = datetime.strptime(start_date, '%Y-%m-%d').strftime(API_DATE_FORMAT)
+        params['endDate'] = datetime.strptime(end_date, '%Y-%m-%d').strftime(API_DATE_FORMAT) if end_date \
+            else datetime.now().strftime(API_DATE_FORMAT)
+    return params
+
+
+def fetch_game_log_splits(client, player_id, season, group, start_date=None, end_date=None):
+    """gameLogのsplitsを取得（start_date/end_dateは 'YYYY-MM-DD'、両端を含む）"""
+    params = _game_log_params(season, group, start_date, end_date)
+    data = client.get_json(f"people/{player_id}/stats", params=params)
+    stats = data.get('stats', [])
+    return stats[0].get('splits', []) if stats else []
+
+
+def iter_game_log_splits(client, player_id, season, group, start_date=None, end_date=None):
+    """gameLogのsplitsを応答を読みながら1件ずつ返す"""
+    params = _game_log_params(season, group, start_date, end_date)
+    return client.iter_items(f"people/{player_id}/stats", SPLITS_PREFIX, params=params)
+
+
+def batting_api_rows(splits, existing=None):
+    """打撃ゲームログを1試合1行の列形式にする（列定義 + avg = その試合時点の通算打率）"""
+    total_at_bats = int(existing['at_bats'].sum()) if existing is not None and len(existing) else 0
+    total_hits = int(existing['hits'].sum()) if existing is not None and len(existing) else 0
+    rows = []
+    for split in splits:
+        row = flatten_split(split, 'hitting')
+        total_at_bats += row['at_bats']
+        total_hits += row['hits']
+        row['avg'] = f"{total_hits / total_at_bats:.3f}".lstrip('0') if total_at_bats else '.000'
+        rows.append(row)
+    return rows
+
+
+def _read_existing(csv_path):
+    """既存のCSVを読み込み（無い・game_pk列が無い・以前の形式の場合はNone = 全件取り直し）"""
+    if not os.path.exists(csv_path):
+        return None
+    try:
+        # 打率などの文字列表記（.250）は数値にしない
+        existing = pd.read_csv(csv_path, dtype={'avg': str})
+    except Exception as e:
+        print(f"⚠️ 既存のゲームログを読み込めません ({csv_path}): {e}")
+        return None
+    if 'stat' in existing.columns and 'game_date' not in existing.columns:
+        # splitをそのまま保存した以前の形式は列定義どおりに取り込み直す
+        print(f"⚠️ 以前の形式のゲームログのため全件を取り込み直します ({csv_path})")
+        return None
+    return existing if 'game_pk' in existing.columns else None
+
+
+def _write_csv_atomic(df, csv_path):
+    os.makedirs(os.path.dirname(csv_path) or '.', exist_ok=True)
+    tmp_path = f"{csv_path}.tmp"
+    df.to_csv(tmp_path, index=False, encoding='utf-8')
+    os.replace(tmp_path, csv_path)
+
+
+def _summary_frame(df):
+    """数値列の合計だけを持つ1行のDataFrame（to_rowsに渡す保存済み行の代わり）"""
+    return df.select_dtypes('number').sum().to_frame().T
+
+
+def _save_ingest_state(state_key, last_split, total, state_path):
+    with _state_lock:
+        # 並行して取り込んだ他のキーを消さないように読み直してから更新する
+        states = load_state(state_path)
+        states[state_key] = {
+            'last_date': last_split.get('date'),
+            'last_game_pk': split_game_pk(last_split),
+            'games': total,
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        save_state(states, state_path)
+
+
+def publish_game_log(csv_path, group, season, player_id):
+    """取り込んだゲームログをParquetのパーティションと成績DB（stats_db）に反映する
+
+    CSVが正なので、反映に失敗しても表示するだけで続行する。
+    """
+    try:
+        df = read_game_log(csv_path, group)
+    except Exception as e:
+        print(f"⚠️ ゲームログを読み込めません ({csv_path}): {e}")
+        return
+    try:
+        write_game_log(df, group, season, player_id)
+    except Exception as e:
+        print(f"⚠️ Parquetへの書き出しに失敗しました ({csv_path}): {e}")
+    try:
+        db = get_db()
+        db.upsert_game_log(df, group)
+        missing = db.games_missing_counts(group, season)
+        if missing:
+            # ゲームログに無い試合の行は埋められないので、その間は出塁率・OPS・盗塁が不明のまま
+            print(f"⚠️ 盗塁・死球・犠飛が入っていない試合が{missing}件残っています（ゲームログに無い試合）")
+    except Exception as e:
+        print(f"⚠️ 成績DBへの反映に失敗しました ({csv_path}): {e}")
+
+
+def _games_missing_counts(group, season):
+    """成績DBの盗塁・死球・犠飛が入っていない行の数（DBを読めなければ0）"""
+    try:
+        return get_db().games_missing_counts(group, season)
+    except Exception as e:
+        print(f"⚠️ 成績DBを確認できません: {e}")
+        return 0
+
+
+def _ingest_streaming(splits, csv_path, to_rows, batch_size):
+    """splitsを1件ずつ受け取り、batch_size件ごとにCSVへ書き出す
+
+    保存済みの行は置き換えない（シーズン全体の取り直し用）。
+    戻り値は (試合数, 最後のsplit)。
+    """
+    tmp_path = f"{csv_path}.tmp"
+    os.makedirs(os.path.dirname(csv_path) or '.', exist_ok=True)
+    seen = set()
+    columns = None
+    summary = None
+    last_split = None
+    total = 0
+    batch = []
+
+    def flush():
+        nonlocal columns, summary, total
+        df = pd.DataFrame(to_rows(batch, summary))
+        if columns is None:
+            columns = list(df.columns)
+            df.to_csv(tmp_path, index=False, encoding='utf-8')
+        else:
+            df.reindex(columns=columns).to_csv(tmp_path, mode='a', header=False, index=False, encoding='utf-8')
+        batch_summary = _summary_frame(df)
+        summary = batch_summary if summary is None else summary.add(batch_summary, fill_value=0)
+        total += len(df)
+        batch.clear()
+
+    for split in splits:
+        game_pk = split_game_pk(split)
+        if game_pk is None or game_pk in seen:
+            continue
+        seen.add(game_pk)
+        batch.append(split)
+        last_split = split
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    if total:
+        os.replace(tmp_path, csv_path)
+    return total, last_split
+
+
+def ingest_game_logs(csv_path, player_id, season, group, to_rows=None, client=None,
+                     full=False, end_date=None, state_path=STATE_PATH, stream=None,
+                     batch_size=INGEST_BATCH_SIZE, splits=None, publish=True):
+    """前回の続きからゲームログを取り込んでCSVに追記し、新規の試合数を返す
+
+    full=Trueまたは状態・CSVが無い場合はシーズン全体を取り直す。
+    to_rows(splits, existing) はsplitsをCSVの行（dictのリスト）に変換する関数
+    （省略時はgame_log_schemaのgroupの列定義どおりに展開する）。
+    existingは保存済みの行のDataFrame（ストリーミング時は数値列の合計1行）。
+    シーズン全体を取得するときはストリーミングで取り込む（stream=Falseで一括）。
+    splitsを渡すと取得せずにそれを使う（他の成績とまとめて取得したシーズン全体のsplitsなど。
+    前回の最終日より前の試合は除く）。
+    publish=Trueなら列定義どおりのCSVをParquetと成績DBにも反映する（publish_game_log）。
+    """
+    client = client or get_client()
+    to_rows = to_rows or ROW_CONVERTERS[group]
+    publish = publish and to_rows in (ROW_CONVERTERS[group], batting_api_rows)
+    if publish and not full:
+        missing = _games_missing_counts(group, season)
+        if missing:
+            print(f"🔁 {season}年 {group}: 盗塁・死球・犠飛の無い試合が{missing}件あるのでシーズン全体を取り直します")
+            full = True
+    state_key = f"{player_id}:{season}:{group}:{os.path.basename(csv_path)}"
+    state = load_state(state_path).get(state_key)
+    existing = None if full or state is None else _read_existing(csv_path)
+    start_date = state['last_date'] if existing is not None else None
+
+    label = f"{season}年 {group} ゲームログ"
+    print(f"📥 {label}: {start_date + ' 以降' if start_date else 'シーズン全体'}を取得中...")
+    if stream is None:
+        stream = start_date is None
+    if stream and start_date is None and splits is None:
+        splits = iter_game_log_splits(client, player_id, season, group, None, end_date)
+        total, last_split = _ingest_streaming(splits, csv_path, to_rows, batch_size)
+        if last_split is None:
+            print(f"✅ {label}: 試合はありません")
+            return 0
+        _save_ingest_state(state_key, last_split, total, state_path)
+        if publish:
+            publish_game_log(csv_path, group, season, player_id)
+        print(f"✅ {label}: {total}試合 -> {csv_path}（{batch_size}件ずつ書き出し）")
+        return total
+
+    if splits is None:
+        splits = fetch_game_log_splits(client, player_id, season, group, start_date, end_date)
+    else:
+        splits = [split for split in splits
+                  if (start_date is None or split.get('date', '') >= start_date)
+                  and (end_date is None or split.get('date', '') <= end_date)]
+
+    # gamePkで重複を除き、日付順に並べる
+    by_pk = {}
+    for split in splits:
+        game_pk = split_game_pk(split)
+        if game_pk is not None:
+            by_pk[game_pk] = split
+    splits = sorted(by_pk.values(), key=lambda s: (s.get('date', ''), split_game_pk(s)))
+    if not splits:
+        print(f"✅ {label}: 新しい試合はありません")
+        return 0
+
+    known = set(existing['game_pk']) if existing is not None else set()
+    new_games = sum(1 for game_pk in by_pk if game_pk not in known)
+    replaced = known & set(by_pk)
+    if replaced:
+        # 再取得した試合は新しい内容で置き換える
+        existing = existing[~existing['game_pk'].isin(replaced)]
+
+    new_df = pd.DataFrame(to_rows(splits, existing))
+    if existing is None or replaced or not set(new_df.columns) <= set(existing.columns):
+        df = new_df if existing is None else pd.concat([existing, new_df], ignore_index=True)
+        _write_csv_atomic(df, csv_path)
+        total = len(df)
+    else:
+        # 追記のみ（既存の行は書き直さない）
+        new_df.reindex(columns=existing.columns).to_csv(csv_path, mode='a', header=False,
+                                                        index=False, encoding='utf-8')
+        total = len(existing) + len(new_df)
+
+    _save_ingest_state(state_key, splits[-1], total, state_path)
+    if publish:
+        publish_game_log(csv_path, group, season, player_id)
+    print(f"✅ {label}: 新規{new_games}試合（更新{len(replaced)}試合） / 合計{total}試合 -> {csv_path}")
+    return new_games
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+ゲームログの列定義
+statsapiのgameLogのsplitを取り込み時に1試合1行の型付きの列へ展開し、
+読み込み側は read_game_log() で数値をそのまま読む（行ごとの辞書文字列の解析をしない）
+
+  共通の列     game_date, game_pk, opponent, is_home
+  hitting     at_bats, hits, doubles, triples, home_runs, rbi, runs, walks, strikeouts, stolen_bases,
+              hit_by_pitch, sac_flies
+  pitching    outs, hits_allowed, runs_allowed, earned_runs, walks, strikeouts, home_runs_allowed,
+              pitches, wins, losses
+
+以前の形式（splitをそのまま保存し、stat列にPythonの辞書表記が入ったCSV）も
+read_game_log() で読めるが、その場合だけ各行を解析する。
+"""
+
+import ast
+import os
+
+import pandas as pd
+
+# 列名 -> dtype（game_dateは読み込み時に日付に変換する）
+BASE_COLUMNS = {
+    'game_date': 'string',
+    'game_pk': 'int64',
+    'opponent': 'string',
+    'is_home': 'boolean',
+}
+
+# group -> [(列名, statのキー), ...]（すべてint64）
+STAT_COLUMNS = {
+    'hitting': [
+        ('at_bats', 'atBats'),
+        ('hits', 'hits'),
+        ('doubles', 'doubles'),
+        ('triples', 'triples'),
+        ('home_runs', 'homeRuns'),
+        ('rbi', 'rbi'),
+        ('runs', 'runs'),
+        ('walks', 'baseOnBalls'),
+        ('strikeouts', 'strikeOuts'),
+        ('stolen_bases', 'stolenBases'),
+        # 出塁率 (安打 + 四球 + 死球) / (打数 + 四球 + 死球 + 犠飛) の計算に使う
+        ('hit_by_pitch', 'hitByPitch'),
+        ('sac_flies', 'sacFlies'),
+    ],
+    'pitching': [
+        ('outs', 'outs'),
+        ('hits_allowed', 'hits'),
+        ('runs_allowed', 'runs'),
+        ('earned_runs', 'earnedRuns'),
+        ('walks', 'baseOnBalls'),
+        ('strikeouts', 'strikeOuts'),
+        ('home_runs_allowed', 'homeRuns'),
+        ('pitches', 'numberOfPitches'),
+        ('wins', 'wins'),
+        ('losses', 'losses'),
+    ],
+}
+
+# 列定義以外に読み込み時に型を決めておく列（2025年の打撃ゲームログの通算打率 '.250' など）
+EXTRA_DTYPES = {
+    'avg': 'string',
+}
+
+
+def schema(group):
+    """groupの列名 -> dtype"""
+    dtypes = dict(BASE_COLUMNS)
+    dtypes.update((column, 'int64') for column, _ in STAT_COLUMNS[group])
+    return dtypes
+
+
+def _outs(stat):
+    """投球アウト数（outsが無ければ inningsPitched の '5.1' = 5回1/3 から計算）"""
+    if 'outs' in stat:
+        return int(stat['outs'])
+    whole, _, fraction = str(stat.get('inningsPitched', '0')).partition('.')
+    return int(whole or 0) * 3 + int(fraction or 0)
+
+
+def flatten_split(split, group):
+    """gameLogのsplit 1件を列定義どおりの1行（dict）にする"""
+    stat = split.get('stat', {})
+    row = {
+        'game_date': split.get('date'),
+        'game_pk': split.get('game', {}).get('gamePk'),
+        'opponent': split.get('opponent', {}).get('name', ''),
+        'is_home': split.get('isHome'),
+    }
+    for column, key in STAT_COLUMNS[group]:
+        row[column] = _outs(stat) if column == 'outs' else int(stat.get(key, 0))
+    return row
+
+
+def flatten_splits(splits, group, existing=None):
+    """splitsを1試合1行に展開（ingest_game_logsのto_rowsとしても使える）"""
+    return [flatten_split(split, group) for split in splits]
+
+
+def hitting_rows(splits, existing=None):
+    return flatten_splits(splits, 'hitting')
+
+
+def pitching_rows(splits, existing=None):
+    return flatten_splits(splits, 'pitching')
+
+
+ROW_CONVERTERS = {
+    'hitting': hitting_rows,
+    'pitching': pitching_rows,
+}
+
+
+def _literal(value):
+    if not isinstance(value, str):
+        return {}
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return {}
+
+
+def _from_legacy(df, group):
+    """splitをそのまま保存した以前の形式を列定義どおりに変換"""
+    print("⚠️ 以前の形式のゲームログです（stat列を解析します）。--full で取り込み直すと解析が不要になります")
+    splits = []
+    for record in df.to_dict('records'):
+        split = {key: _literal(record.get(key)) for key in ('stat', 'opponent', 'game')}
+        split['date'] = record.get('date')
+        split['isHome'] = record.get('isHome')
+        if not split['game'].get('gamePk') and pd.notna(record.get('game_pk')):
+            split['game'] = {'gamePk': record['game_pk']}
+        splits.append(split)
+    return pd.DataFrame(flatten_splits(splits, group), columns=list(schema(group)))
+
+
+def apply_schema(df, group):
+    """列定義のdtypeに揃える（game_dateは日付型、無い統計列は0）"""
+    df = df.copy()
+    for column, dtype in schema(group).items():
+        if column not in df.columns:
+            df[column] = 0 if dtype == 'int64' else pd.NA
+        if column == 'game_date':
+            df[column] = pd.to_datetime(df[column])
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def read_game_log(csv_path, group='hitting', columns=None):
+    """ゲームログのCSVを型付きで読み込む（columnsで読む列を絞れる）"""
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(csv_path)
+    header = pd.read_csv(csv_path, nrows=0).columns
+    if 'stat' in header and 'game_date' not in header:
+        df = _from_legacy(pd.read_csv(csv_path), group)
+    else:
+        dtypes = dict(schema(group), **EXTRA_DTYPES)
+        dtypes.pop('game_date')
+        usecols = None if columns is None else [column for column in header if column in columns]
+        df = pd.read_csv(csv_path, usecols=usecols,
+                         dtype={column: dtype for column, dtype in dtypes.items() if column in header})
+    df = apply_schema(df, group)
+    return df if columns is None else df[list(columns)]
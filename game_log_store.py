@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+ゲームログ・日程の列指向ストレージ（Parquet）
+取り込んだテーブルをシーズン・選手（日程はチーム）ごとのパーティションに分けて
+data/parquet/<テーブル>/season=<シーズン>/player_id=<選手ID>/part-0.parquet に保存し、
+読み込み側は必要な列とパーティション・日付範囲だけを読む（列の射影と述語の押し下げ）
+
+  テーブル               パーティション          日付列
+  game_logs_hitting     season / player_id     game_date
+  game_logs_pitching    season / player_id     game_date
+  schedule              season / team_id       official_date
+
+pyarrowが無い環境、またはParquetがCSVより古い場合はCSVから読む。
+"""
+
+import os
+import uuid
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrowが無い環境ではCSVだけを使う
+    pa = ds = pq = None
+
+from game_log_schema import EXTRA_DTYPES, read_game_log, schema
+
+PARQUET_DIR = os.environ.get('PARQUET_DIR', 'data/parquet')
+
+# pandasのdtype -> Parquetの型
+_ARROW_TYPES = {
+    'string': 'string',
+    'int64': 'int64',
+    'boolean': 'bool_',
+}
+
+
+def game_log_table(group):
+    return f"game_logs_{group}"
+
+
+def _partition_dir(table, partitions, directory=PARQUET_DIR):
+    return os.path.join(directory, table, *(f"{key}={value}" for key, value in partitions.items()))
+
+
+def _game_log_arrow_schema(group):
+    """列定義どおりのスキーマ（avgのように一部のファイルにしか無い列も含める）"""
+    fields = [pa.field('game_date', pa.timestamp('ns'))]
+    for column, dtype in dict(schema(group), **EXTRA_DTYPES).items():
+        if column != 'game_date':
+            fields.append(pa.field(column, getattr(pa, _ARROW_TYPES[dtype])()))
+    return pa.schema(fields)
+
+
+def write_partition(df, table, partitions, arrow_schema=None, directory=PARQUET_DIR):
+    """1パーティション分のDataFrameを書き出す（既存のファイルは置き換える）
+
+    partitionsは {'season': 2024, 'player_id': 660271} のようなパーティションの値。
+    pyarrowが無ければ何もせずNoneを返す。
+    """
+    if pa is None:
+        return None
+    path = _partition_dir(table, partitions, directory)
+    os.makedirs(path, exist_ok=True)
+    # パーティションの値はディレクトリ名に持つので列からは除く
+    df = df.drop(columns=[key for key in partitions if key in df.columns])
+    if arrow_schema is not None:
+        arrow_schema = pa.schema([field for field in arrow_schema if field.name not in partitions])
+        df = df.reindex(columns=arrow_schema.names)
+    arrow_table = pa.Table.from_pandas(df, schema=arrow_schema, preserve_index=False)
+    target = os.path.join(path, 'part-0.parquet')
+    tmp_path = os.path.join(path, f".{uuid.uuid4().hex}.tmp")
+    pq.write_table(arrow_table, tmp_path, compression='zstd')
+    os.replace(tmp_path, target)
+    return target
+
+
+def read_table(table, columns=None, partitions=None, date_column=None, start_date=None, end_date=None,
+               directory=PARQUET_DIR):
+    """テーブルから必要な列・パーティション・日付範囲だけを読む（無ければNone）
+
+    partitionsは {'season': [2024, 2025]} のように値かリストを指定する。
+    start_date/end_dateは 'YYYY-MM-DD'（両端を含む）。
+    """
+    root = os.path.join(directory, table)
+    if pa is None or not os.path.isdir(root):
+        return None
+    dataset = ds.dataset(root, format='parquet', partitioning='hive')
+    condition = None
+
+    def add(expression):
+        nonlocal condition
+        condition = expression if condition is None else condition & expression
+
+    for key, value in (partitions or {}).items():
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        add(ds.field(key).isin([int(v) if str(v).isdigit() else v for v in values]))
+    if date_column and (start_date or end_date):
+        as_timestamp = pa.types.is_timestamp(dataset.schema.field(date_column).type)
+
+        def bound(value):
+            return pd.Timestamp(value) if as_timestamp else value
+
+        if start_date:
+            add(ds.field(date_column) >= bound(start_date))
+        if end_date:
+            add(ds.field(date_column) <= bound(end_date))
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+
+def write_game_log(df, group, season, player_id, directory=PARQUET_DIR):
+    """型付きのゲームログ（read_game_logの結果）を対応するParquetのパーティションに書き出す"""
+    if pa is None:
+        return None
+    return write_partition(df, game_log_table(group), {'season': int(season), 'player_id': int(player_id)},
+                           _game_log_arrow_schema(group), directory)
+
+
+def export_game_log(csv_path, group, season, player_id, directory=PARQUET_DIR):
+    """ゲームログのCSVを型付きで読み、対応するParquetのパーティションに書き出す"""
+    if pa is None or not os.path.exists(csv_path):
+        return None
+    return write_game_log(read_game_log(csv_path, group), group, season, player_id, directory)
+
+
+def read_game_logs(csv_path, group, season, player_id, columns=None, start_date=None, end_date=None,
+                   directory=PARQUET_DIR):
+    """1選手・1シーズンのゲームログを列・日付範囲を絞って読む
+
+    CSV以降に書き出したParquetがあればそれを読み、無ければCSVを読んで同じ絞り込みをする。
+    """
+    table = game_log_table(group)
+    partitions = {'season': int(season), 'player_id': int(player_id)}
+    parquet_path = os.path.join(_partition_dir(table, partitions, directory), 'part-0.parquet')
+    if pa is not None and os.path.exists(parquet_path) and \
+            (not os.path.exists(csv_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)):
+        df = read_table(table, columns, partitions, 'game_date', start_date, end_date, directory)
+        if columns is None:
+            # パーティション列と、このファイルに無かった列（スキーマを揃えるために足したavgなど）は除く
+            empty = [column for column in EXTRA_DTYPES if column in df.columns and df[column].isna().all()]
+            df = df.drop(columns=list(partitions) + empty)
+        # CSVから読んだ場合と同じdtypeに揃える
+        dtypes = dict(schema(group), **EXTRA_DTYPES)
+        df = df.astype({column: dtypes[column] for column in df.columns if column != 'game_date'})
+        if 'game_date' in df.columns:
+            df = df.sort_values('game_date', kind='stable')
+        return df.reset_index(drop=True)
+
+    needed = None if columns is None else list(dict.fromkeys([*columns, 'game_date']))
+    df = read_game_log(csv_path, group, needed)
+    if start_date:
+        df = df[df['game_date'] >= pd.Timestamp(start_date)]
+    if end_date:
+        df = df[df['game_date'] <= pd.Timestamp(end_date)]
+    df = df.reset_index(drop=True)
+    return df if columns is None else df[list(columns)]
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+gunicorn設定
+アプリとデータスナップショットをfork前にマスタープロセスで読み込み、
+ワーカー間でコピーオンライトのまま共有する
+
+  gunicorn -c gunicorn.conf.py test_app:app
+"""
+
+import gc
+import os
+
+# fork前にアプリ（pandas等のimportを含む）を読み込む
+preload_app = True
+
+# SSE（/api/events）の接続でワーカーが塞がらないようスレッドワーカーを使う
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# SSEの接続は最長でもmonitor_state.STREAM_MAX_DURATIONで切れ、同時接続数は
+# monitor_state.MAX_STREAMS（threadsより少なく）に制限される
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    """ワーカー起動前にスナップショットを作成し、共有スナップショットファイルとして公開"""
+    from http_cache import clear_render_cache
+    from plotly_assets import ensure_vendored_bundle
+    from snapshot_file import build_snapshot_file
+    from stats_db import get_db
+    from test_app import app
+
+    # 圧縮版付きのPlotly.js部分バンドルを用意してから（ページが/static/vendorを参照するように）レンダリングする
+    # 用意できなければ起動を止める（全トレース版やCDNに黙って切り替えない）
+    ensure_vendored_bundle()
+
+    try:
+        # 成績DBのマイグレーション（列・トリガー・集計）はデプロイ時にここで行う（ワーカーは読み取り専用で開く）
+        get_db().close()
+    except Exception as e:
+        server.log.warning(f"成績DBマイグレーションエラー: {e}")
+
+    try:
+        build_snapshot_file(app)
+        # レスポンス本文はmmapしたファイルから読むので、マスターのヒープには残さない
+        clear_render_cache()
+    except Exception as e:
+        server.log.warning(f"スナップショットファイル作成エラー: {e}")
+
+    # fork前の全オブジェクトをGC対象外にし、ワーカーのGCで共有ページが書き換わらないようにする
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """ワーカーごとに監視ステータスを読み込み、同期スレッドを開始（リクエスト処理中にファイルを読まないように）"""
+    from monitor_state import get_monitor_state
+
+    get_monitor_state().start_sync()
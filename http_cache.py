@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+HTTPキャッシュユーティリティ
+データのバージョンが変わるまでレンダリング/シリアライズ済みのレスポンスを再利用し、
+gzip・brotliの圧縮済みバリアントとETag/304に対応する
+"""
+
+import functools
+import gzip
+import hashlib
+import json
+import threading
+
+from flask import make_response, request
+
+import snapshot_file
+from metrics import CACHE_REQUESTS, RENDER_DURATION
+
+try:
+    import brotli
+except ImportError:  # brotliが無い環境ではgzipのみ
+    brotli = None
+
+# ワーカープロセスごとのレスポンスキャッシュ {キャッシュキー: CachedBody}
+_render_cache = {}
+_cache_lock = threading.Lock()
+
+# Accept-Encodingの同点時に優先する順
+_ENCODING_PREFERENCE = ('br', 'gzip', 'identity')
+
+
+class CachedBody:
+    """シリアライズ済みの本文とその圧縮バリアント・バリデータ"""
+
+    __slots__ = ('version', 'variants', 'etag', 'last_modified', 'mimetype')
+
+    def __init__(self, version, body, last_modified, mimetype):
+        self.version = version
+        self.variants = compress_variants(body)
+        self.etag = content_etag(body)
+        self.last_modified = last_modified
+        self.mimetype = mimetype
+
+    @classmethod
+    def from_variants(cls, version, variants, etag, last_modified, mimetype):
+        """圧縮済みのバリアント（共有スナップショットファイル上のmemoryviewなど）から作成"""
+        entry = cls.__new__(cls)
+        entry.version = version
+        entry.variants = variants
+        entry.etag = etag
+        entry.last_modified = last_modified
+        entry.mimetype = mimetype
+        return entry
+
+
+def content_etag(body):
+    """レスポンス本文の内容ハッシュから強いETagを作成"""
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+def compress_variants(body):
+    """本文をidentity/gzip/brの各エンコーディングで用意"""
+    variants = {
+        'identity': body,
+        # mtime=0で出力を決定的にする（ワーカー間でバイト列が一致する）
+        'gzip': gzip.compress(body, compresslevel=9, mtime=0),
+    }
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=11)
+    return variants
+
+
+def negotiate_encoding(available):
+    """Accept-Encodingから使用するエンコーディングを選択"""
+    accepted = request.accept_encodings
+    best, best_quality = 'identity', 0
+    for encoding in _ENCODING_PREFERENCE:
+        if encoding not in available:
+            continue
+        quality = accepted.quality(encoding)
+        if encoding == 'identity' and 'identity' not in accepted:
+            quality = 1  # 明示的に拒否されない限りidentityは常に受け入れ可能
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def clear_render_cache():
+    """レスポンスキャッシュを破棄"""
+    with _cache_lock:
+        _render_cache.clear()
+
+
+def export_render_cache(version):
+    """指定バージョンのキャッシュを {キャッシュキー: (variants, etag, mimetype)} で返す"""
+    with _cache_lock:
+        return {key: (entry.variants, entry.etag, entry.mimetype)
+                for key, entry in _render_cache.items() if entry.version == version}
+
+
+def _serve(entry):
+    encoding = negotiate_encoding(entry.variants)
+    # WSGIサーバーはbytesを要求する（bytesならbytes()はコピーせずそのまま返す）
+    response = make_response(bytes(entry.variants[encoding]))
+    response.mimetype = entry.mimetype
+    if encoding != 'identity':
+        response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    # 強いETagはエンコーディングごとに区別する
+    response.set_etag(entry.etag if encoding == 'identity' else f"{entry.etag}-{encoding}")
+    if entry.last_modified is not None:
+        response.last_modified = entry.last_modified
+    # 毎回再検証させる（データ更新は日次なので304で十分安い）
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def _cached_view(snapshot_getter, serialize, mimetype):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = (view.__name__, tuple(sorted(kwargs.items())))
+            snapshot = snapshot_getter()
+            entry = _render_cache.get(key)
+
+            if entry is None or entry.version != snapshot.version:
+                # 共有スナップショットファイルにあればレンダリングせずにそれを使う
+                shared = snapshot_file.lookup(snapshot.version, key)
+                if shared is not None:
+                    CACHE_REQUESTS.inc(cache='render', result='shared')
+                    entry = CachedBody.from_variants(snapshot.version, shared['variants'], shared['etag'],
+                                                     snapshot.last_modified, shared['mimetype'])
+                    with _cache_lock:
+                        _render_cache[key] = entry
+                    return _serve(entry)
+
+                CACHE_REQUESTS.inc(cache='render', result='miss')
+                with RENDER_DURATION.time(view=view.__name__):
+                    rv = view(*args, **kwargs)
+                    body = serialize(rv)
+                    if body is None:
+                        return rv
+                    entry = CachedBody(snapshot.version, body, snapshot.last_modified, mimetype)
+                with _cache_lock:
+                    _render_cache[key] = entry
+            else:
+                CACHE_REQUESTS.inc(cache='render', result='hit')
+
+            return _serve(entry)
+        # 共有スナップショットファイルの作成時に事前レンダリングする対象
+        wrapper.render_cached = True
+        return wrapper
+    return decorator
+
+
+def _serialize_page(rv):
+    return rv.encode('utf-8') if isinstance(rv, str) else None
+
+
+def _serialize_json(rv):
+    if not isinstance(rv, (dict, list)):
+        return None
+    return json.dumps(rv, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def cached_page(snapshot_getter):
+    """データのバージョンが変わらない限りレンダリング結果を再利用するデコレータ
+
+    snapshot_getterはversionとlast_modified属性を持つオブジェクトを返す関数。
+    ビューが文字列以外（404のタプルなど）を返した場合はキャッシュしない。
+    """
+    return _cached_view(snapshot_getter, _serialize_page, 'text/html')
+
+
+def cached_json(snapshot_getter):
+    """データのバージョンごとに一度だけJSONをシリアライズ・圧縮するデコレータ
+
+    ビューはdictまたはlistを返す。それ以外（エラー応答など）はキャッシュしない。
+    """
+    return _cached_view(snapshot_getter, _serialize_json, 'application/json')
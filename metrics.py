@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+メトリクス計測
+ルート・データ読み込み・レンダリングの所要時間やキャッシュのヒット率を記録し、
+Prometheusのテキスト形式（/metrics）で出力する
+
+計測1回あたりの処理はロック付きの加算のみなので、常時有効のままでよい。
+値はワーカープロセスごとに保持される（gunicornの複数ワーカー構成では
+スクレイプのたびに応答したワーカーの値になる）。
+"""
+
+import bisect
+import functools
+import threading
+import time
+
+# レイテンシ用のデフォルトバケット（秒）
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_registry = []
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+    def _samples(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """単調増加するカウンター"""
+
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def total(self):
+        """全ラベルの合計"""
+        with self._lock:
+            return sum(self._values.values())
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+
+class Gauge(_Metric):
+    """スクレイプ時に関数を呼び出して値を取得するゲージ
+
+    関数は {ラベル値のタプル: 値} を返す（ラベルなしなら {(): 値}）。
+    """
+
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def set_function(self, function):
+        self.function = function
+
+    def _samples(self):
+        if self.function is None:
+            return []
+        try:
+            values = self.function()
+        except Exception as e:
+            print(f"メトリクス取得エラー ({self.name}): {e}")
+            return []
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                for key, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    """累積バケット方式のヒストグラム"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [バケットごとの件数..., +Infの件数, 合計値]
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def time(self, **labels):
+        """ブロックまたは関数の所要時間を記録するコンテキストマネージャ/デコレータ"""
+        return _Timer(self, labels)
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return sum(state[:-1]) if state else 0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        samples = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                samples.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            samples.append(f'{self.name}_sum{labels} {_format_value(state[-1])}')
+            samples.append(f'{self.name}_count{labels} {cumulative}')
+        return samples
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # 同時呼び出しで開始時刻を共有しないよう、呼び出しごとにタイマーを作る
+            with _Timer(self.histogram, self.labels):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def render_latest():
+    """登録済みの全メトリクスをテキスト形式で出力"""
+    return '\n'.join(metric.render() for metric in _registry) + '\n'
+
+
+# ---- アプリ共通のメトリクス ----
+
+REQUEST_DURATION = Histogram(
+    'ohtani_http_request_duration_seconds', 'ルートごとのリクエスト処理時間',
+    ('route', 'method', 'status'))
+
+LOADER_DURATION = Histogram(
+    'ohtani_loader_duration_seconds', 'データ読み込み関数（load_*）の処理時間', ('loader',))
+
+PARSE_DURATION = Histogram(
+    'ohtani_parse_duration_seconds', 'データファイルごとのパース時間（CSV/JSON）', ('source', 'format'))
+
+RENDER_DURATION = Histogram(
+    'ohtani_render_duration_seconds', 'キャッシュミス時のHTML/JSON生成時間', ('view',))
+
+CACHE_REQUESTS = Counter(
+    'ohtani_cache_requests_total', 'キャッシュの参照回数', ('cache', 'result'))
+
+DISK_READ_BYTES = Counter(
+    'ohtani_disk_read_bytes_total', 'データファイルからの読み込みバイト数', ('source',))
+
+SNAPSHOT_AGE = Gauge('ohtani_snapshot_age_seconds', 'データスナップショットを読み込んでからの経過秒数')
+
+SNAPSHOT_INFO = Gauge('ohtani_snapshot_info', '現在のデータスナップショットのバージョン', ('version',))
+
+STATSAPI_REQUEST_DURATION = Histogram(
+    'ohtani_statsapi_request_duration_seconds', 'statsapi.mlb.comへのリクエスト時間（リトライ1回ごと）',
+    ('endpoint', 'status'))
+
+STATSAPI_RETRIES = Counter(
+    'ohtani_statsapi_retries_total', 'statsapi.mlb.comへのリトライ回数', ('endpoint', 'reason'))
+
+STATSAPI_RATE_LIMIT_WAIT = Histogram(
+    'ohtani_statsapi_rate_limit_wait_seconds', 'statsapiのレート制限でリクエスト前に待った時間',
+    ('endpoint',))
+
+STATSAPI_CONNECTIONS = Gauge(
+    'ohtani_statsapi_connections', 'statsapi.mlb.comへのHTTPリクエスト数と新規接続数（差分が接続の再利用）',
+    ('kind',))
+
+
+def timed_loader(func):
+    """load_*関数の処理時間を記録するデコレータ"""
+    return LOADER_DURATION.time(loader=func.__name__)(func)
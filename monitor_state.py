@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+"""
+監視ステータス管理
+templates/index.html が参照する /api/status 系の状態を各ワーカーのメモリ上に持ち、
+SQLiteファイルを介してgunicornの全ワーカーで共有する
+
+  monitor_state(id=1)
+    version      状態が変わるたびに1ずつ進む
+    status_json  /api/status でそのまま返すシリアライズ済みJSON（versionを含む）
+    owner        検出ループを動かしているプロセス（ホスト名:PID）
+    lease_until  ownerの検出ループの有効期限。ループが止まったまま期限が切れたら他のワーカーが引き継げる
+
+/api/status と SSE（/api/events）はロックで保護したメモリ上のJSONを返すだけで、I/Oは発生しない。
+状態の変更はファイルに書いてからメモリに反映し、他のワーカーの変更はプロセスごとの
+同期スレッドが SYNC_INTERVAL ごとにファイルから読み込んでメモリに反映する。
+
+SSEはワーカーのリクエスト用スレッドを占有するので、同時に開けるストリーム数を
+ワーカーごとに MAX_STREAMS 本までに制限する。上限に達したときは503を返し、ブラウザは
+/api/status のポーリングに切り替える（/readyz など他のルートにスレッドを残すため）。
+
+曲検出・レコメンデーション・プレイリスト作成は recordbox_detector.py / spotify_recommender.py が
+あれば get_monitor_state() で最初に作るときに登録する（無ければ各APIが未設定のエラーを返す）。
+
+設定（環境変数）:
+  MONITOR_STATE_DB     状態を置くSQLiteファイル
+  MONITOR_MAX_STREAMS  ワーカーごとのSSEストリームの上限
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+MONITOR_STATE_DB = os.environ.get('MONITOR_STATE_DB', 'data/cache/monitor_state.db')
+
+# ワーカーごとに同時に開けるSSEストリーム数（gunicornのスレッド数より少なくする）
+MAX_STREAMS = int(os.environ.get('MONITOR_MAX_STREAMS', 4))
+
+# SSEのキープアライブ間隔（秒）
+KEEPALIVE_INTERVAL = 15.0
+
+# SSEストリーム1本の最大継続時間（秒）。過ぎたら切断し、ブラウザに再接続させる
+STREAM_MAX_DURATION = 300.0
+
+# 同期スレッドが他のワーカーでの変更を読み込む間隔（秒）。同じワーカー内の変更はすぐに反映する
+SYNC_INTERVAL = 1.0
+
+# 検出ループの間隔（秒）
+DETECTION_INTERVAL = 5.0
+
+# 検出ループの有効期限（秒）。ループは1周ごとに延長する
+LEASE_DURATION = DETECTION_INTERVAL * 3
+
+# 他のプロセスが書き込み中のときに待つ最大秒数
+LOCK_TIMEOUT = 30
+
+_INITIAL_STATE = {
+    'is_monitoring': False,
+    'current_song': None,
+    'recommendations': [],
+    'last_detection': None,
+    'updated_at': None,
+}
+
+
+def _process_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class MonitorState:
+    """メモリ上の監視ステータスと、それを全ワーカーで共有するSQLiteファイル
+
+    状態を変えるたびにversionを進め、/api/status用のJSONも同じトランザクションで作り直す。
+    読み取り側はロックを取ってメモリ上の作成済みJSONを返すだけ。待機中のSSEストリームには
+    Conditionで変更を通知する。ファイルは最初に使うときに作る。
+    """
+
+    def __init__(self, path=MONITOR_STATE_DB, max_streams=MAX_STREAMS):
+        self.path = path
+        self.max_streams = max_streams
+        self._local = threading.local()
+        self._condition = threading.Condition()
+        self._streams = 0
+        self._version = 0
+        self._state = dict(_INITIAL_STATE)
+        self._status_json = json.dumps(dict(self._state, version=self._version), ensure_ascii=False).encode('utf-8')
+        self._sync_lock = threading.Lock()
+        self._sync_pid = None
+
+        # 曲検出・レコメンデーション・プレイリスト作成の処理（register_default_components()等で登録する）
+        self.detector = None
+        self.recommender = None
+        self.playlist_creator = None
+        self._monitor_thread = None
+
+    def _connect(self):
+        # sqlite3の接続はスレッドをまたいで使えないのでスレッドごとに持つ
+        # （preload_appでfork前に開いた接続はワーカーで使わない）
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS monitor_state ('
+                         'id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL, '
+                         'status_json TEXT NOT NULL, owner TEXT, lease_until REAL)')
+            status_json = json.dumps(dict(_INITIAL_STATE, version=1), ensure_ascii=False)
+            conn.execute('INSERT OR IGNORE INTO monitor_state (id, version, status_json) VALUES (1, 1, ?)',
+                         (status_json,))
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _apply(self, version, status_json):
+        """ファイルから読んだ（または書いた）状態をメモリに反映して通知（古いversionは無視）"""
+        with self._condition:
+            if version <= self._version:
+                return
+            state = json.loads(status_json)
+            del state['version']
+            self._version = version
+            self._state = state
+            self._status_json = status_json.encode('utf-8')
+            self._condition.notify_all()
+
+    def _load(self):
+        version, status_json = self._connect().execute(
+            'SELECT version, status_json FROM monitor_state WHERE id = 1').fetchone()
+        self._apply(version, status_json)
+
+    def start_sync(self):
+        """ファイルの状態を読み込み、このプロセスの同期スレッドを開始する（開始済みなら何もしない）
+
+        gunicornではpost_forkで呼ぶ。呼ばれていなければ最初に状態を参照したときに開始する。
+        """
+        with self._sync_lock:
+            if self._sync_pid == os.getpid():
+                return
+            self._load()
+            self._sync_pid = os.getpid()
+            threading.Thread(target=self._sync_loop, daemon=True).start()
+
+    def _sync_loop(self):
+        while True:
+            time.sleep(SYNC_INTERVAL)
+            try:
+                self._load()
+            except Exception as e:
+                print(f"監視ステータス同期エラー: {e}")
+
+    def _modify(self, change):
+        """1回のトランザクションで状態を読み、change(state, row) の結果で更新する
+
+        changeは (書き換えた状態またはNone, 戻り値) を返す。Noneなら状態は変えない。
+        rowは {'version', 'owner', 'lease_until'}。changeの中でrowのowner・lease_untilを書き換えてもよい。
+        """
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            version, status_json, owner, lease_until = conn.execute(
+                'SELECT version, status_json, owner, lease_until FROM monitor_state WHERE id = 1').fetchone()
+            state = json.loads(status_json)
+            del state['version']
+            row = {'version': version, 'owner': owner, 'lease_until': lease_until}
+            new_state, result = change(state, row)
+            if new_state is not None:
+                row['version'] = version + 1
+                new_state['updated_at'] = time.time()
+                status_json = json.dumps(dict(new_state, version=row['version']), ensure_ascii=False)
+            conn.execute('UPDATE monitor_state SET version = ?, status_json = ?, owner = ?, lease_until = ? '
+                         'WHERE id = 1', (row['version'], status_json, row['owner'], row['lease_until']))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        # このワーカーのメモリにはすぐに反映する（待機中のストリームにも通知される）
+        self._apply(row['version'], status_json)
+        return result
+
+    def update(self, **changes):
+        """状態を更新して待機中のストリームに通知"""
+        def change(state, row):
+            state.update(changes)
+            return state, None
+        self._modify(change)
+
+    def get(self, key):
+        """状態の値を取得（メモリ上の値）"""
+        self._ensure_sync()
+        with self._condition:
+            return self._state[key]
+
+    def _ensure_sync(self):
+        if self._sync_pid != os.getpid():
+            self.start_sync()
+
+    def status(self):
+        """(version, シリアライズ済みステータスJSON) を返す（メモリ上の値。I/Oは発生しない）"""
+        self._ensure_sync()
+        with self._condition:
+            return self._version, self._status_json
+
+    def wait_for_change(self, last_version, timeout=KEEPALIVE_INTERVAL):
+        """versionがlast_versionから進むまで待機（タイムアウト時はNone）"""
+        self._ensure_sync()
+        with self._condition:
+            changed = self._condition.wait_for(lambda: self._version != last_version, timeout=timeout)
+            if not changed:
+                return None
+            return self._version, self._status_json
+
+    def open_stream(self):
+        """SSEストリームの枠を1つ確保する（上限に達していればFalse）"""
+        with self._condition:
+            if self._streams >= self.max_streams:
+                return False
+            self._streams += 1
+            return True
+
+    def close_stream(self):
+        """open_stream()で確保した枠を返す"""
+        with self._condition:
+            self._streams = max(self._streams - 1, 0)
+
+    def event_stream(self, max_duration=STREAM_MAX_DURATION):
+        """Server-Sent Eventsの本文を生成（変更があるたびにステータスを送る）"""
+        version, status_json = self.status()
+        yield f"retry: 3000\nid: {version}\ndata: ".encode('utf-8') + status_json + b"\n\n"
+        deadline = time.monotonic() + max_duration
+        while time.monotonic() < deadline:
+            changed = self.wait_for_change(version, timeout=min(KEEPALIVE_INTERVAL, deadline - time.monotonic()))
+            if changed is None:
+                yield b": keepalive\n\n"
+                continue
+            version, status_json = changed
+            yield f"id: {version}\ndata: ".encode('utf-8') + status_json + b"\n\n"
+
+    def start_monitoring(self):
+        """検出ループを開始（開始できたらTrue）
+
+        他のワーカーが監視中でも、そのループの有効期限が切れていれば（プロセスが落ちた等）引き継ぐ。
+        """
+        if self.detector is None:
+            return False
+        me = _process_id()
+
+        def change(state, row):
+            now = time.time()
+            if state['is_monitoring'] and row['lease_until'] is not None and row['lease_until'] > now:
+                return None, False
+            row['owner'] = me
+            row['lease_until'] = now + LEASE_DURATION
+            state['is_monitoring'] = True
+            return state, True
+
+        if not self._modify(change):
+            return False
+        self._monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
+        self._monitor_thread.start()
+        return True
+
+    def stop_monitoring(self):
+        """検出ループを停止（停止できたらTrue）。ループを動かしているワーカーは次の周で抜ける"""
+        def change(state, row):
+            if not state['is_monitoring']:
+                return None, False
+            row['owner'] = None
+            row['lease_until'] = None
+            state['is_monitoring'] = False
+            return state, True
+        return self._modify(change)
+
+    def detect(self):
+        """曲検出を一度実行して結果を状態に反映（(検出結果の辞書, 曲が変わったか) を返す）"""
+        song_info = self.detector()
+
+        def change(state, row):
+            if not song_info or song_info == state['current_song']:
+                return None, False
+            state['current_song'] = song_info
+            state['last_detection'] = time.time()
+            return state, True
+        return song_info, self._modify(change)
+
+    def refresh_recommendations(self):
+        """現在の曲のレコメンデーションを取得し直す（件数を返す）"""
+        recommendations = self.recommender(self.get('current_song')) or []
+        self.update(recommendations=recommendations)
+        return len(recommendations)
+
+    def _renew_lease(self, me):
+        """自分が監視中のownerなら有効期限を延長してTrue（停止・引き継ぎ済みならFalse）"""
+        def change(state, row):
+            if not state['is_monitoring'] or row['owner'] != me:
+                return None, False
+            row['lease_until'] = time.time() + LEASE_DURATION
+            return None, True
+        return self._modify(change)
+
+    def _monitor_loop(self):
+        me = _process_id()
+        # 停止・他のワーカーへの引き継ぎ後や、停止後すぐに再開された場合、古いスレッドはここで抜ける
+        while threading.current_thread() is self._monitor_thread and self._renew_lease(me):
+            try:
+                _, changed = self.detect()
+                if changed and self.recommender is not None:
+                    self.refresh_recommendations()
+            except Exception as e:
+                print(f"曲検出エラー: {e}")
+            time.sleep(DETECTION_INTERVAL)
+
+
+def register_default_components(state):
+    """recordbox_detector.py / spotify_recommender.py があれば曲検出・レコメンデーション・
+    プレイリスト作成を登録する（登録したものの名前のリストを返す）"""
+    registered = []
+    try:
+        from recordbox_detector import RecordBoxDetector
+    except ImportError:  # Record Box検出モジュールが無い環境では曲検出なし
+        RecordBoxDetector = None
+    try:
+        from spotify_recommender import SpotifyRecommender
+    except ImportError:  # Spotify連携モジュールが無い環境ではレコメンデーションなし
+        SpotifyRecommender = None
+
+    if RecordBoxDetector is not None:
+        try:
+            state.detector = RecordBoxDetector().get_current_song
+            registered.append('detector')
+        except Exception as e:
+            print(f"⚠️ Record Box検出モジュールの初期化エラー: {e}")
+    if SpotifyRecommender is not None:
+        try:
+            recommender = SpotifyRecommender()
+            state.recommender = recommender.get_recommendations
+            state.playlist_creator = recommender.create_playlist
+            registered += ['recommender', 'playlist_creator']
+        except Exception as e:
+            print(f"⚠️ Spotify連携モジュールの初期化エラー: {e}")
+    return registered
+
+
+_monitor_state = None
+_monitor_state_lock = threading.Lock()
+
+
+def get_monitor_state():
+    """プロセス共有の監視ステータスを取得（最初に使うときに作り、曲検出等を登録する）"""
+    global _monitor_state
+    if _monitor_state is None:
+        with _monitor_state_lock:
+            if _monitor_state is None:
+                state = MonitorState()
+                register_default_components(state)
+                _monitor_state = state
+    return _monitor_state
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Plotly.jsバンドル管理
+バージョン固定のPlotly.js部分バンドル（plotly-basic）を自前で配信する（CDNの plotly-latest は使わない）
+
+plotly-basic は scatter・bar・pie のトレースだけを含む公式の部分バンドル（約1MB）。
+このアプリの図は scatter だけなので、パッケージ同梱の全トレース版（約3.5MB）は配信しない。
+
+デプロイ時（gunicornのon_starting・静的サイト書き出し）に ensure_vendored_bundle() で
+static/vendor/plotly-basic-<version>.min.js と圧縮版（.gz/.br）を用意し、用意できなければ例外で止める。
+開発サーバーなどで用意していない場合、ページはバージョン固定のCDNの同じバンドルを参照する。
+"""
+
+import os
+import sys
+
+import requests
+
+from http_cache import compress_variants
+
+# plotly==5.17.0 に同梱されているPlotly.jsのバージョン
+PLOTLY_JS_VERSION = '2.26.0'
+
+VENDOR_DIR = 'static/vendor'
+BASIC_BUNDLE = f'plotly-basic-{PLOTLY_JS_VERSION}.min.js'
+BASIC_BUNDLE_URL = f'https://cdn.plot.ly/{BASIC_BUNDLE}'
+
+
+def resolve_bundle():
+    """static/vendorから配信するバンドルの (ファイル名, パス) を返す（無ければNone）"""
+    path = os.path.join(VENDOR_DIR, BASIC_BUNDLE)
+    return (BASIC_BUNDLE, path) if os.path.exists(path) else None
+
+
+def bundle_url():
+    """ページから参照するPlotly.jsのURL"""
+    bundle = resolve_bundle()
+    if bundle is None:
+        # 自前で配信できない場合もバージョン固定のCDNを使う
+        return BASIC_BUNDLE_URL
+    return f'/static/vendor/{bundle[0]}'
+
+
+def _write_bundle(path, body):
+    """バンドルと圧縮版（.gz/.br）を書き出す"""
+    variants = compress_variants(body)
+    for encoding, suffix in (('identity', ''), ('gzip', '.gz'), ('br', '.br')):
+        variant = variants.get(encoding)
+        if variant is None:
+            continue
+        tmp_path = f"{path}{suffix}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(variant)
+        os.replace(tmp_path, path + suffix)
+
+
+def ensure_vendored_bundle():
+    """static/vendorに圧縮版付きの部分バンドルが無ければ取得する（取得できなければRuntimeError）"""
+    bundle = resolve_bundle()
+    if bundle is not None and os.path.exists(f"{bundle[1]}.gz"):
+        return bundle[1]
+    path = vendor_basic_bundle()
+    if path is None:
+        raise RuntimeError(f"Plotly.js部分バンドル {BASIC_BUNDLE} を用意できません"
+                           f"（python3 plotly_assets.py で static/vendor に取得してください）")
+    return path
+
+
+def vendor_basic_bundle():
+    """部分バンドルを圧縮版付きでstatic/vendorに取得（失敗したらNone）"""
+    os.makedirs(VENDOR_DIR, exist_ok=True)
+    path = os.path.join(VENDOR_DIR, BASIC_BUNDLE)
+    try:
+        response = requests.get(BASIC_BUNDLE_URL, timeout=30)
+        response.raise_for_status()
+        _write_bundle(path, response.content)
+        print(f"✅ Plotly.js部分バンドルを保存しました: {path} ({len(response.content) // 1024}KB)")
+        return path
+    except requests.exceptions.RequestException as e:
+        print(f"❌ 部分バンドルの取得に失敗しました: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    sys.exit(0 if vendor_basic_bundle() else 1)
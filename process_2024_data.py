@@ -6,52 +6,38 @@
 
 import pandas as pd
 import json
-import ast
 from datetime import datetime
 
-def parse_stat_dict(stat_str):
-    """統計辞書文字列をパース"""
-    try:
-        # 文字列を辞書に変換
-        stat_dict = ast.literal_eval(stat_str)
-        return stat_dict
-    except:
-        return {}
+from game_log_store import read_game_logs
+
+PLAYER_ID = 660271  # 大谷翔平のMLB ID
+
+# 集計に使う列（必要な列だけ読み込む）
+SUM_COLUMNS = ['hits', 'at_bats', 'home_runs', 'rbi', 'runs', 'stolen_bases',
+               'walks', 'strikeouts', 'doubles', 'triples']
 
 def calculate_2024_stats():
     """2024年の統計を計算"""
     try:
-        # 2024年打撃ゲームログを読み込み
-        df = pd.read_csv('data/raw/ohtani_batting_gamelogs_2024.csv')
+        # 2024年打撃ゲームログを読み込み（取り込み時に型付きの列に展開済み）
+        df = read_game_logs('data/raw/ohtani_batting_gamelogs_2024.csv', 'hitting', 2024, PLAYER_ID,
+                            columns=SUM_COLUMNS)
         
         print(f"📊 2024年ゲームログ: {len(df)}試合")
         
         # 統計を集計
+        totals = df.sum()
         total_games = len(df)
-        total_hits = 0
-        total_at_bats = 0
-        total_home_runs = 0
-        total_rbi = 0
-        total_runs = 0
-        total_stolen_bases = 0
-        total_walks = 0
-        total_strikeouts = 0
-        total_doubles = 0
-        total_triples = 0
-        
-        for _, row in df.iterrows():
-            stat_dict = parse_stat_dict(row['stat'])
-            
-            total_hits += stat_dict.get('hits', 0)
-            total_at_bats += stat_dict.get('atBats', 0)
-            total_home_runs += stat_dict.get('homeRuns', 0)
-            total_rbi += stat_dict.get('rbi', 0)
-            total_runs += stat_dict.get('runs', 0)
-            total_stolen_bases += stat_dict.get('stolenBases', 0)
-            total_walks += stat_dict.get('baseOnBalls', 0)
-            total_strikeouts += stat_dict.get('strikeOuts', 0)
-            total_doubles += stat_dict.get('doubles', 0)
-            total_triples += stat_dict.get('triples', 0)
+        total_hits = int(totals['hits'])
+        total_at_bats = int(totals['at_bats'])
+        total_home_runs = int(totals['home_runs'])
+        total_rbi = int(totals['rbi'])
+        total_runs = int(totals['runs'])
+        total_stolen_bases = int(totals['stolen_bases'])
+        total_walks = int(totals['walks'])
+        total_strikeouts = int(totals['strikeouts'])
+        total_doubles = int(totals['doubles'])
+        total_triples = int(totals['triples'])
         
         # 打率計算
         batting_avg = total_hits / total_at_bats if total_at_bats > 0 else 0.0
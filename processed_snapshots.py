@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+data/processed のバージョン付きスナップショット
+日次バッチが data/processed に書き出した成果物を data/snapshots/<バージョン>/ に
+まとめてコピーし、内容ハッシュのマニフェストを付けてから CURRENT の差し替え（rename）で公開する。
+Webアプリは公開中のバージョンだけを読むので、書き込み途中のファイルが見えることはない。
+
+  data/snapshots/
+    CURRENT                       公開中のバージョン名
+    20250901-140512-1a2b3c4d/
+      manifest.json               {"version", "created_at", "files": {ファイル名: {"sha256", "size"}}}
+      dodgers_games_2025.json
+      ...
+
+前のバージョンと同じ内容のファイルはハードリンクで共有し、全ファイルが同じなら公開しない。
+公開済みのバージョンは書き換えないので、読む側はハッシュが変わっていないファイルを読み直さなくてよい。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+
+PROCESSED_DIR = 'data/processed'
+SNAPSHOTS_DIR = os.environ.get('PROCESSED_SNAPSHOTS_DIR', 'data/snapshots')
+CURRENT_NAME = 'CURRENT'
+MANIFEST_NAME = 'manifest.json'
+
+# 残しておくバージョン数（読み込み中のワーカーが古いバージョンを開いていても消さないように）
+KEEP_VERSIONS = 5
+
+
+def _is_processed(path, source_dir=PROCESSED_DIR):
+    return os.path.normpath(os.path.dirname(path)) == os.path.normpath(source_dir)
+
+
+def current_version(directory=SNAPSHOTS_DIR):
+    """公開中のバージョン名（未公開ならNone）"""
+    try:
+        with open(os.path.join(directory, CURRENT_NAME), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def load_manifest(version, directory=SNAPSHOTS_DIR):
+    """バージョンのマニフェスト（読めなければNone）"""
+    try:
+        with open(os.path.join(directory, version, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def current_manifest(directory=SNAPSHOTS_DIR):
+    """公開中のバージョンのマニフェスト（未公開ならNone）"""
+    version = current_version(directory)
+    return load_manifest(version, directory) if version else None
+
+
+def resolve(path, manifest, directory=SNAPSHOTS_DIR):
+    """data/processed/<ファイル名> を manifest のバージョン内のパスにする（含まれなければそのまま）"""
+    if manifest is None or not _is_processed(path):
+        return path
+    name = os.path.basename(path)
+    if name not in manifest['files']:
+        return path
+    return os.path.join(directory, manifest['version'], name)
+
+
+def file_hash(path, manifest):
+    """data/processed/<ファイル名> の manifest 上のsha256（含まれなければNone）"""
+    if manifest is None or not _is_processed(path):
+        return None
+    entry = manifest['files'].get(os.path.basename(path))
+    return entry['sha256'] if entry else None
+
+
+def _collect(source_dir):
+    """source_dir直下のファイルを {ファイル名: 内容} で返す（一時ファイルは除く）"""
+    files = {}
+    for name in sorted(os.listdir(source_dir)):
+        path = os.path.join(source_dir, name)
+        if name.startswith('.') or name.endswith('.tmp') or not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            files[name] = f.read()
+    return files
+
+
+def _write_pointer(directory, version):
+    pointer_path = os.path.join(directory, CURRENT_NAME)
+    with open(f"{pointer_path}.tmp", 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(f"{pointer_path}.tmp", pointer_path)
+
+
+def _prune(directory, keep, current):
+    def published_at(name):
+        try:
+            return os.stat(os.path.join(directory, name, MANIFEST_NAME)).st_mtime_ns
+        except OSError:
+            return 0
+
+    # 同じ秒に公開したバージョンは名前順が公開順にならないのでマニフェストの更新時刻で並べる
+    versions = sorted((name for name in os.listdir(directory)
+                       if not name.startswith('.') and os.path.isdir(os.path.join(directory, name))),
+                      key=published_at)
+    for name in versions[:-keep] if keep else []:
+        if name != current:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def publish(source_dir=PROCESSED_DIR, directory=SNAPSHOTS_DIR, keep=KEEP_VERSIONS):
+    """source_dirの内容を新しいバージョンとして公開し、公開中のバージョン名を返す
+
+    内容が公開中のバージョンと同じなら何もしない。
+    """
+    files = _collect(source_dir)
+    entries = {name: {'sha256': hashlib.sha256(body).hexdigest(), 'size': len(body)}
+               for name, body in files.items()}
+    previous = current_manifest(directory)
+    if previous is not None and previous['files'] == entries:
+        print(f"✅ data/processed に変更はありません（{previous['version']}）")
+        return previous['version']
+
+    digest = hashlib.sha256(json.dumps(entries, sort_keys=True).encode('utf-8')).hexdigest()
+    version = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{digest[:8]}"
+    staging = os.path.join(directory, f".{version}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    shared = 0
+    for name, body in files.items():
+        target = os.path.join(staging, name)
+        if previous is not None and previous['files'].get(name) == entries[name]:
+            # 変わっていないファイルは前のバージョンとハードリンクで共有する
+            try:
+                os.link(os.path.join(directory, previous['version'], name), target)
+                shared += 1
+                continue
+            except OSError:
+                pass
+        with open(target, 'wb') as f:
+            f.write(body)
+    manifest = {
+        'version': version,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'files': entries,
+    }
+    with open(os.path.join(staging, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    # ディレクトリごとrenameしてからCURRENTを差し替える（どちらもアトミック）
+    os.rename(staging, os.path.join(directory, version))
+    _write_pointer(directory, version)
+    _prune(directory, keep, version)
+    print(f"✅ data/processed を公開しました: {version}（{len(files)}ファイル, うち変更{len(files) - shared}件）")
+    return version
+
+
+def main():
+    """メイン実行関数"""
+    try:
+        publish()
+        return True
+    except Exception as e:
+        print(f"❌ スナップショット公開エラー: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
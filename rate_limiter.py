@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+プロセス間で共有するトークンバケット方式のレート制限
+バケットの状態（残りトークン数と更新時刻）をSQLiteファイルに置き、日次バッチ・
+バックフィル・手動実行など同時に動く全プロセスが同じバケットからトークンを取る
+
+acquire() は1回のトランザクション（BEGIN IMMEDIATE）で補充と予約を行う。
+トークンが足りないときは残りを負にして予約し、自分の番が来るまで待つので、
+待っているプロセス同士で順番が入れ替わらない。
+
+設定（環境変数）:
+  STATSAPI_RATE_LIMIT     1秒あたりのリクエスト数（0でレート制限なし）
+  STATSAPI_RATE_BURST     連続で送れるリクエスト数（バケットの容量）
+  STATSAPI_RATE_LIMIT_DB  状態を置くSQLiteファイル
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from metrics import STATSAPI_RATE_LIMIT_WAIT
+
+RATE_LIMIT = float(os.environ.get('STATSAPI_RATE_LIMIT', '10'))
+RATE_BURST = float(os.environ.get('STATSAPI_RATE_BURST', '20'))
+RATE_LIMIT_DB = os.environ.get('STATSAPI_RATE_LIMIT_DB', 'data/cache/statsapi_rate_limit.db')
+
+# 他のプロセスがロックを持っている間に待つ最大秒数
+LOCK_TIMEOUT = 30
+
+
+class TokenBucket:
+    """SQLiteに状態を置くトークンバケット（スレッド・プロセス間で共有可能）"""
+
+    def __init__(self, path=RATE_LIMIT_DB, rate=RATE_LIMIT, burst=RATE_BURST, name='statsapi'):
+        if rate <= 0:
+            raise ValueError("rateは正の値を指定してください")
+        self.path = path
+        self.rate = float(rate)
+        self.burst = max(float(burst), 1.0)
+        self.name = name
+        self._local = threading.local()
+        self._waited = 0.0
+        self._waits = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS buckets ('
+                         'name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)')
+
+    def _connect(self):
+        # sqlite3の接続はスレッドをまたいで使えないのでスレッドごとに持つ
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def reserve(self, tokens=1):
+        """tokens個を予約し、使えるようになるまでの秒数を返す（待たない）"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated_at FROM buckets WHERE name = ?', (self.name,)).fetchone()
+            if row is None:
+                available = self.burst
+            else:
+                # 前回からの経過時間分を補充（時計が戻った場合は補充しない）
+                available = min(self.burst, row[0] + max(now - row[1], 0.0) * self.rate)
+            available -= tokens
+            conn.execute('INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)',
+                         (self.name, available, now))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return max(-available / self.rate, 0.0)
+
+    def acquire(self, tokens=1, endpoint=''):
+        """tokens個を取得する（足りなければ待つ）。待った秒数を返す"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+            with self._lock:
+                self._waited += delay
+                self._waits += 1
+        STATSAPI_RATE_LIMIT_WAIT.observe(delay, endpoint=endpoint)
+        return delay
+
+    def wait_stats(self):
+        """このプロセスで待った回数と合計秒数 {'waits': 回数, 'seconds': 秒数}"""
+        with self._lock:
+            return {'waits': self._waits, 'seconds': self._waited}
+
+
+def main():
+    """現在のバケットの状態を表示"""
+    bucket = TokenBucket()
+    row = bucket._connect().execute('SELECT tokens, updated_at FROM buckets WHERE name = ?',
+                                    (bucket.name,)).fetchone()
+    print(f"🪣 {bucket.path}: {bucket.rate:g} req/s, 容量{bucket.burst:g}")
+    if row is None:
+        print("まだ使われていません")
+        return
+    tokens = min(bucket.burst, row[0] + max(time.time() - row[1], 0.0) * bucket.rate)
+    print(f"現在のトークン: {tokens:.1f}")
+
+
+if __name__ == "__main__":
+    main()
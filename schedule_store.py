@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+試合スケジュールストア
+チームのシーズン日程を試合単位（gamePkで索引）で保存し、2回目以降は状態が変わり得る
+試合（未完了の試合）の日付範囲だけをstatsapiに問い合わせて更新する
+
+索引:
+  games        {gamePk: 試合レコード}
+  _by_time     試合開始時刻順の (gameDate, gamePk) リスト（bisectで次の試合・日付範囲を探す）
+  _by_date     {officialDate: [gamePk, ...]}
+  _state_count {abstractGameState: 試合数}（完了数・残り数はO(1)）
+"""
+
+import bisect
+import json
+import os
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+import pandas as pd
+
+from game_log_store import write_partition
+from statsapi_client import get_client
+
+SCHEDULE_FIELDS = ('dates,date,games,gamePk,gameDate,officialDate,status,abstractGameState,detailedState,'
+                   'teams,away,home,team,id,name,doubleHeader,gameNumber')
+
+# 全件を取り直す間隔（日程変更・追加試合を拾うため）
+FULL_REFRESH_INTERVAL = timedelta(days=7)
+
+# 未完了の試合に加えて先読みする日数（延期・中止の反映）
+LOOKAHEAD_DAYS = 1
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+def _game_record(game, team_id):
+    teams = game.get('teams', {})
+    home_team = teams.get('home', {}).get('team', {})
+    away_team = teams.get('away', {}).get('team', {})
+    is_home = home_team.get('id') == team_id
+    opponent = away_team if is_home else home_team
+    status = game.get('status', {})
+    return {
+        'game_pk': game['gamePk'],
+        'game_date': game.get('gameDate', ''),
+        'official_date': game.get('officialDate') or game.get('gameDate', '')[:10],
+        'abstract_state': status.get('abstractGameState', ''),
+        'detailed_state': status.get('detailedState', ''),
+        'home_away': 'home' if is_home else 'away',
+        'opponent': opponent.get('name', ''),
+        'opponent_id': opponent.get('id'),
+        'double_header': game.get('doubleHeader', 'N'),
+        'game_number': game.get('gameNumber', 1),
+    }
+
+
+class ScheduleStore:
+    """1チーム・1シーズンの試合スケジュール"""
+
+    def __init__(self, team_id, season, path):
+        self.team_id = team_id
+        self.season = season
+        self.path = path
+        self.games = {}
+        self.full_refreshed_at = None
+        self.updated_at = None
+        self._rebuild_index()
+
+    # ---- 永続化 ----
+
+    @classmethod
+    def load(cls, team_id, season, path):
+        """保存済みのストアを読み込み（無い・別チーム/シーズンなら空）"""
+        store = cls(team_id, season, path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return store
+        if data.get('team_id') != team_id or data.get('season') != season:
+            return store
+        store.games = {int(game_pk): game for game_pk, game in data.get('games', {}).items()}
+        store.full_refreshed_at = data.get('full_refreshed_at')
+        store.updated_at = data.get('updated_at')
+        store._rebuild_index()
+        return store
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        data = {
+            'team_id': self.team_id,
+            'season': self.season,
+            'full_refreshed_at': self.full_refreshed_at,
+            'updated_at': self.updated_at,
+            'games': {str(game_pk): game for game_pk, game in sorted(self.games.items())},
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+        # 集計・グラフ用に列指向のテーブルにも書き出す（pyarrowが無ければ何もしない）
+        if self.games:
+            rows = [self.games[game_pk] for _, game_pk in self._by_time]
+            write_partition(pd.DataFrame(rows), 'schedule', {'season': self.season, 'team_id': self.team_id})
+
+    # ---- 索引 ----
+
+    def _rebuild_index(self):
+        self._by_time = sorted((game['game_date'], game_pk) for game_pk, game in self.games.items())
+        self._by_date = {}
+        for _, game_pk in self._by_time:
+            self._by_date.setdefault(self.games[game_pk]['official_date'], []).append(game_pk)
+        self._state_count = Counter(game['abstract_state'] for game in self.games.values())
+
+    def _upsert(self, records):
+        """レコードを反映して索引を更新（変更された試合数を返す）"""
+        changed = 0
+        for record in records:
+            if self.games.get(record['game_pk']) != record:
+                self.games[record['game_pk']] = record
+                changed += 1
+        if changed:
+            self._rebuild_index()
+        return changed
+
+    # ---- 参照 ----
+
+    def total_games(self):
+        return len(self.games)
+
+    def completed_games(self):
+        return self._state_count.get('Final', 0)
+
+    def remaining_games(self):
+        return self.total_games() - self.completed_games()
+
+    def games_on(self, day):
+        """指定日（date または 'YYYY-MM-DD'）の試合"""
+        key = day.isoformat() if isinstance(day, date) else day
+        return [self.games[game_pk] for game_pk in self._by_date.get(key, [])]
+
+    def next_game(self, now=None):
+        """現在時刻以降で最初の未完了の試合（無ければNone）"""
+        now = (now or _utcnow()).strftime('%Y-%m-%dT%H:%M:%SZ')
+        index = bisect.bisect_left(self._by_time, (now,))
+        for _, game_pk in self._by_time[index:]:
+            game = self.games[game_pk]
+            if game['abstract_state'] != 'Final':
+                return game
+        return None
+
+    def pending_window(self, today):
+        """状態が変わり得る試合の日付範囲 (開始日, 終了日)。無ければNone"""
+        pending = [game['official_date'] for game in self.games.values()
+                   if game['abstract_state'] != 'Final' and game['official_date'] <= today.isoformat()]
+        if not pending:
+            return None
+        return min(pending), (today + timedelta(days=LOOKAHEAD_DAYS)).isoformat()
+
+    # ---- 更新 ----
+
+    def _fetch(self, client, start_date=None, end_date=None):
+        params = {
+            'sportId': 1,
+            'teamId': self.team_id,
+            'season': self.season,
+            'gameType': 'R',
+            'fields': SCHEDULE_FIELDS,
+        }
+        if start_date:
+            params['startDate'] = start_date
+            params['endDate'] = end_date
+        # 状態を確認するための取得なのでディスクキャッシュは使わず、試合を1件ずつ読む
+        games = client.iter_items('schedule', 'dates.item.games.item', params=params)
+        return [_game_record(game, self.team_id) for game in games]
+
+    def refresh(self, client=None, today=None, full=False):
+        """スケジュールを更新して変更された試合数を返す
+
+        初回・FULL_REFRESH_INTERVAL経過後・full=Trueならシーズン全体、それ以外は
+        未完了の試合の日付範囲だけを取得する（該当が無ければリクエストしない）。
+        """
+        client = client or get_client()
+        now = _utcnow()
+        today = today or date.today()
+        last_full = datetime.fromisoformat(self.full_refreshed_at) if self.full_refreshed_at else None
+        if full or not self.games or last_full is None or now - last_full >= FULL_REFRESH_INTERVAL:
+            print(f"📅 {self.season}年の日程を全件取得中...")
+            records = self._fetch(client)
+            # 全件取得では日程から消えた試合も除く
+            self.games = {}
+            changed = self._upsert(records)
+            self.full_refreshed_at = now.isoformat(timespec='seconds')
+        else:
+            window = self.pending_window(today)
+            if window is None:
+                print("📅 状態が変わり得る試合はありません")
+                return 0
+            print(f"📅 {window[0]} 〜 {window[1]} の試合を更新中...")
+            changed = self._upsert(self._fetch(client, *window))
+        self.updated_at = now.isoformat(timespec='seconds')
+        self.save()
+        return changed
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+共有スナップショットファイル
+データのビューとレンダリング済み・圧縮済みのレスポンスを1つのファイルにまとめ、
+各ワーカーが読み取り専用でmmapする（同じページキャッシュを全ワーカーで共有する）
+
+ファイル形式:
+  MAGIC(8バイト) | インデックス長(8バイト, ビッグエンディアン) | インデックス(JSON) | 本文...
+インデックスには version・views（stats_storeのビュー）・entries（キャッシュキーごとの
+エンコーディング別 [オフセット, 長さ]）を持つ。オフセットは本文領域の先頭からの位置。
+
+書き出しは一時ファイル＋renameで行い、CURRENTファイルの差し替えで公開する。
+ワーカーは次回の確認時に新しいファイルをmmapし直す（古いマッピングは参照が無くなれば閉じる）。
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_FILE_DIR', 'data/cache/snapshot')
+CURRENT_NAME = 'CURRENT'
+
+MAGIC = b'OHTSNAP1'
+_HEADER = struct.Struct('>8sQ')
+
+_current = None
+_current_pointer = None
+_lock = threading.Lock()
+
+
+def entry_key(key):
+    """http_cacheのキャッシュキー (ビュー名, kwargs) を文字列に変換"""
+    view_name, kwargs = key
+    return json.dumps([view_name, [list(item) for item in kwargs]], ensure_ascii=False)
+
+
+class MappedSnapshot:
+    """読み取り専用でmmapしたスナップショットファイル"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            # ファイルを閉じてもマッピングは有効
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_length = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"スナップショットファイルの形式が不正です: {path}")
+        index_start = _HEADER.size
+        self._data_start = index_start + index_length
+        index = json.loads(self._mmap[index_start:self._data_start])
+        self.version = index['version']
+        self.views = index['views']
+        self._entries = index['entries']
+        self._buffer = memoryview(self._mmap)
+
+    def entry(self, key):
+        """キャッシュキーに対応する {'variants', 'etag', 'mimetype'} を返す（無ければNone）
+
+        variantsの値はマッピング上のmemoryview（コピーしない）。
+        """
+        meta = self._entries.get(entry_key(key))
+        if meta is None:
+            return None
+        variants = {
+            encoding: self._buffer[self._data_start + offset:self._data_start + offset + length]
+            for encoding, (offset, length) in meta['variants'].items()
+        }
+        return {'variants': variants, 'etag': meta['etag'], 'mimetype': meta['mimetype']}
+
+
+def write_snapshot_file(version, views, entries, directory=SNAPSHOT_DIR):
+    """スナップショットファイルを書き出してCURRENTを差し替える
+
+    entriesは {キャッシュキー: (variants, etag, mimetype)}。
+    """
+    os.makedirs(directory, exist_ok=True)
+    index_entries = {}
+    chunks = []
+    offset = 0
+    for key, (variants, etag, mimetype) in entries.items():
+        positions = {}
+        for encoding, body in variants.items():
+            positions[encoding] = [offset, len(body)]
+            chunks.append(body)
+            offset += len(body)
+        index_entries[entry_key(key)] = {'variants': positions, 'etag': etag, 'mimetype': mimetype}
+
+    index = json.dumps({'version': version, 'views': views, 'entries': index_entries},
+                       ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    filename = f"snapshot-{version}.bin"
+    path = os.path.join(directory, filename)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(index)))
+        f.write(index)
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp_path, path)
+
+    pointer_path = os.path.join(directory, CURRENT_NAME)
+    with open(f"{pointer_path}.tmp", 'w', encoding='utf-8') as f:
+        f.write(filename)
+    os.replace(f"{pointer_path}.tmp", pointer_path)
+
+    # 古いファイルを削除（mmap済みのワーカーはunlink後もそのまま読める）
+    for name in os.listdir(directory):
+        if name.startswith('snapshot-') and name != filename:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+    return path
+
+
+def current_mapping(directory=SNAPSHOT_DIR):
+    """公開中のスナップショットファイルのマッピングを返す（無ければNone）
+
+    CURRENTが書き換えられていれば新しいファイルをmmapして差し替える。
+    """
+    global _current, _current_pointer
+    pointer_path = os.path.join(directory, CURRENT_NAME)
+    try:
+        st = os.stat(pointer_path)
+    except OSError:
+        return None
+    pointer = (pointer_path, st.st_mtime_ns, st.st_size)
+    if pointer == _current_pointer:
+        return _current
+
+    with _lock:
+        if pointer != _current_pointer:
+            try:
+                with open(pointer_path, 'r', encoding='utf-8') as f:
+                    filename = f.read().strip()
+                mapped = MappedSnapshot(os.path.join(directory, filename))
+            except (OSError, ValueError) as e:
+                print(f"スナップショットファイル読み込みエラー: {e}")
+                mapped = None
+            # 古いマッピングは使用中のmemoryviewが無くなった時点で解放される
+            _current, _current_pointer = mapped, pointer
+        return _current
+
+
+def lookup(version, key=None):
+    """指定バージョンのマッピング（keyを渡した場合はそのエントリ）を返す"""
+    mapped = current_mapping()
+    if mapped is None or mapped.version != version:
+        return None
+    return mapped if key is None else mapped.entry(key)
+
+
+def build_snapshot_file(app, directory=SNAPSHOT_DIR):
+    """アプリのキャッシュ対象ルートをすべてレンダリングしてスナップショットファイルを作成"""
+    from http_cache import export_render_cache
+    from stats_store import snapshot_views, stats_store
+
+    snapshot = stats_store.snapshot()
+    client = app.test_client()
+    for rule in app.url_map.iter_rules():
+        view = app.view_functions.get(rule.endpoint)
+        if rule.arguments or 'GET' not in rule.methods or not getattr(view, 'render_cached', False):
+            continue
+        response = client.get(rule.rule)
+        if response.status_code != 200:
+            print(f"⚠️ {rule.rule} のレンダリングに失敗しました: {response.status_code}")
+
+    entries = export_render_cache(snapshot.version)
+    path = write_snapshot_file(snapshot.version, snapshot_views(snapshot), entries, directory)
+    print(f"✅ スナップショットファイルを作成しました: {path}（{len(entries)}件, {os.path.getsize(path) // 1024}KB）")
+    return path
+
+
+def main():
+    """メイン実行関数"""
+    try:
+        from test_app import app
+        build_snapshot_file(app)
+        return True
+    except Exception as e:
+        print(f"❌ スナップショットファイル作成エラー: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
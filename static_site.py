@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+静的サイト書き出し
+全ページを data/site/ に事前レンダリングし、.gz/.br の圧縮済みファイルと
+内容ハッシュ付きのアセット名で保存する（nginxまたはFlaskからそのまま配信できる）
+"""
+
+import hashlib
+import json
+import mimetypes
+import os
+from datetime import datetime
+
+from flask import send_file
+from werkzeug.security import safe_join
+
+import processed_snapshots
+from http_cache import compress_variants, negotiate_encoding
+from plotly_assets import ensure_vendored_bundle
+
+SITE_DIR = 'data/site'
+STATIC_DIR = 'static'
+MANIFEST_NAME = 'manifest.json'
+
+# アプリからレンダリングするページ {URLパス: 出力ファイル}
+APP_PAGES = {
+    '/': 'index.html',
+    '/home-run-comparison': 'home-run-comparison/index.html',
+}
+
+# アプリから書き出すJSON（ページがfetchするものを含む） {URLパス: 出力ファイル}
+# nginxでは try_files で $uri/index.json も探す
+APP_DATA = {
+    '/api/v1/season-summary': 'api/v1/season-summary/index.json',
+    '/api/v1/home-runs/weekly': 'api/v1/home-runs/weekly/index.json',
+    '/api/v1/prediction': 'api/v1/prediction/index.json',
+    '/api/v1/home-runs/figure': 'api/v1/home-runs/figure/index.json',
+}
+
+# 日次バッチが生成済みのページ {URLパス: (ソースファイル, 出力ファイル)}
+PREBUILT_PAGES = {
+    '/home-run-chart': ('data/processed/home_run_week_comparison_chart.html', 'home-run-chart/index.html'),
+}
+
+# 圧縮版を用意する拡張子
+COMPRESSIBLE_EXTENSIONS = ('.html', '.js', '.css', '.json', '.svg', '.txt')
+
+# 内容ハッシュ付きアセットのキャッシュ期間（秒）
+IMMUTABLE_MAX_AGE = 31536000
+
+# 圧縮版ファイルの拡張子
+ENCODING_SUFFIXES = (('br', '.br'), ('gzip', '.gz'))
+
+
+def hashed_name(rel_path, body):
+    """内容ハッシュ付きのファイル名を作成（例: app.js -> app.1a2b3c4d5e.js）"""
+    directory, filename = os.path.split(rel_path)
+    stem, ext = os.path.splitext(filename)
+    digest = hashlib.sha256(body).hexdigest()[:10]
+    return os.path.join(directory, f"{stem}.{digest}{ext}").replace(os.sep, '/')
+
+
+def _write_atomic(path, body):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(body)
+    os.replace(tmp_path, path)
+
+
+def _write_with_variants(site_dir, rel_path, body, written):
+    """ファイルとその圧縮版（.gz/.br）を書き出す"""
+    path = os.path.join(site_dir, rel_path)
+    _write_atomic(path, body)
+    written.add(os.path.normpath(path))
+    if not rel_path.endswith(COMPRESSIBLE_EXTENSIONS):
+        return
+    variants = compress_variants(body)
+    for encoding, suffix in ENCODING_SUFFIXES:
+        if encoding in variants:
+            _write_atomic(path + suffix, variants[encoding])
+            written.add(os.path.normpath(path + suffix))
+
+
+def _collect_assets(static_dir):
+    """static/以下のファイル（static/vendorのPlotly.jsバンドルを含む）を {元の相対パス: 内容} で返す"""
+    assets = {}
+    if os.path.isdir(static_dir):
+        for root, _, files in os.walk(static_dir):
+            for filename in sorted(files):
+                if filename.endswith(('.gz', '.br', '.tmp')):
+                    continue  # 圧縮版は書き出し時に作り直す
+                path = os.path.join(root, filename)
+                rel_path = os.path.relpath(path, static_dir).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    assets[rel_path] = f.read()
+    return assets
+
+
+def _rewrite_asset_urls(html, asset_names):
+    for original, hashed in asset_names.items():
+        html = html.replace(f"/static/{original}", f"/static/{hashed}")
+    return html
+
+
+def _remove_stale_files(site_dir, written):
+    for root, _, files in os.walk(site_dir, topdown=False):
+        for filename in files:
+            path = os.path.normpath(os.path.join(root, filename))
+            if path not in written:
+                os.remove(path)
+        if root != site_dir and not os.listdir(root):
+            os.rmdir(root)
+
+
+def export_site(app, site_dir=SITE_DIR, static_dir=STATIC_DIR):
+    """全ページとアセットを書き出してマニフェストを返す"""
+    os.makedirs(site_dir, exist_ok=True)
+    written = set()
+    # Plotly.js部分バンドルをstatic/vendorに用意してから書き出す（用意できなければRuntimeError）
+    ensure_vendored_bundle()
+
+    # アセット（内容ハッシュ付きの名前で書き出す）
+    asset_names = {}
+    for rel_path, body in _collect_assets(static_dir).items():
+        asset_names[rel_path] = hashed_name(rel_path, body)
+        _write_with_variants(site_dir, f"static/{asset_names[rel_path]}", body, written)
+
+    pages = {}
+    client = app.test_client()
+    for url_path, rel_path in APP_PAGES.items():
+        response = client.get(url_path)
+        if response.status_code != 200:
+            print(f"⚠️ {url_path} のレンダリングに失敗しました: {response.status_code}")
+            continue
+        html = _rewrite_asset_urls(response.get_data(as_text=True), asset_names)
+        _write_with_variants(site_dir, rel_path, html.encode('utf-8'), written)
+        pages[url_path] = rel_path
+
+    data = {}
+    for url_path, rel_path in APP_DATA.items():
+        response = client.get(url_path)
+        if response.status_code != 200:
+            print(f"⚠️ {url_path} の書き出しに失敗しました: {response.status_code}")
+            continue
+        _write_with_variants(site_dir, rel_path, response.get_data(), written)
+        data[url_path] = rel_path
+
+    processed_manifest = processed_snapshots.current_manifest()
+    for url_path, (source_path, rel_path) in PREBUILT_PAGES.items():
+        # 公開済みのバージョンがあればそのファイルを使う
+        source_path = processed_snapshots.resolve(source_path, processed_manifest)
+        if not os.path.exists(source_path):
+            print(f"⚠️ {source_path} が見つかりません")
+            continue
+        with open(source_path, 'r', encoding='utf-8') as f:
+            html = _rewrite_asset_urls(f.read(), asset_names)
+        _write_with_variants(site_dir, rel_path, html.encode('utf-8'), written)
+        pages[url_path] = rel_path
+
+    manifest = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'pages': pages,
+        'data': data,
+        'assets': asset_names,
+    }
+    manifest_body = json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')
+    _write_atomic(os.path.join(site_dir, MANIFEST_NAME), manifest_body)
+    written.add(os.path.normpath(os.path.join(site_dir, MANIFEST_NAME)))
+
+    _remove_stale_files(site_dir, written)
+    return manifest
+
+
+def site_file_for_path(site_dir, url_path):
+    """URLパスに対応する書き出し済みファイルのパスを返す（無ければNone）"""
+    rel_path = url_path.strip('/')
+    if rel_path.startswith('static/'):
+        candidates = [rel_path]
+    elif rel_path:
+        candidates = [f"{rel_path}/index.html", f"{rel_path}/index.json"]
+    else:
+        candidates = ['index.html']
+    for candidate in candidates:
+        path = safe_join(site_dir, candidate)
+        if path is not None and os.path.isfile(path):
+            return path
+    return None
+
+
+def serve_site_file(path, immutable=False):
+    """書き出し済みファイルを返す（圧縮版があればAccept-Encodingに応じて選択）"""
+    available = {'identity': path}
+    for encoding, suffix in ENCODING_SUFFIXES:
+        if os.path.isfile(path + suffix):
+            available[encoding] = path + suffix
+    encoding = negotiate_encoding(available)
+
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    # 内容ハッシュ・バージョン付きの名前なら永続的にキャッシュしてよい（それ以外は毎回再検証）
+    max_age = IMMUTABLE_MAX_AGE if immutable else None
+    response = send_file(os.path.abspath(available[encoding]), mimetype=mimetype,
+                         conditional=True, etag=True, max_age=max_age)
+    if encoding != 'identity':
+        response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    return response
+
+
+def main():
+    """メイン実行関数"""
+    from test_app import app
+
+    print("🔄 静的サイトを書き出し中...")
+    manifest = export_site(app)
+
+    print(f"\n✅ 静的サイトを書き出しました: {SITE_DIR}/")
+    for url_path, rel_path in {**manifest['pages'], **manifest['data']}.items():
+        print(f"  {url_path} -> {rel_path}")
+    for original, hashed in manifest['assets'].items():
+        print(f"  /static/{original} -> /static/{hashed}")
+
+
+if __name__ == "__main__":
+    main()
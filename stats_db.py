@@ -0,0 +1,551 @@
+# -*- coding: utf-8 -*-
+"""
+成績データベース（data/ohtani_stats.db）のデータアクセス層
+取り込み・集計スクリプト・Webアプリが同じSQLiteファイルを読み書きする
+
+- WALモード（書き込み中も他のプロセスが読める）
+- 試合単位の一意キー（game_pk）と game_date の索引
+- executemany による一括upsert（同じ試合は上書き）
+- 読み込みは固定のSQL文（sqlite3の文キャッシュで準備済みの文を使い回す）
+- シーズン・週ごとの集計はトリガーで試合の行と同じトランザクションで更新する
+
+テーブル（既存の定義に列と索引を足す。migrate()は何度実行してもよい）
+  batting_stats   1試合1行の打撃成績（+ game_pk, stolen_bases, hit_by_pitch, sac_flies）
+  pitching_stats  1試合1行の投手成績（+ game_pk）
+  season_stats    シーズン成績（season, stat_type で一意。stat_type は 'batting' / 'pitching'）
+  weekly_stats    週（月曜始まり）ごとの合計（season, stat_type, week_start で一意）
+
+season_stats と weekly_stats は試合の行の追加・更新・削除のたびにトリガーが
+差分（新しい行 - 古い行）だけを足すので、1試合あたりの更新は定数時間で済む。
+率（打率・出塁率・長打率・OPS・防御率・WHIP）は合計から計算し直して同じ行に持つ。
+出塁率は (安打 + 四球 + 死球) / (打数 + 四球 + 死球 + 犠飛)。以前から入っている行のように
+死球・犠飛が分からない試合がある間は出塁率・OPSをNULL（不明）にする。盗塁も同様。
+そうした行はゲームログの取り込み（game_log_ingest）がシーズン全体を取り直して埋める。
+
+以前から入っているgame_pkの無い行は、同じ日付・対戦相手の試合を取り込んだときに
+その試合の行として引き継ぐ（重複させない）。
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+
+import pandas as pd
+
+DB_PATH = os.environ.get('OHTANI_STATS_DB', 'data/ohtani_stats.db')
+
+# 他のプロセスが書き込み中のときに待つ最大秒数
+BUSY_TIMEOUT = 30
+
+SCHEMA_VERSION = 5
+
+# テーブルに足す列 {テーブル: [(列名, 型), ...]}
+_ADDED_COLUMNS = {
+    'batting_stats': [('game_pk', 'INTEGER'), ('stolen_bases', 'INTEGER'), ('hit_by_pitch', 'INTEGER'),
+                      ('sac_flies', 'INTEGER')],
+    'pitching_stats': [('game_pk', 'INTEGER')],
+    'season_stats': [('doubles', 'INTEGER'), ('triples', 'INTEGER'), ('runs', 'INTEGER'), ('walks', 'INTEGER'),
+                     ('stolen_bases', 'INTEGER'), ('stolen_base_games', 'INTEGER'), ('outs', 'INTEGER'),
+                     ('earned_runs', 'INTEGER'), ('hit_by_pitch', 'INTEGER'), ('sac_flies', 'INTEGER'),
+                     ('obp_games', 'INTEGER')],
+    'weekly_stats': [('hit_by_pitch', 'INTEGER'), ('sac_flies', 'INTEGER'), ('obp_games', 'INTEGER')],
+}
+
+_INDEXES = (
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_batting_stats_game_pk ON batting_stats(game_pk) WHERE game_pk IS NOT NULL',
+    'CREATE INDEX IF NOT EXISTS idx_batting_stats_game_date ON batting_stats(game_date)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_pitching_stats_game_pk ON pitching_stats(game_pk) WHERE game_pk IS NOT NULL',
+    'CREATE INDEX IF NOT EXISTS idx_pitching_stats_game_date ON pitching_stats(game_date)',
+)
+
+# 試合単位の列（game_log_schemaの列 -> テーブルの列は _batting_params / _pitching_params で変換）
+_GAME_COLUMNS = {
+    'batting_stats': ('game_pk', 'game_date', 'opponent', 'at_bats', 'hits', 'doubles', 'triples', 'home_runs',
+                      'rbi', 'runs', 'walks', 'strikeouts', 'stolen_bases', 'hit_by_pitch', 'sac_flies',
+                      'avg', 'obp', 'slg', 'ops'),
+    'pitching_stats': ('game_pk', 'game_date', 'opponent', 'innings_pitched', 'hits', 'runs', 'earned_runs',
+                       'walks', 'strikeouts', 'era', 'whip', 'decision'),
+}
+
+# 取り込み元に無い値（率系）は既存の値を残す
+_KEEP_IF_NULL = {'avg', 'obp', 'slg', 'ops', 'era', 'whip'}
+
+
+def _upsert_sql(table):
+    columns = _GAME_COLUMNS[table]
+    updates = ', '.join(
+        f"{column} = COALESCE(excluded.{column}, {table}.{column})" if column in _KEEP_IF_NULL
+        else f"{column} = excluded.{column}"
+        for column in columns if column != 'game_pk')
+    return (f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(':' + column for column in columns)}) "
+            f"ON CONFLICT(game_pk) WHERE game_pk IS NOT NULL DO UPDATE SET {updates}")
+
+
+def _claim_legacy_sql(table):
+    # game_pkの無い同じ日付・対戦相手の行（ダブルヘッダーなら古い方から1行）をこの試合の行にする
+    return (f"UPDATE {table} SET game_pk = :game_pk WHERE id = ("
+            f"SELECT MIN(id) FROM {table} WHERE game_pk IS NULL AND game_date = :game_date AND opponent = :opponent) "
+            f"AND NOT EXISTS (SELECT 1 FROM {table} WHERE game_pk = :game_pk)")
+
+
+UPSERT_SQL = {table: _upsert_sql(table) for table in _GAME_COLUMNS}
+CLAIM_LEGACY_SQL = {table: _claim_legacy_sql(table) for table in _GAME_COLUMNS}
+
+# 集計する列 {試合のテーブル: (stat_type, [(集計の列, 試合の行1件の値), ...])}（{row}は NEW / OLD）
+_AGGREGATES = {
+    'batting_stats': ('batting', [
+        ('games', '1'),
+        ('at_bats', '{row}.at_bats'),
+        ('hits', '{row}.hits'),
+        ('doubles', '{row}.doubles'),
+        ('triples', '{row}.triples'),
+        ('home_runs', '{row}.home_runs'),
+        ('rbi', '{row}.rbi'),
+        ('runs', '{row}.runs'),
+        ('walks', '{row}.walks'),
+        ('strikeouts', '{row}.strikeouts'),
+        ('stolen_bases', '{row}.stolen_bases'),
+        # 以前から入っている行には盗塁の列が無い（NULL）ので、盗塁が分かっている試合数も数える
+        ('stolen_base_games', '{row}.stolen_bases IS NOT NULL'),
+        ('hit_by_pitch', '{row}.hit_by_pitch'),
+        ('sac_flies', '{row}.sac_flies'),
+        # 死球・犠飛が分かっている試合数（全試合で分かっていれば合計から出塁率を計算する）
+        ('obp_games', '{row}.hit_by_pitch IS NOT NULL AND {row}.sac_flies IS NOT NULL'),
+    ]),
+    'pitching_stats': ('pitching', [
+        ('games', '1'),
+        # innings_pitchedは '5.1' = 5回1/3 の表記なのでアウト数に直して合計する
+        ('outs', 'CAST({row}.innings_pitched AS INTEGER) * 3'
+                 ' + CAST(ROUND(({row}.innings_pitched - CAST({row}.innings_pitched AS INTEGER)) * 10) AS INTEGER)'),
+        ('hits', '{row}.hits'),
+        ('walks', '{row}.walks'),
+        ('strikeouts', '{row}.strikeouts'),
+        ('earned_runs', '{row}.earned_runs'),
+        ('wins', "{row}.decision = 'W'"),
+        ('losses', "{row}.decision = 'L'"),
+    ]),
+}
+
+_OBP = "(hits + walks + hit_by_pitch) * 1.0 / NULLIF(at_bats + walks + hit_by_pitch + sac_flies, 0)"
+_SLG = "(hits + doubles + 2 * triples + 3 * home_runs) * 1.0 / NULLIF(at_bats, 0)"
+
+
+# 合計から計算する率 {stat_type: SET句}
+_RATES = {
+    'batting': f"""
+        avg = ROUND(hits * 1.0 / NULLIF(at_bats, 0), 3),
+        obp = CASE WHEN obp_games = games THEN ROUND({_OBP}, 3) END,
+        slg = ROUND({_SLG}, 3),
+        ops = CASE WHEN obp_games = games THEN ROUND({_OBP} + {_SLG}, 3) END""",
+    'pitching': """
+        innings_pitched = outs / 3 + (outs % 3) / 10.0,
+        era = ROUND(earned_runs * 27.0 / NULLIF(outs, 0), 2),
+        whip = ROUND((walks + hits) * 3.0 / NULLIF(outs, 0), 2)""",
+}
+
+_SEASON = "CAST(substr({row}.game_date, 1, 4) AS INTEGER)"
+# その試合の週の月曜日
+_WEEK_START = "date({row}.game_date, '-6 days', 'weekday 1')"
+
+
+def _apply_sql(table, row, sign):
+    """試合の行1件（row = NEW / OLD）をsign倍して season_stats と weekly_stats に足す文"""
+    stat_type, aggregates = _AGGREGATES[table]
+    columns = [column for column, _ in aggregates]
+    values = [f"{'-' if sign < 0 else ''}COALESCE({expr.format(row=row)}, 0)" for _, expr in aggregates]
+    updates = ', '.join(f"{column} = COALESCE({{target}}.{column}, 0) + excluded.{column}" for column in columns)
+    season = _SEASON.format(row=row)
+    week_start = _WEEK_START.format(row=row)
+    sql = f"""
+    INSERT INTO season_stats (season, stat_type, {', '.join(columns)})
+    VALUES ({season}, '{stat_type}', {', '.join(values)})
+    ON CONFLICT(season, stat_type) DO UPDATE SET {updates.format(target='season_stats')},
+        updated_at = CURRENT_TIMESTAMP;
+    UPDATE season_stats SET {_RATES[stat_type]}
+    WHERE season = {season} AND stat_type = '{stat_type}';
+    INSERT INTO weekly_stats (season, stat_type, week_start, {', '.join(columns)})
+    VALUES ({season}, '{stat_type}', {week_start}, {', '.join(values)})
+    ON CONFLICT(season, stat_type, week_start) DO UPDATE SET {updates.format(target='weekly_stats')};"""
+    if sign < 0:
+        # 試合が無くなったシーズン・週の行は消す（作り直した集計と同じく、試合の無い行は持たない）
+        sql += f"""
+    DELETE FROM season_stats WHERE season = {season} AND stat_type = '{stat_type}' AND games = 0;
+    DELETE FROM weekly_stats WHERE season = {season} AND stat_type = '{stat_type}' AND week_start = {week_start}
+        AND games = 0;"""
+    return sql
+
+
+def _trigger_sql(table):
+    """試合の行の追加・更新・削除で集計を差分更新するトリガー"""
+    columns = ['game_date'] + [column for column in _GAME_COLUMNS[table]
+                               if column not in ('game_pk', 'game_date', 'opponent')]
+    return f"""
+CREATE TRIGGER IF NOT EXISTS {table}_aggregate_insert AFTER INSERT ON {table}
+BEGIN{_apply_sql(table, 'NEW', 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_aggregate_update AFTER UPDATE OF {', '.join(columns)} ON {table}
+BEGIN{_apply_sql(table, 'OLD', -1)}{_apply_sql(table, 'NEW', 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_aggregate_delete AFTER DELETE ON {table}
+BEGIN{_apply_sql(table, 'OLD', -1)}
+END;
+"""
+
+
+def _rebuild_sql(table):
+    """試合の行から集計を作り直す文（マイグレーション時に1回だけ）"""
+    stat_type, aggregates = _AGGREGATES[table]
+    columns = ', '.join(column for column, _ in aggregates)
+    sums = ', '.join(f"SUM(COALESCE({expr.format(row=table)}, 0))" for _, expr in aggregates)
+    return f"""
+    INSERT INTO season_stats (season, stat_type, {columns})
+    SELECT {_SEASON.format(row=table)} AS season, '{stat_type}', {sums} FROM {table} GROUP BY season;
+    UPDATE season_stats SET {_RATES[stat_type]} WHERE stat_type = '{stat_type}';
+    INSERT INTO weekly_stats (season, stat_type, week_start, {columns})
+    SELECT {_SEASON.format(row=table)} AS season, '{stat_type}', {_WEEK_START.format(row=table)} AS week_start, {sums}
+    FROM {table} GROUP BY season, week_start;"""
+
+
+TRIGGERS_SQL = ''.join(_trigger_sql(table) for table in _AGGREGATES)
+DROP_TRIGGERS_SQL = ''.join(f"DROP TRIGGER IF EXISTS {table}_aggregate_{event};\n"
+                            for table in _AGGREGATES for event in ('insert', 'update', 'delete'))
+REBUILD_AGGREGATES_SQL = 'DELETE FROM season_stats;\nDELETE FROM weekly_stats;' + \
+    ''.join(_rebuild_sql(table) for table in _AGGREGATES)
+
+SEASON_STAT_COLUMNS = {
+    'batting': ('games', 'at_bats', 'hits', 'doubles', 'triples', 'home_runs', 'rbi', 'runs', 'walks',
+                'strikeouts', 'stolen_bases', 'hit_by_pitch', 'sac_flies', 'avg', 'obp', 'slg', 'ops'),
+    'pitching': ('games', 'outs', 'innings_pitched', 'hits', 'walks', 'strikeouts', 'earned_runs', 'wins', 'losses',
+                 'era', 'whip'),
+}
+
+# 日付範囲は BETWEEN にして game_date の索引を使う（未指定は全期間）
+SELECT_GAMES_SQL = {
+    table: f"SELECT {', '.join(columns)} FROM {table} WHERE game_date BETWEEN :start_date AND :end_date "
+           f"ORDER BY game_date, id"
+    for table, columns in _GAME_COLUMNS.items()
+}
+
+# 盗塁・死球・犠飛は全試合で分かっている場合だけ返す（一部の試合しか無ければNULL）
+_SELECT_EXPRESSIONS = {
+    'stolen_bases': 'CASE WHEN stolen_base_games = games THEN stolen_bases END AS stolen_bases',
+    'hit_by_pitch': 'CASE WHEN obp_games = games THEN hit_by_pitch END AS hit_by_pitch',
+    'sac_flies': 'CASE WHEN obp_games = games THEN sac_flies END AS sac_flies',
+}
+
+SELECT_SEASON_STATS_SQL = {
+    stat_type: f"SELECT {', '.join(_SELECT_EXPRESSIONS.get(column, column) for column in columns)} "
+               f"FROM season_stats WHERE season = :season AND stat_type = :stat_type"
+    for stat_type, columns in SEASON_STAT_COLUMNS.items()
+}
+
+# 以前から入っている行（盗塁・死球・犠飛の列が無かった頃の行）
+SELECT_MISSING_COUNTS_SQL = ("SELECT COUNT(*) FROM batting_stats WHERE game_date BETWEEN :start_date AND :end_date "
+                             "AND (stolen_bases IS NULL OR hit_by_pitch IS NULL OR sac_flies IS NULL)")
+
+# 週ごとの合計と、その週までの累計（cumulative_<列>）
+SELECT_WEEKLY_STATS_SQL = {
+    stat_type: "SELECT week_start, ROW_NUMBER() OVER (ORDER BY week_start) AS week_number, "
+               + ', '.join(column for column, _ in aggregates) + ', '
+               + ', '.join(f"SUM({column}) OVER (ORDER BY week_start) AS cumulative_{column}"
+                           for column, _ in aggregates)
+               + " FROM weekly_stats WHERE season = :season AND stat_type = :stat_type ORDER BY week_start"
+    for stat_type, aggregates in _AGGREGATES.values()
+}
+
+
+def season_range(season=None, start_date=None, end_date=None):
+    """BETWEEN に渡す日付範囲（'YYYY-MM-DD'）"""
+    if season is not None:
+        start_date = max(start_date or '', f"{season}-01-01")
+        end_date = min(end_date or '9999-12-31', f"{season}-12-31")
+    return {'start_date': start_date or '0000-01-01', 'end_date': end_date or '9999-12-31'}
+
+
+def innings_notation(outs):
+    """アウト数を '5.1' 形式の投球回（REAL）にする"""
+    return outs // 3 + (outs % 3) / 10
+
+
+def _none_if_missing(value):
+    return None if value is None or pd.isna(value) else value
+
+
+def _number(value):
+    """'.281' のような数値の文字列も数値にする（無ければNone）"""
+    value = _none_if_missing(value)
+    return None if value in (None, '') else float(value)
+
+
+def _batting_params(row):
+    return {
+        'game_pk': int(row['game_pk']),
+        'game_date': str(row['game_date'])[:10],
+        'opponent': row.get('opponent') or '',
+        'at_bats': int(row.get('at_bats', 0)),
+        'hits': int(row.get('hits', 0)),
+        'doubles': int(row.get('doubles', 0)),
+        'triples': int(row.get('triples', 0)),
+        'home_runs': int(row.get('home_runs', 0)),
+        'rbi': int(row.get('rbi', 0)),
+        'runs': int(row.get('runs', 0)),
+        'walks': int(row.get('walks', 0)),
+        'strikeouts': int(row.get('strikeouts', 0)),
+        'stolen_bases': int(row.get('stolen_bases', 0)),
+        'hit_by_pitch': int(row.get('hit_by_pitch', 0)),
+        'sac_flies': int(row.get('sac_flies', 0)),
+        'avg': _number(row.get('avg')),
+        'obp': _number(row.get('obp')),
+        'slg': _number(row.get('slg')),
+        'ops': _number(row.get('ops')),
+    }
+
+
+def _pitching_params(row):
+    decision = 'W' if int(row.get('wins', 0)) else 'L' if int(row.get('losses', 0)) else ''
+    return {
+        'game_pk': int(row['game_pk']),
+        'game_date': str(row['game_date'])[:10],
+        'opponent': row.get('opponent') or '',
+        'innings_pitched': innings_notation(int(row.get('outs', 0))),
+        'hits': int(row.get('hits_allowed', 0)),
+        'runs': int(row.get('runs_allowed', 0)),
+        'earned_runs': int(row.get('earned_runs', 0)),
+        'walks': int(row.get('walks', 0)),
+        'strikeouts': int(row.get('strikeouts', 0)),
+        'era': None,
+        'whip': None,
+        'decision': decision,
+    }
+
+
+_GROUP_TABLES = {
+    'hitting': ('batting_stats', _batting_params),
+    'pitching': ('pitching_stats', _pitching_params),
+}
+
+
+class StatsDB:
+    """data/ohtani_stats.db へのアクセス（スレッド・プロセス間で共有可能）"""
+
+    def __init__(self, path=DB_PATH, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self._local = threading.local()
+        if not readonly:
+            self.migrate()
+
+    def connect(self):
+        """このスレッドの接続（sqlite3の接続はスレッドをまたいで使えない）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self.readonly:
+                conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=BUSY_TIMEOUT)
+            else:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('PRAGMA synchronous=NORMAL')
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def migrate(self):
+        """列・索引・集計のトリガーを追加してWALモードにする（何度実行してもよい）"""
+        conn = self.connect()
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        with conn:
+            conn.executescript(_BASE_SCHEMA)
+            for table, columns in _ADDED_COLUMNS.items():
+                existing = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+                for column, column_type in columns:
+                    if column not in existing:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+            for statement in _INDEXES:
+                conn.execute(statement)
+            if version < SCHEMA_VERSION:
+                # 集計する列が変わったのでトリガーを作り直す
+                conn.executescript(DROP_TRIGGERS_SQL)
+            conn.executescript(TRIGGERS_SQL)
+        if version < SCHEMA_VERSION:
+            # トリガーを入れる前（または集計する列を足す前）の行から集計を作る
+            self.rebuild_aggregates()
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    # ---- 書き込み ----
+
+    def upsert_games(self, group, rows):
+        """1試合1行（game_log_schemaの列）をまとめてupsertし、行数を返す"""
+        table, to_params = _GROUP_TABLES[group]
+        params = [to_params(row) for row in rows if _none_if_missing(row.get('game_pk')) is not None]
+        if not params:
+            return 0
+        conn = self.connect()
+        with conn:
+            conn.executemany(CLAIM_LEGACY_SQL[table], params)
+            conn.executemany(UPSERT_SQL[table], params)
+        return len(params)
+
+    def upsert_game_log(self, df, group):
+        """ゲームログのDataFrameをまとめてupsert"""
+        return self.upsert_games(group, df.to_dict('records'))
+
+    def rebuild_aggregates(self):
+        """season_stats と weekly_stats を試合の行から作り直す（通常はトリガーが差分更新する）"""
+        conn = self.connect()
+        conn.executescript(f"BEGIN;{REBUILD_AGGREGATES_SQL}\nCOMMIT;")
+
+    # ---- 読み込み ----
+
+    def games(self, group, season=None, start_date=None, end_date=None):
+        """試合単位の成績（日付順のDataFrame）"""
+        table, _ = _GROUP_TABLES[group]
+        return pd.read_sql_query(SELECT_GAMES_SQL[table], self.connect(),
+                                 params=season_range(season, start_date, end_date))
+
+    def season_stats(self, season, stat_type):
+        """season_statsの1行（合計と率。試合が無ければNone）"""
+        row = self.connect().execute(SELECT_SEASON_STATS_SQL[stat_type],
+                                     {'season': int(season), 'stat_type': stat_type}).fetchone()
+        return dict(row) if row is not None and row['games'] else None
+
+    def weekly_stats(self, season, stat_type):
+        """週ごとの合計と累計（週の日付順のDataFrame。week_numberはシーズン最初の週が1）"""
+        return pd.read_sql_query(SELECT_WEEKLY_STATS_SQL[stat_type], self.connect(),
+                                 params={'season': int(season), 'stat_type': stat_type})
+
+    def games_missing_counts(self, group, season):
+        """seasonの試合のうち、集計に使う数（盗塁・死球・犠飛）が入っていない行の数"""
+        if group != 'hitting':
+            return 0
+        return self.connect().execute(SELECT_MISSING_COUNTS_SQL, season_range(season)).fetchone()[0]
+
+
+# 既存のDBと同じテーブル定義（新しく作る場合用）
+_BASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batting_stats (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    game_date TEXT NOT NULL,
+    opponent TEXT NOT NULL,
+    at_bats INTEGER,
+    hits INTEGER,
+    doubles INTEGER,
+    triples INTEGER,
+    home_runs INTEGER,
+    rbi INTEGER,
+    runs INTEGER,
+    walks INTEGER,
+    strikeouts INTEGER,
+    avg REAL,
+    obp REAL,
+    slg REAL,
+    ops REAL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS pitching_stats (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    game_date TEXT NOT NULL,
+    opponent TEXT NOT NULL,
+    innings_pitched REAL,
+    hits INTEGER,
+    runs INTEGER,
+    earned_runs INTEGER,
+    walks INTEGER,
+    strikeouts INTEGER,
+    era REAL,
+    whip REAL,
+    decision TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS season_stats (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    season INTEGER NOT NULL,
+    stat_type TEXT NOT NULL,
+    games INTEGER,
+    innings_pitched REAL,
+    era REAL,
+    whip REAL,
+    strikeouts INTEGER,
+    wins INTEGER,
+    losses INTEGER,
+    at_bats INTEGER,
+    hits INTEGER,
+    home_runs INTEGER,
+    rbi INTEGER,
+    avg REAL,
+    obp REAL,
+    slg REAL,
+    ops REAL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(season, stat_type)
+);
+CREATE TABLE IF NOT EXISTS weekly_stats (
+    season INTEGER NOT NULL,
+    stat_type TEXT NOT NULL,
+    week_start TEXT NOT NULL,
+    games INTEGER,
+    at_bats INTEGER,
+    hits INTEGER,
+    doubles INTEGER,
+    triples INTEGER,
+    home_runs INTEGER,
+    rbi INTEGER,
+    runs INTEGER,
+    walks INTEGER,
+    strikeouts INTEGER,
+    stolen_bases INTEGER,
+    stolen_base_games INTEGER,
+    outs INTEGER,
+    earned_runs INTEGER,
+    wins INTEGER,
+    losses INTEGER,
+    PRIMARY KEY (season, stat_type, week_start)
+);
+"""
+
+_default_db = None
+_default_lock = threading.Lock()
+
+
+def get_db():
+    """プロセス共有のStatsDBを取得"""
+    global _default_db
+    if _default_db is None:
+        with _default_lock:
+            if _default_db is None:
+                _default_db = StatsDB()
+    return _default_db
+
+
+def main():
+    """マイグレーションを実行して件数を表示（--sync で取り込み済みのゲームログCSVを反映）"""
+    from game_log_schema import read_game_log
+
+    db = get_db()
+    if '--sync' in sys.argv[1:]:
+        sources = (
+            ('data/raw/ohtani_batting_gamelogs_2024.csv', 'hitting'),
+            ('data/raw/ohtani_pitching_gamelogs_2024.csv', 'pitching'),
+            ('data/raw/ohtani_batting_api_2025.csv', 'hitting'),
+        )
+        for csv_path, group in sources:
+            if os.path.exists(csv_path):
+                count = db.upsert_game_log(read_game_log(csv_path, group), group)
+                print(f"✅ {csv_path} -> {count}試合")
+    conn = db.connect()
+    print(f"🗄️ {db.path}（{conn.execute('PRAGMA journal_mode').fetchone()[0]}）")
+    for table in ('batting_stats', 'pitching_stats', 'season_stats', 'weekly_stats'):
+        print(f"  {table}: {conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]}行")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+成績データストア
+data/processed の成果物と成績DB（data/ohtani_stats.db）の今シーズンのシーズン成績を
+ワーカープロセスごとに一度だけ読み込み、日次バッチが書き換えたときだけ丸ごと差し替える
+
+data/processed のファイルは公開中のバージョン（processed_snapshots）から読む。
+1回の読み込みでは1つのバージョンに固定し、マニフェストのハッシュが前回と同じファイルは
+読み直さず前回のビューを使う（未公開なら data/processed を直接読む）。
+"""
+
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from types import MappingProxyType
+
+import pandas as pd
+
+import processed_snapshots
+import snapshot_file
+from metrics import CACHE_REQUESTS, DISK_READ_BYTES, PARSE_DURATION, SNAPSHOT_AGE, SNAPSHOT_INFO
+from stats_db import DB_PATH, StatsDB
+
+# データファイルのパス
+BATTING_2024_CSV = 'data/processed/ohtani_batting_2024_final.csv'
+DODGERS_GAMES_JSON = 'data/processed/dodgers_games_2025.json'
+HOME_RUN_WITH_PREDICTION_JSON = 'data/processed/home_run_with_prediction.json'
+STATS_DB = DB_PATH
+
+SOURCE_PATHS = (BATTING_2024_CSV, DODGERS_GAMES_JSON, HOME_RUN_WITH_PREDICTION_JSON, STATS_DB)
+
+# 成績DBからシーズン成績を読むシーズン
+CURRENT_SEASON = 2025
+
+# ファイル更新チェックの間隔（秒）
+DEFAULT_CHECK_INTERVAL = float(os.environ.get('STATS_STORE_CHECK_INTERVAL', 5.0))
+
+DodgersGames = namedtuple('DodgersGames', ['total_games', 'completed_games', 'remaining_games', 'last_updated'])
+
+
+class WeekChart(namedtuple('WeekChart', ['weeks', 'hr_2024', 'hr_2025'])):
+    """週番号ベースの累積ホームラン推移（予測データ含む）"""
+
+    __slots__ = ()
+
+    def to_dict(self):
+        """チャート描画用のchart_data形式に変換"""
+        return {'weeks': list(self.weeks), '2024': list(self.hr_2024), '2025': list(self.hr_2025)}
+
+
+class StatsSnapshot(namedtuple('StatsSnapshot', [
+        'version', 'signature', 'loaded_at', 'last_modified',
+        'batting_2024', 'dodgers_games', 'week_chart', 'prediction_info', 'season_totals',
+        'source_hashes'])):
+    """ある時点のデータ一式（読み取り専用）
+
+    読み込めなかった成果物はNone（prediction_infoは空のマッピング）になる。
+    season_totalsは成績DBの今シーズンのシーズン成績（season_statsの行） {'batting': {...}, 'pitching': {...}}。
+    source_hashesはソースごとの内容のsha256（読めなかったソースはNone）。
+    """
+
+    __slots__ = ()
+
+
+def source_signature(paths):
+    """ソースファイルのmtime/サイズからシグネチャを作成（存在しないファイルはNone）
+
+    SQLiteのDBはWALファイルも見る（コミットはチェックポイントまでWALにだけ書かれる）。
+    """
+    signature = []
+    for path in paths:
+        for watched in ((path, f"{path}-wal") if path.endswith('.db') else (path,)):
+            try:
+                st = os.stat(watched)
+                signature.append((watched, st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append((watched, None, None))
+    return tuple(signature)
+
+
+def resolve_paths(paths, manifest=None):
+    """data/processed のファイルを manifest のバージョン内のパスに置き換える"""
+    return tuple(processed_snapshots.resolve(path, manifest) for path in paths)
+
+
+def signature_last_modified(signature):
+    """シグネチャ内の最新mtimeをLast-Modified用のdatetimeに変換"""
+    mtimes = [mtime for _, mtime, _ in signature if mtime is not None]
+    if not mtimes:
+        return None
+    # HTTP日付は秒精度なので切り捨てる
+    return datetime.fromtimestamp(max(mtimes) // 1_000_000_000, tz=timezone.utc)
+
+
+def _read_bytes(path):
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+    except OSError:
+        return None
+    DISK_READ_BYTES.inc(len(raw), source=os.path.basename(path))
+    return raw
+
+
+def _read_season_totals(path, season=CURRENT_SEASON):
+    """成績DBからシーズン成績（集計済みの行）を読み、JSONのバイト列にする（DBが無ければNone）"""
+    if not os.path.exists(path):
+        return None
+    db = StatsDB(path, readonly=True)
+    try:
+        totals = {stat_type: db.season_stats(season, stat_type) for stat_type in ('batting', 'pitching')}
+    except sqlite3.Error as e:
+        print(f"成績DB読み込みエラー ({path}): {e}")
+        return None
+    finally:
+        db.close()
+    return json.dumps(totals, sort_keys=True).encode('utf-8')
+
+
+def _season_totals_view(data):
+    return MappingProxyType({stat_type: MappingProxyType(totals) if totals is not None else None
+                             for stat_type, totals in data.items()})
+
+
+def _parse_season_totals(raw):
+    return _season_totals_view(json.loads(raw))
+
+
+def _parse_batting_2024(raw):
+    # to_dict('records')は列ごとの型を保つ（iloc[0]だとint列がfloatになる）
+    df = pd.read_csv(io.BytesIO(raw))
+    return MappingProxyType(df.to_dict('records')[0])
+
+
+def _parse_dodgers_games(raw):
+    data = json.loads(raw)
+    return DodgersGames(
+        total_games=data['total_games'],
+        completed_games=data['completed_games'],
+        remaining_games=data['remaining_games'],
+        last_updated=data.get('last_updated'),
+    )
+
+
+def _parse_home_run_with_prediction(raw):
+    data = json.loads(raw)
+    chart_data = data['chart_data']
+    week_chart = WeekChart(
+        weeks=tuple(chart_data['weeks']),
+        hr_2024=tuple(chart_data['2024']),
+        hr_2025=tuple(chart_data['2025']),
+    )
+    return week_chart, MappingProxyType(data.get('prediction_info', {}))
+
+
+def _parse_or_none(parser, raw, path):
+    if raw is None:
+        return None
+    try:
+        source = os.path.basename(path)
+        with PARSE_DURATION.time(source=source, format=os.path.splitext(source)[1].lstrip('.')):
+            return parser(raw)
+    except Exception as e:
+        print(f"データ読み込みエラー ({path}): {e}")
+        return None
+
+
+def snapshot_views(snapshot):
+    """スナップショットのビューをJSONで保存できる形に変換（共有スナップショットファイル用）"""
+    return {
+        'batting_2024': dict(snapshot.batting_2024) if snapshot.batting_2024 is not None else None,
+        'dodgers_games': snapshot.dodgers_games._asdict() if snapshot.dodgers_games is not None else None,
+        'week_chart': snapshot.week_chart.to_dict() if snapshot.week_chart is not None else None,
+        'prediction_info': dict(snapshot.prediction_info),
+        'season_totals': {stat_type: dict(totals) if totals is not None else None
+                          for stat_type, totals in snapshot.season_totals.items()}
+        if snapshot.season_totals is not None else None,
+    }
+
+
+def _views_from_mapping(views):
+    """共有スナップショットファイルのビューを復元（CSV/JSONの再パースをしない）"""
+    chart_data = views['week_chart']
+    week_chart = None
+    if chart_data is not None:
+        week_chart = WeekChart(tuple(chart_data['weeks']), tuple(chart_data['2024']), tuple(chart_data['2025']))
+    return {
+        'batting_2024': MappingProxyType(views['batting_2024']) if views['batting_2024'] is not None else None,
+        'dodgers_games': DodgersGames(**views['dodgers_games']) if views['dodgers_games'] is not None else None,
+        'week_chart': week_chart,
+        'prediction_info': MappingProxyType(views['prediction_info']),
+        'season_totals': _season_totals_view(views['season_totals'])
+        if views.get('season_totals') is not None else None,
+    }
+
+
+def load_snapshot(paths=SOURCE_PATHS, previous=None):
+    """ソースファイルを一度ずつ読み込んでスナップショットを作成
+
+    previous（前回のスナップショット）とハッシュが同じソースはパースせずにビューを引き継ぐ。
+    """
+    batting_path, dodgers_path, prediction_path, db_path = paths
+    manifest = processed_snapshots.current_manifest()
+    sources = resolve_paths(paths, manifest)
+    # 読み込み中に書き換えられた場合に備えて、読む前のシグネチャを記録する
+    signature = source_signature(sources)
+
+    def unchanged(index, source_hash):
+        return previous is not None and source_hash is not None and previous.source_hashes[index] == source_hash
+
+    digest = hashlib.sha256()
+    raws = []
+    hashes = []
+    for index, (path, source) in enumerate(zip(paths, sources)):
+        source_hash = processed_snapshots.file_hash(path, manifest)
+        if unchanged(index, source_hash):
+            # 公開済みのバージョンのファイルは書き換えられないので、ハッシュが同じなら読まない
+            raw = None
+        else:
+            # DBはファイルの中身ではなく読み出した合計でバージョンを決める
+            raw = _read_season_totals(source) if path == db_path else _read_bytes(source)
+            source_hash = hashlib.sha256(raw).hexdigest() if raw is not None else None
+        raws.append(raw)
+        hashes.append(source_hash)
+        digest.update(path.encode('utf-8'))
+        digest.update(b'\0' if source_hash is None else bytes.fromhex(source_hash))
+    batting_raw, dodgers_raw, prediction_raw, db_raw = raws
+    version = digest.hexdigest()[:16]
+    source_hashes = tuple(hashes)
+
+    # 同じ内容の共有スナップショットファイルが公開済みならそのビューを使う
+    mapped = snapshot_file.lookup(version)
+    if mapped is not None:
+        CACHE_REQUESTS.inc(cache='stats_store', result='mapped')
+        return StatsSnapshot(
+            version=version,
+            signature=signature,
+            loaded_at=time.time(),
+            last_modified=signature_last_modified(signature),
+            source_hashes=source_hashes,
+            **_views_from_mapping(mapped.views),
+        )
+
+    def parse(index, parser, raw, field):
+        if unchanged(index, hashes[index]):
+            CACHE_REQUESTS.inc(cache='stats_store_source', result='hit')
+            return [getattr(previous, name) for name in field] if isinstance(field, tuple) \
+                else getattr(previous, field)
+        CACHE_REQUESTS.inc(cache='stats_store_source', result='miss')
+        return _parse_or_none(parser, raw, paths[index])
+
+    prediction = parse(2, _parse_home_run_with_prediction, prediction_raw, ('week_chart', 'prediction_info'))
+    week_chart, prediction_info = prediction if prediction else (None, MappingProxyType({}))
+
+    return StatsSnapshot(
+        version=version,
+        signature=signature,
+        loaded_at=time.time(),
+        last_modified=signature_last_modified(signature),
+        batting_2024=parse(0, _parse_batting_2024, batting_raw, 'batting_2024'),
+        dodgers_games=parse(1, _parse_dodgers_games, dodgers_raw, 'dodgers_games'),
+        week_chart=week_chart,
+        prediction_info=prediction_info,
+        season_totals=parse(3, _parse_season_totals, db_raw, 'season_totals'),
+        source_hashes=source_hashes,
+    )
+
+
+class StatsStore:
+    """プロセス全体で共有するデータストア
+
+    snapshot()は通常メモリ上の参照を返すだけで、check_interval秒ごとに
+    ファイル（公開中のバージョンのファイル）のmtime/サイズを確認し、変わっていれば新しいスナップショットを
+    作ってから参照を差し替える（読み込み途中の状態は見えない）。
+    """
+
+    def __init__(self, paths=SOURCE_PATHS, check_interval=DEFAULT_CHECK_INTERVAL):
+        self.paths = tuple(paths)
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._warm_up_thread = None
+
+    def snapshot(self):
+        """現在のスナップショットを取得（必要なら再読み込み）"""
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._last_check < self.check_interval:
+            CACHE_REQUESTS.inc(cache='stats_store', result='hit')
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or now - self._last_check >= self.check_interval:
+                if snapshot is None or self._signature() != snapshot.signature:
+                    snapshot = self._reload(snapshot)
+                    CACHE_REQUESTS.inc(cache='stats_store', result='reload')
+                else:
+                    CACHE_REQUESTS.inc(cache='stats_store', result='revalidated')
+                self._last_check = now
+            else:
+                CACHE_REQUESTS.inc(cache='stats_store', result='hit')
+        return snapshot
+
+    def _signature(self):
+        # 公開中のバージョンが変わればパスが変わるのでシグネチャも変わる
+        return source_signature(resolve_paths(self.paths, processed_snapshots.current_manifest()))
+
+    def peek(self):
+        """読み込みを行わずに現在のスナップショットを返す（未読み込みならNone）"""
+        return self._snapshot
+
+    def warm_up(self):
+        """未読み込みならバックグラウンドで読み込みを開始（呼び出し元は待たない）"""
+        if self._snapshot is not None:
+            return
+        with self._lock:
+            if self._warm_up_thread is None or not self._warm_up_thread.is_alive():
+                self._warm_up_thread = threading.Thread(target=self.snapshot, daemon=True)
+                self._warm_up_thread.start()
+
+    def reload(self):
+        """強制的に再読み込み"""
+        with self._lock:
+            self._last_check = time.monotonic()
+            return self._reload(self._snapshot)
+
+    def _reload(self, previous):
+        snapshot = load_snapshot(self.paths, previous)
+        if previous is not None and snapshot.version == previous.version:
+            # 内容が同じならmtimeだけ更新して既存のビューを使い続ける
+            snapshot = previous._replace(signature=snapshot.signature)
+        self._snapshot = snapshot
+        return snapshot
+
+
+# ワーカープロセスごとのデフォルトストア
+stats_store = StatsStore()
+
+
+def _snapshot_age():
+    snapshot = stats_store.peek()
+    return {(): time.time() - snapshot.loaded_at} if snapshot else {}
+
+
+def _snapshot_info():
+    snapshot = stats_store.peek()
+    return {(snapshot.version,): 1} if snapshot else {}
+
+
+SNAPSHOT_AGE.set_function(_snapshot_age)
+SNAPSHOT_INFO.set_function(_snapshot_info)
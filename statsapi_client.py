@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+"""
+MLB Stats API クライアント
+statsapi.mlb.com への呼び出しをすべてここに集約する
+
+- 共有の requests.Session（keep-aliveの接続プール）で TCP/TLS ハンドシェイクを使い回す
+- リクエストごとのタイムアウト（接続・読み込み）
+- 5xx/429・接続エラー時のジッター付き指数バックオフでのリトライ（Retry-Afterを尊重）
+- リクエスト時間・リトライ回数・接続の再利用状況をmetricsに記録
+- get_json()の応答をURL+パラメータごとにgzipでディスクにキャッシュし、
+  エンドポイントごとのTTLが切れたらIf-None-Match/If-Modified-Sinceで再検証する
+  （STATSAPI_OFFLINE=1 ならネットワークに出ずキャッシュだけを使う）
+- 同じ選手の stats/group 違いの取得を1リクエストにまとめる（get_stats_coalesced / CoalescedStats）
+- 全プロセス共有のトークンバケット（rate_limiter.py）で送信ペースを制限する
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import weakref
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import ijson
+except ImportError:  # ijsonが無い環境では応答全体を読み込んでから要素を取り出す
+    ijson = None
+
+from metrics import CACHE_REQUESTS, STATSAPI_CONNECTIONS, STATSAPI_REQUEST_DURATION, STATSAPI_RETRIES
+from rate_limiter import RATE_BURST, RATE_LIMIT, RATE_LIMIT_DB, TokenBucket
+
+# STATSAPI_BASE_URLでローカルの代替サーバー（statsapi_stub.py）などに向けられる
+BASE_URL = os.environ.get('STATSAPI_BASE_URL', 'https://statsapi.mlb.com/api/v1')
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# (接続タイムアウト, 読み込みタイムアウト) 秒
+DEFAULT_TIMEOUT = (3.05, 20)
+
+# リトライ設定
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# 接続プールのサイズ（並列取得するスレッド数以上にする）
+POOL_MAXSIZE = 16
+
+# 応答キャッシュ
+CACHE_DIR = os.environ.get('STATSAPI_CACHE_DIR', 'data/cache/statsapi')
+OFFLINE = os.environ.get('STATSAPI_OFFLINE', '').lower() in ('1', 'true', 'yes')
+
+# エンドポイントごとのキャッシュ有効期間（秒）。期限切れ後は条件付きリクエストで再検証する
+DEFAULT_CACHE_TTL = 3600
+ENDPOINT_CACHE_TTLS = {
+    'schedule': 1800,
+    'people/{id}/stats': 6 * 3600,
+    'people/{id}': 24 * 3600,
+}
+# 終了したシーズンのデータはほぼ変わらない
+PAST_SEASON_CACHE_TTL = 30 * 24 * 3600
+
+# 接続統計を集計するクライアント（/metrics用。閉じた・参照されなくなったクライアントは含めない）
+_clients = weakref.WeakSet()
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def endpoint_label(path):
+    """メトリクス用にパス中のIDを置き換える（例: people/660271/stats -> people/{id}/stats）"""
+    return re.sub(r'/\d+(?=/|$)', '/{id}', '/' + path.strip('/'))[1:]
+
+
+def retry_after_seconds(value):
+    """Retry-Afterヘッダー（秒数またはHTTP日付）を秒数に変換（解釈できなければNone）"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """attempt回目（0始まり）のリトライまでの待ち時間（フルジッター）"""
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+    if retry_after is not None:
+        # サーバーの指定より早くは再送しない
+        delay = max(delay, min(retry_after, BACKOFF_MAX))
+    return delay
+
+
+class StatsApiOfflineError(requests.exceptions.RequestException):
+    """オフラインモードでキャッシュに無いデータを要求した"""
+
+
+def cache_ttl(path, params=None):
+    """エンドポイントとパラメータからキャッシュ有効期間（秒）を決める"""
+    season = (params or {}).get('season')
+    if season is not None and str(season).isdigit() and int(season) < datetime.now().year:
+        return PAST_SEASON_CACHE_TTL
+    return ENDPOINT_CACHE_TTLS.get(endpoint_label(path), DEFAULT_CACHE_TTL)
+
+
+class ResponseCache:
+    """statsapiのJSON応答をURL+パラメータごとにgzipで保存するディスクキャッシュ"""
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+
+    def key(self, url, params=None):
+        query = urlencode(sorted((params or {}).items()), doseq=True)
+        return hashlib.sha256(f"{url}?{query}".encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json.gz")
+
+    def load(self, key):
+        """保存済みのエントリ（無い・壊れている場合はNone）"""
+        try:
+            with gzip.open(self._path(key), 'rb') as f:
+                return json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def store(self, key, entry):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(gzip.compress(json.dumps(entry, ensure_ascii=False).encode('utf-8'), mtime=0))
+        os.replace(tmp_path, path)
+
+
+class StatsApiClient:
+    """statsapi.mlb.com 用のHTTPクライアント（スレッド間で共有可能）"""
+
+    def __init__(self, base_url=BASE_URL, timeout=DEFAULT_TIMEOUT, max_retries=MAX_RETRIES,
+                 pool_maxsize=POOL_MAXSIZE, cache_dir=CACHE_DIR, offline=OFFLINE,
+                 rate_limit=RATE_LIMIT, rate_burst=RATE_BURST, rate_limit_db=RATE_LIMIT_DB):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        # cache_dir=Noneでキャッシュを使わない
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self.offline = offline
+        # rate_limit=0またはrate_limit_db=Noneでレート制限しない
+        self.rate_limiter = TokenBucket(rate_limit_db, rate_limit, rate_burst) \
+            if rate_limit and rate_limit_db else None
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': USER_AGENT, 'Accept-Encoding': 'gzip, deflate'})
+        # リトライはこのクラスで行う（urllib3側のリトライは無効）
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('https://', self._adapter)
+        self.session.mount('http://', self._adapter)
+        _clients.add(self)
+
+    def url(self, path):
+        if path.startswith(('http://', 'https://')):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def get(self, path, params=None, timeout=None, headers=None, stream=False):
+        """GETリクエスト（リトライ込み）。最終的に失敗した場合はrequestsの例外を送出
+
+        stream=Trueなら本文を読み込まずに返す（呼び出し側でcloseする）。
+        """
+        url = self.url(path)
+        endpoint = endpoint_label(path)
+        for attempt in range(self.max_retries + 1):
+            # リトライも1リクエストとして数える
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(endpoint=endpoint)
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, headers=headers,
+                                            timeout=timeout or self.timeout, stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                STATSAPI_REQUEST_DURATION.observe(time.perf_counter() - started, endpoint=endpoint, status='error')
+                if attempt >= self.max_retries:
+                    raise
+                reason = 'timeout' if isinstance(e, requests.exceptions.Timeout) else 'connection'
+                delay = backoff_delay(attempt)
+            else:
+                STATSAPI_REQUEST_DURATION.observe(time.perf_counter() - started,
+                                                  endpoint=endpoint, status=response.status_code)
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response
+                reason = str(response.status_code)
+                delay = backoff_delay(attempt, retry_after_seconds(response.headers.get('Retry-After')))
+                # 本文を読み切って接続をプールに返す
+                response.close()
+
+            STATSAPI_RETRIES.inc(endpoint=endpoint, reason=reason)
+            print(f"⚠️ statsapiリトライ {attempt + 1}/{self.max_retries} ({endpoint}, {reason}) {delay:.1f}秒後")
+            time.sleep(delay)
+
+    def get_json(self, path, params=None, timeout=None, ttl=None):
+        """GETしてJSONを返す（ディスクキャッシュ・条件付きリクエスト込み）
+
+        ttlを省略するとcache_ttl()で決める。ttl=0なら毎回再検証する。
+        """
+        if self.cache is None:
+            return self.get(path, params=params, timeout=timeout).json()
+
+        url = self.url(path)
+        key = self.cache.key(url, params)
+        entry = self.cache.load(key)
+        ttl = cache_ttl(path, params) if ttl is None else ttl
+
+        if entry is not None and (self.offline or time.time() - entry['fetched_at'] < ttl):
+            CACHE_REQUESTS.inc(cache='statsapi', result='hit')
+            return entry['body']
+        if self.offline:
+            CACHE_REQUESTS.inc(cache='statsapi', result='offline_miss')
+            raise StatsApiOfflineError(f"オフラインモードでキャッシュがありません: {url}")
+
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            response = self.get(path, params=params, timeout=timeout, headers=headers or None)
+        except requests.exceptions.RequestException as e:
+            if entry is None:
+                raise
+            # 取得に失敗したら期限切れのキャッシュで続行する
+            CACHE_REQUESTS.inc(cache='statsapi', result='stale')
+            print(f"⚠️ statsapi取得失敗のため期限切れのキャッシュを使用します ({endpoint_label(path)}): {e}")
+            return entry['body']
+
+        if response.status_code == 304 and entry is not None:
+            CACHE_REQUESTS.inc(cache='statsapi', result='revalidated')
+            entry['fetched_at'] = time.time()
+        else:
+            CACHE_REQUESTS.inc(cache='statsapi', result='miss')
+            entry = {
+                'url': url,
+                'params': params or {},
+                'fetched_at': time.time(),
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'body': response.json(),
+            }
+        self.cache.store(key, entry)
+        return entry['body']
+
+    def get_stats_coalesced(self, path, queries, params=None, timeout=None, ttl=None):
+        """stats/groupだけが違う取得を1リクエストにまとめ、組み合わせごとに分けて返す
+
+        queriesは (stats, group) のリスト。stats=season,gameLog&group=hitting,pitching のように
+        まとめて送るので、応答には全組み合わせが入る（使わない組み合わせは捨てる）。
+        戻り値は {(stats, group): 単独で取得した場合と同じ形の応答}。
+        """
+        stats_types = list(dict.fromkeys(stats_type for stats_type, _ in queries))
+        groups = list(dict.fromkeys(group for _, group in queries))
+        merged = dict(params or {}, stats=','.join(stats_types), group=','.join(groups))
+        data = self.get_json(path, params=merged, timeout=timeout, ttl=ttl)
+
+        responses = {tuple(query): {'stats': []} for query in queries}
+        for entry in data.get('stats', []):
+            query = (entry.get('type', {}).get('displayName'), entry.get('group', {}).get('displayName'))
+            if query in responses:
+                responses[query]['stats'].append(entry)
+        return responses
+
+    def iter_items(self, path, prefix, params=None, timeout=None):
+        """応答JSONのprefixの要素を1件ずつ返すジェネレータ（ディスクキャッシュは使わない）
+
+        prefixはijson形式（例: 'stats.item.splits.item'）。ijsonがあれば応答を
+        ストリームのまま解析するので、応答全体をメモリに載せない。
+        """
+        response = self.get(path, params=params, timeout=timeout, stream=True)
+        try:
+            if ijson is None:
+                yield from _walk_prefix(response.json(), prefix.split('.'))
+            else:
+                response.raw.decode_content = True
+                yield from ijson.items(response.raw, prefix, use_float=True)
+        finally:
+            response.close()
+
+    def connection_stats(self):
+        """接続プールの統計 {'requests': リクエスト数, 'connections': 新規接続数, 'reused': 再利用数}"""
+        pools = self._adapter.poolmanager.pools
+        with pools.lock:
+            pool_list = list(pools._container.values())
+        num_requests = sum(pool.num_requests for pool in pool_list)
+        num_connections = sum(pool.num_connections for pool in pool_list)
+        return {'requests': num_requests, 'connections': num_connections,
+                'reused': max(num_requests - num_connections, 0)}
+
+    def print_connection_stats(self):
+        """接続の再利用状況を表示"""
+        stats = self.connection_stats()
+        print(f"🔌 statsapi: {stats['requests']}リクエスト / 新規接続{stats['connections']} / 再利用{stats['reused']}")
+        if self.cache is not None:
+            counts = {result: CACHE_REQUESTS.value(cache='statsapi', result=result)
+                      for result in ('hit', 'revalidated', 'miss', 'stale')}
+            print(f"💾 キャッシュ: ヒット{counts['hit']} / 再検証(304){counts['revalidated']} / "
+                  f"取得{counts['miss']} / 期限切れ使用{counts['stale']}")
+        if self.rate_limiter is not None:
+            waits = self.rate_limiter.wait_stats()
+            print(f"🪣 レート制限: {self.rate_limiter.rate:g} req/s（容量{self.rate_limiter.burst:g}） / "
+                  f"待機{waits['waits']}回 合計{waits['seconds']:.1f}秒")
+
+    def close(self):
+        _clients.discard(self)
+        self.session.close()
+
+
+class CoalescedStats:
+    """同じエンドポイントへの (stats, group) 違いの取得を、最初のget()で1回だけまとめて行う
+
+    複数のスレッドから同時にget()しても、リクエストは最初の1スレッドだけが送り、
+    他のスレッドはその結果を使う。取得に失敗した場合は次のget()で再取得する。
+    """
+
+    def __init__(self, client, path, queries, params=None):
+        self.client = client
+        self.path = path
+        self.queries = list(queries)
+        self.params = params
+        self._responses = None
+        self._lock = threading.Lock()
+
+    def get(self, stats_type, group):
+        """(stats, group) の応答（{'stats': [...]}）"""
+        with self._lock:
+            if self._responses is None:
+                self._responses = self.client.get_stats_coalesced(self.path, self.queries, self.params)
+        return self._responses.get((stats_type, group), {'stats': []})
+
+
+def _walk_prefix(node, parts):
+    """ijsonのprefixと同じ規則でJSONオブジェクトから要素を取り出す"""
+    if not parts:
+        yield node
+        return
+    head, rest = parts[0], parts[1:]
+    if head == 'item':
+        for item in node if isinstance(node, list) else []:
+            yield from _walk_prefix(item, rest)
+    elif isinstance(node, dict) and head in node:
+        yield from _walk_prefix(node[head], rest)
+
+
+def get_client():
+    """プロセス共有のクライアントを取得"""
+    global _default_client
+    if _default_client is None:
+        with _default_lock:
+            if _default_client is None:
+                _default_client = StatsApiClient()
+    return _default_client
+
+
+def _connection_samples():
+    totals = {'requests': 0, 'connections': 0, 'reused': 0}
+    for client in list(_clients):
+        for kind, value in client.connection_stats().items():
+            totals[kind] += value
+    return {(kind,): value for kind, value in totals.items()}
+
+
+STATSAPI_CONNECTIONS.set_function(_connection_samples)
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+statsapi.mlb.com のローカル代替サーバー
+取り込みスクリプトを本番APIなしで動かす・計測するためのHTTPサーバー
+
+モード:
+  --fixtures DIR               記録済みの応答を再生（無いものは --synthetic なら合成、そうでなければ404）
+  --fixtures DIR --record      本番APIに中継して応答をDIRに記録
+  --synthetic                  選手ID・シーズンから決定的に合成したデータを返す（何人・何シーズンでも可）
+
+対応エンドポイント（/api/v1 以下）:
+  /people/{id}/stats   stats=gameLog|season, group=hitting|pitching, season, startDate/endDate
+  /people              personIds, hydrate=stats(group=[...],type=[season],season=N)
+  /schedule            teamId, season, startDate/endDate（--today でシーズン途中を再現）
+
+  python3 statsapi_stub.py --synthetic --port 8089 --latency 50 --error-rate 0.05
+  STATSAPI_BASE_URL=http://127.0.0.1:8089/api/v1 python3 fetch_2025_data.py
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import requests
+
+API_PREFIX = '/api/v1'
+UPSTREAM_URL = 'https://statsapi.mlb.com'
+
+# 合成データのシーズン構成
+SEASON_GAMES = 162
+SEASON_OPENING = (3, 28)
+
+
+def fixture_key(path, query):
+    """パスとクエリ（順不同）から記録ファイル名を作る"""
+    canonical = path + '?' + '&'.join(f"{k}={v}" for k, v in sorted(query))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _parse_date(value):
+    """statsapiの日付パラメータ（MM/DD/YYYY または YYYY-MM-DD）をdateに変換"""
+    for fmt in ('%m/%d/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    return None
+
+
+class SyntheticData:
+    """選手ID・シーズンごとに決定的な試合データを合成する"""
+
+    def __init__(self, today=None):
+        self.today = today or date.today()
+
+    def schedule_dates(self, season):
+        """シーズンの試合日（週1回の休養日を挟んで162試合）"""
+        day = date(season, *SEASON_OPENING)
+        dates = []
+        while len(dates) < SEASON_GAMES:
+            if day.weekday() != 3:  # 木曜は休み
+                dates.append(day)
+            day += timedelta(days=1)
+        return dates
+
+    def game_pk(self, season, index):
+        return season * 10000 + index
+
+    def game_log(self, player_id, season, group):
+        """その選手の完了済み試合のsplits"""
+        rng = random.Random(f"{player_id}:{season}:{group}")
+        splits = []
+        for index, day in enumerate(self.schedule_dates(season)):
+            if day >= self.today:
+                break
+            if group == 'pitching':
+                if index % 6 != int(player_id) % 6:  # 6試合に1回の先発
+                    continue
+                stat = {
+                    'inningsPitched': f"{rng.randint(4, 7)}.{rng.randint(0, 2)}",
+                    'hits': rng.randint(2, 8), 'runs': rng.randint(0, 5), 'earnedRuns': rng.randint(0, 4),
+                    'baseOnBalls': rng.randint(0, 4), 'strikeOuts': rng.randint(3, 11),
+                    'homeRuns': rng.randint(0, 2), 'gamesPlayed': 1, 'gamesStarted': 1,
+                }
+            else:
+                at_bats = rng.randint(3, 5)
+                hits = sum(rng.random() < 0.27 for _ in range(at_bats))
+                home_runs = sum(rng.random() < 0.25 for _ in range(hits))
+                stat = {
+                    'gamesPlayed': 1, 'atBats': at_bats, 'hits': hits, 'homeRuns': home_runs,
+                    'doubles': rng.randint(0, hits - home_runs) if hits > home_runs else 0, 'triples': 0,
+                    'rbi': home_runs + rng.randint(0, 2), 'runs': home_runs + rng.randint(0, 1),
+                    'baseOnBalls': rng.randint(0, 2), 'strikeOuts': rng.randint(0, 3),
+                    'stolenBases': int(rng.random() < 0.2),
+                    'hitByPitch': int(rng.random() < 0.05), 'sacFlies': int(rng.random() < 0.03),
+                }
+            splits.append({
+                'season': str(season),
+                'stat': stat,
+                'team': {'id': 119, 'name': 'Los Angeles Dodgers'},
+                'opponent': {'id': 100 + index % 29, 'name': f"Opponent {index % 29}"},
+                'date': day.isoformat(),
+                'gameType': 'R',
+                'isHome': index % 2 == 0,
+                'isWin': rng.random() < 0.55,
+                'game': {'gamePk': self.game_pk(season, index)},
+            })
+        return splits
+
+    def season_stat(self, player_id, season, group):
+        """ゲームログを合算したシーズン成績"""
+        totals = {}
+        for split in self.game_log(player_id, season, group):
+            for key, value in split['stat'].items():
+                if isinstance(value, int):
+                    totals[key] = totals.get(key, 0) + value
+        if group == 'hitting' and totals.get('atBats'):
+            totals['avg'] = f"{totals['hits'] / totals['atBats']:.3f}".lstrip('0')
+        return totals
+
+    def person_stats(self, player_id, query):
+        season = int(query.get('season', self.today.year))
+        start, end = _parse_date(query.get('startDate', '')), _parse_date(query.get('endDate', ''))
+        stats = []
+        # stats=season,gameLog&group=hitting,pitching のようなまとめた指定は全組み合わせを返す
+        for stats_type in query.get('stats', 'season').split(','):
+            for group in query.get('group', 'hitting').split(','):
+                if stats_type == 'gameLog':
+                    splits = [s for s in self.game_log(player_id, season, group)
+                              if (start is None or s['date'] >= start.isoformat())
+                              and (end is None or s['date'] <= end.isoformat())]
+                else:
+                    splits = [{'season': str(season), 'stat': self.season_stat(player_id, season, group)}]
+                stats.append({'type': {'displayName': stats_type}, 'group': {'displayName': group}, 'splits': splits})
+        return {'stats': stats}
+
+    def people(self, query):
+        hydrate = query.get('hydrate', '')
+        groups = re.search(r'group=\[([^\]]*)\]', hydrate)
+        groups = groups.group(1).split(',') if groups else ['hitting']
+        season = re.search(r'season=(\d+)', hydrate)
+        season = int(season.group(1)) if season else self.today.year
+        people = []
+        for player_id in query.get('personIds', '').split(','):
+            if not player_id.strip().isdigit():
+                continue
+            stats = [{'type': {'displayName': 'season'}, 'group': {'displayName': group},
+                      'splits': [{'season': str(season), 'stat': self.season_stat(player_id, season, group)}]}
+                     for group in groups] if 'stats(' in hydrate else []
+            people.append({'id': int(player_id), 'fullName': f"Player {player_id}", 'stats': stats})
+        return {'people': people}
+
+    def schedule(self, query):
+        season = int(query.get('season', self.today.year))
+        team_id = int(query.get('teamId', 119))
+        start, end = _parse_date(query.get('startDate', '')), _parse_date(query.get('endDate', ''))
+        dates = []
+        for index, day in enumerate(self.schedule_dates(season)):
+            if (start and day < start) or (end and day > end):
+                continue
+            state = 'Final' if day < self.today else 'Preview'
+            team = {'id': team_id, 'name': f"Team {team_id}"}
+            opponent = {'id': 100 + index % 29, 'name': f"Opponent {index % 29}"}
+            home, away = (team, opponent) if index % 2 == 0 else (opponent, team)
+            dates.append({'date': day.isoformat(), 'games': [{
+                'gamePk': self.game_pk(season, index),
+                'gameDate': f"{(day + timedelta(days=1)).isoformat()}T02:10:00Z",
+                'officialDate': day.isoformat(),
+                'status': {'abstractGameState': state, 'detailedState': 'Final' if state == 'Final' else 'Scheduled'},
+                'teams': {'home': {'team': home}, 'away': {'team': away}},
+                'doubleHeader': 'N',
+                'gameNumber': 1,
+            }]})
+        return {'dates': dates}
+
+    def respond(self, path, query):
+        """(ステータスコード, 本文dict) を返す"""
+        match = re.fullmatch(r'/people/(\d+)/stats', path)
+        if match:
+            return 200, self.person_stats(match.group(1), query)
+        if path == '/people':
+            return 200, self.people(query)
+        if path == '/schedule':
+            return 200, self.schedule(query)
+        return 404, {'message': f"Object not found: {path}"}
+
+
+class StubConfig:
+    def __init__(self, fixtures_dir=None, record=False, synthetic=False, latency=0.0, jitter=0.0,
+                 error_rate=0.0, error_status=503, seed=None, today=None):
+        self.fixtures_dir = fixtures_dir
+        self.record = record
+        self.synthetic = SyntheticData(today) if synthetic else None
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.error_count = 0
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = None
+
+    def do_GET(self):
+        config = self.config
+        parsed = urlparse(self.path)
+        query_items = parse_qsl(parsed.query, keep_blank_values=True)
+        path = parsed.path[len(API_PREFIX):] if parsed.path.startswith(API_PREFIX) else parsed.path
+
+        with config.lock:
+            config.request_count += 1
+            delay = config.latency + config.rng.uniform(0, config.jitter)
+            inject_error = config.rng.random() < config.error_rate
+            if inject_error:
+                config.error_count += 1
+        if delay:
+            time.sleep(delay)
+        if inject_error:
+            self._send(config.error_status, {'message': 'injected error'}, {'Retry-After': '0'})
+            return
+
+        status, body = self._fixture(path, query_items)
+        if status is None and config.synthetic is not None:
+            status, body = config.synthetic.respond(path, dict(query_items))
+        if status is None:
+            status, body = 404, {'message': f"fixture not found: {path}"}
+        self._send(status, body)
+
+    def _fixture(self, path, query_items):
+        config = self.config
+        if not config.fixtures_dir:
+            return None, None
+        fixture_path = os.path.join(config.fixtures_dir, fixture_key(path, query_items) + '.json')
+        if config.record:
+            response = requests.get(f"{UPSTREAM_URL}{API_PREFIX}{path}", params=query_items, timeout=(3.05, 20))
+            body = response.json() if response.content else {}
+            os.makedirs(config.fixtures_dir, exist_ok=True)
+            with open(fixture_path, 'w', encoding='utf-8') as f:
+                json.dump({'path': path, 'query': query_items, 'status': response.status_code, 'body': body},
+                          f, ensure_ascii=False)
+            return response.status_code, body
+        try:
+            with open(fixture_path, 'r', encoding='utf-8') as f:
+                fixture = json.load(f)
+        except OSError:
+            return None, None
+        return fixture['status'], fixture['body']
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json;charset=UTF-8')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(config, host='127.0.0.1', port=0):
+    """バックグラウンドスレッドでサーバーを起動し (server, base_url) を返す"""
+    handler = type('ConfiguredStubHandler', (StubHandler,), {'config': config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}{API_PREFIX}"
+
+
+def main():
+    """メイン実行関数"""
+    parser = argparse.ArgumentParser(description='statsapi.mlb.com のローカル代替サーバー')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--fixtures', help='記録済み応答のディレクトリ')
+    parser.add_argument('--record', action='store_true', help='本番APIに中継して応答を記録')
+    parser.add_argument('--synthetic', action='store_true', help='合成データで応答')
+    parser.add_argument('--latency', type=float, default=0.0, help='応答ごとの遅延（ミリ秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='遅延に加えるランダム幅（ミリ秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='エラーを返す割合（0〜1）')
+    parser.add_argument('--error-status', type=int, default=503, help='注入するエラーのステータスコード')
+    parser.add_argument('--seed', type=int, help='遅延・エラー注入の乱数シード')
+    parser.add_argument('--today', help='合成データの「今日」（YYYY-MM-DD。シーズン途中を再現する）')
+    args = parser.parse_args()
+
+    if not args.fixtures and not args.synthetic:
+        parser.error('--fixtures または --synthetic を指定してください')
+
+    config = StubConfig(args.fixtures, args.record, args.synthetic, args.latency / 1000, args.jitter / 1000,
+                        args.error_rate, args.error_status, args.seed,
+                        _parse_date(args.today) if args.today else None)
+    server, base_url = start_server(config, args.host, args.port)
+    print(f"🧪 statsapi代替サーバー起動: {base_url}")
+    print(f"   STATSAPI_BASE_URL={base_url} を設定して取り込みスクリプトを実行してください")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"\n📊 {config.request_count}リクエスト（注入エラー{config.error_count}件）")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,74 @@
 # -*- coding: utf-8 -*-
-from flask import Flask, render_template_string
-import pandas as pd
+from flask import Flask, Response, abort, jsonify, render_template_string, request
 import json
 import os
+import time
+
+from chart_figures import build_prediction_figure
+from http_cache import cached_json, cached_page
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REQUEST_DURATION, render_latest, timed_loader
+from monitor_state import get_monitor_state
+from plotly_assets import bundle_url as plotly_bundle_url, resolve_bundle as resolve_plotly_bundle
+import processed_snapshots
+from static_site import serve_site_file, site_file_for_path
+from stats_store import stats_store
 
 app = Flask(__name__)
 
+# 静的サイト書き出し先（設定時は書き出し済みファイルを優先して返す）
+STATIC_SITE_DIR = os.environ.get('STATIC_SITE_DIR')
+
+@app.before_request
+def start_request_timer():
+    """リクエスト処理時間の計測開始"""
+    request.environ['ohtani.request_started'] = time.perf_counter()
+
+@app.after_request
+def record_request_duration(response):
+    """ルートごとのリクエスト処理時間を記録"""
+    started = request.environ.get('ohtani.request_started')
+    if started is not None:
+        # URLパターンで集計する（未定義のパスは1つにまとめる）
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_DURATION.observe(time.perf_counter() - started,
+                                 route=route, method=request.method, status=response.status_code)
+    return response
+
+@app.before_request
+def serve_exported_site():
+    """static_site.pyで書き出したページがあればそのまま返す"""
+    if not STATIC_SITE_DIR or request.method not in ('GET', 'HEAD'):
+        return None
+    path = site_file_for_path(STATIC_SITE_DIR, request.path)
+    if path is None:
+        return None
+    return serve_site_file(path, immutable=request.path.startswith('/static/'))
+
+# データを読み込めないときの比較データ（公式の成績）
+FALLBACK_COMPARISON_DATA = {
+    'batting_2024': {'avg': 0.31, 'games': 159, 'home_runs': 54, 'rbi': 130, 'ops': 1.066, 'stolen_bases': 59},
+    'batting_2025': {'avg': 0.285, 'games': 126, 'total_games': 162, 'home_runs': 44, 'rbi': 82, 'ops': 1.019, 'stolen_bases': 15, 'remaining_games': 36},
+    'pitching_2025': {'era': 3.47, 'games': 9, 'strikeouts': 32, 'wins': 0, 'losses': 0, 'whip': 1.11, 'innings_pitched': 23.1}
+}
+
+@timed_loader
 def load_comparison_data():
     """比較データを読み込み"""
     try:
+        snapshot = stats_store.snapshot()
+
         # 2024年データ（参考用）
-        df_batting_2024 = pd.read_csv('data/processed/ohtani_batting_2024_final.csv')
-        batting_2024 = df_batting_2024.iloc[0].to_dict()
+        if snapshot.batting_2024 is None:
+            raise ValueError("2024年打撃データがありません")
+        batting_2024 = dict(snapshot.batting_2024)
         
         # ドジャースの試合数を取得
-        try:
-            with open('data/processed/dodgers_games_2025.json', 'r', encoding='utf-8') as f:
-                dodgers_data = json.load(f)
-                games_played_2025 = dodgers_data['completed_games']
-                remaining_games = dodgers_data['remaining_games']
-                total_games = dodgers_data['total_games']
-        except:
+        dodgers_games = snapshot.dodgers_games
+        if dodgers_games is not None:
+            games_played_2025 = dodgers_games.completed_games
+            remaining_games = dodgers_games.remaining_games
+            total_games = dodgers_games.total_games
+        else:
             # フォールバック値
             games_played_2025 = 126
             remaining_games = 36
@@ -28,26 +76,27 @@ def load_comparison_data():
         
 
         
+        # 2025年の成績は成績DBのシーズン集計（試合の取り込み時に更新される1行）をそのまま使う
+        season_totals = snapshot.season_totals or {}
+        batting = season_totals.get('batting')
+        pitching = season_totals.get('pitching')
+        if batting is None or pitching is None:
+            raise ValueError("成績DBに2025年のシーズン成績がありません")
+        
         batting_2025 = {
-            'avg': 0.285,
+            'avg': batting['avg'],
             'games': games_played_2025,
             'total_games': total_games,
-            'home_runs': 44,
-            'rbi': 82,
-            'ops': 1.019,
-            'stolen_bases': 15,
+            'home_runs': batting['home_runs'],
+            'rbi': batting['rbi'],
+            'ops': batting['ops'],
+            # OPS・盗塁は数が分からない試合（以前から入っている行）がある間はNone（不明）
+            'stolen_bases': batting['stolen_bases'],
             'remaining_games': remaining_games
         }
         
-        pitching_2025 = {
-            'era': 3.47,
-            'games': 9,
-            'strikeouts': 32,
-            'wins': 0,
-            'losses': 0,
-            'whip': 1.11,
-            'innings_pitched': 23.1
-        }
+        pitching_2025 = {key: pitching[key]
+                         for key in ('era', 'games', 'strikeouts', 'wins', 'losses', 'whip', 'innings_pitched')}
         
         return {
             'batting_2024': batting_2024,
@@ -57,44 +106,42 @@ def load_comparison_data():
     except Exception as e:
         print(f"データ読み込みエラー: {e}")
         # フォールバックデータ
-        return {
-            'batting_2024': {'avg': 0.31, 'games': 159, 'home_runs': 54, 'rbi': 130, 'ops': 1.066, 'stolen_bases': 59},
-            'batting_2025': {'avg': 0.285, 'games': 126, 'total_games': 162, 'home_runs': 44, 'rbi': 82, 'ops': 1.019, 'stolen_bases': 15, 'remaining_games': 36},
-            'pitching_2025': {'era': 3.47, 'games': 9, 'strikeouts': 32, 'wins': 0, 'losses': 0, 'whip': 1.11, 'innings_pitched': 23.1}
-        }
+        return {key: dict(value) for key, value in FALLBACK_COMPARISON_DATA.items()}
 
 
 
+@timed_loader
 def load_home_run_comparison_data():
     """ホームラン比較チャートデータを読み込み"""
     try:
-        with open('data/processed/home_run_comparison_data.json', 'r', encoding='utf-8') as f:
+        path = processed_snapshots.resolve('data/processed/home_run_comparison_data.json',
+                                          processed_snapshots.current_manifest())
+        with open(path, 'r', encoding='utf-8') as f:
             return json.load(f)
     except Exception as e:
         print(f"ホームラン比較データ読み込みエラー: {e}")
         return None
 
+@timed_loader
 def load_home_run_week_comparison_data():
     """週番号ベースホームラン比較チャートデータを読み込み（予測データ含む）"""
-    try:
-        with open('data/processed/home_run_with_prediction.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return data['chart_data']  # chart_dataの部分を返す
-    except Exception as e:
-        print(f"週番号ベースホームラン比較データ読み込みエラー: {e}")
+    week_chart = stats_store.snapshot().week_chart
+    if week_chart is None:
+        print("週番号ベースホームラン比較データ読み込みエラー: データがありません")
         return None
+    return week_chart.to_dict()  # chart_data形式で返す
 
+@timed_loader
 def load_home_run_prediction_info():
     """ホームラン予測情報を読み込み"""
-    try:
-        with open('data/processed/home_run_with_prediction.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return data.get('prediction_info', {})
-    except Exception as e:
-        print(f"ホームラン予測情報読み込みエラー: {e}")
-        return {}
+    return dict(stats_store.snapshot().prediction_info)
+
+def format_stat(value):
+    """成績の表示（不明な値は「-」）"""
+    return '-' if value is None else value
 
 @app.route('/')
+@cached_page(stats_store.snapshot)
 def index():
     """2025年成績メインのページ"""
     data = load_comparison_data()
@@ -288,12 +335,12 @@ def index():
                                 <div class="stat-comparison">(2024年: {data['batting_2024']['rbi']}打点)</div>
                             </div>
                             <div class="stat-item">
-                                <div class="stat-value">{data['batting_2025']['ops']}</div>
+                                <div class="stat-value">{format_stat(data['batting_2025']['ops'])}</div>
                                 <div class="stat-label">OPS</div>
                                 <div class="stat-comparison">(2024年: {data['batting_2024']['ops']})</div>
                             </div>
                             <div class="stat-item">
-                                <div class="stat-value">{data['batting_2025']['stolen_bases']}</div>
+                                <div class="stat-value">{format_stat(data['batting_2025']['stolen_bases'])}</div>
                                 <div class="stat-label">盗塁</div>
                                 <div class="stat-comparison">(2024年: {data['batting_2024']['stolen_bases']}盗塁)</div>
                             </div>
@@ -320,6 +367,7 @@ def index():
 
 
 @app.route('/home-run-comparison')
+@cached_page(stats_store.snapshot)
 def home_run_comparison():
     """ホームラン比較チャートページ（週番号ベース）"""
     week_comparison_data = load_home_run_week_comparison_data()
@@ -330,7 +378,6 @@ def home_run_comparison():
     
     chart_data_2024 = week_comparison_data['2024']
     chart_data_2025 = week_comparison_data['2025']
-    weeks = week_comparison_data['weeks']
     
     html = f"""
     <!DOCTYPE html>
@@ -338,7 +385,8 @@ def home_run_comparison():
     <head>
         <title>大谷翔平 ホームラン推移 - 2024年 vs 2025年（予測含む）</title>
         <meta charset="utf-8">
-        <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
+        <link rel="preload" href="/api/v1/home-runs/figure" as="fetch" crossorigin>
+        <script src="{plotly_bundle_url()}" defer></script>
         <style>
             body {{
                 font-family: Arial, sans-serif;
@@ -487,118 +535,185 @@ def home_run_comparison():
         </div>
         
         <script>
-            const chartData = {json.dumps(week_comparison_data)};
-            const predictionInfo = {json.dumps(prediction_info)};
-            
-            // 2025年のデータを実績と予測に分ける
-            const currentWeek = predictionInfo.current_week || 23;
-            const weeks2025 = chartData.weeks;
-            const data2025 = chartData['2025'];
-            
-            // 実績データ（現在の週まで）
-            const actualWeeks = weeks2025.filter(w => w <= currentWeek);
-            const actualData = data2025.slice(0, actualWeeks.length);
-            
-            // 予測データ（現在の週から最後まで）
-            const predictionWeeks = weeks2025.filter(w => w >= currentWeek);
-            const predictionData = data2025.slice(actualWeeks.length - 1); // 接続のため1つ前から開始
-            
-            const trace2024 = {{
-                x: chartData.weeks,
-                y: chartData['2024'].map(val => val === null ? null : val),
-                type: 'scatter',
-                mode: 'lines+markers',
-                line: {{
-                    color: '#95a5a6',
-                    width: 2,
-                    dash: 'dash'
-                }},
-                marker: {{
-                    color: '#95a5a6',
-                    size: 6
-                }},
-                name: '2024年'
-            }};
-            
-            const trace2025Actual = {{
-                x: actualWeeks,
-                y: actualData,
-                type: 'scatter',
-                mode: 'lines+markers',
-                line: {{
-                    color: '#e74c3c',
-                    width: 3
-                }},
-                marker: {{
-                    color: '#e74c3c',
-                    size: 8
-                }},
-                name: '2025年（実績）'
-            }};
-            
-            const trace2025Prediction = {{
-                x: predictionWeeks,
-                y: predictionData,
-                type: 'scatter',
-                mode: 'lines+markers',
-                line: {{
-                    color: '#3498db',
-                    width: 3,
-                    dash: 'dot'
-                }},
-                marker: {{
-                    color: '#3498db',
-                    size: 6
-                }},
-                name: '2025年（予測）'
-            }};
-            
-            const layout = {{
-                title: {{
-                    text: 'ホームラン累積推移比較 - 2024年 vs 2025年（週番号ベース）',
-                    font: {{
-                        size: 18,
-                        color: '#2c3e50'
-                    }}
-                }},
-                xaxis: {{
-                    title: 'シーズン開始からの週数',
-                    rangemode: 'tozero'
-                }},
-                yaxis: {{
-                    title: '累積ホームラン数',
-                    rangemode: 'tozero'
-                }},
-                plot_bgcolor: 'white',
-                paper_bgcolor: 'white',
-                margin: {{
-                    l: 60,
-                    r: 40,
-                    t: 80,
-                    b: 80
-                }},
-                showlegend: true,
-                legend: {{
-                    x: 0.02,
-                    y: 0.98,
-                    bgcolor: 'rgba(255,255,255,0.8)',
-                    bordercolor: '#ccc',
-                    borderwidth: 1
-                }}
-            }};
-            
-            const config = {{
-                responsive: true,
-                displayModeBar: false
-            }};
-            
-            Plotly.newPlot('chart', [trace2024, trace2025Actual, trace2025Prediction], layout, config);
+            // 図の定義（トレース・レイアウト）はサーバー側で組み立て済み
+            document.addEventListener('DOMContentLoaded', function() {{
+                fetch('/api/v1/home-runs/figure')
+                    .then(response => response.json())
+                    .then(figure => Plotly.newPlot('chart', figure.data, figure.layout, figure.config));
+            }});
         </script>
     </body>
     </html>
     """
     return html
 
+@app.route('/api/v1/season-summary')
+@cached_json(stats_store.snapshot)
+def api_season_summary():
+    """シーズン成績サマリー（2024年打撃・2025年打撃・2025年投手）"""
+    data = load_comparison_data()
+    data['version'] = stats_store.snapshot().version
+    return data
+
+@app.route('/api/v1/home-runs/weekly')
+@cached_json(stats_store.snapshot)
+def api_home_runs_weekly():
+    """週番号ベースの累積ホームラン推移（2025年は予測データ含む）"""
+    week_comparison_data = load_home_run_week_comparison_data()
+    if not week_comparison_data:
+        return jsonify({'error': 'ホームラン比較データが見つかりません。'}), 404
+    week_comparison_data['version'] = stats_store.snapshot().version
+    return week_comparison_data
+
+@app.route('/api/v1/prediction')
+@cached_json(stats_store.snapshot)
+def api_prediction():
+    """ホームラン予測情報"""
+    prediction_info = load_home_run_prediction_info()
+    if not prediction_info:
+        return jsonify({'error': 'ホームラン予測データが見つかりません。'}), 404
+    prediction_info['version'] = stats_store.snapshot().version
+    return prediction_info
+
+@app.route('/api/v1/home-runs/figure')
+@cached_json(stats_store.snapshot)
+def api_home_runs_figure():
+    """ホームラン推移チャートのPlotly図定義（data/layout/config）"""
+    week_comparison_data = load_home_run_week_comparison_data()
+    if not week_comparison_data:
+        return jsonify({'error': 'ホームラン比較データが見つかりません。'}), 404
+    return build_prediction_figure(week_comparison_data, load_home_run_prediction_info())
+
+@app.route('/static/vendor/<filename>')
+def vendor_asset(filename):
+    """バージョン固定のPlotly.jsバンドル（ファイル名にバージョンを含むので永続キャッシュ可）"""
+    bundle = resolve_plotly_bundle()
+    if bundle is None or bundle[0] != filename:
+        abort(404)
+    # static/vendorに圧縮版（.gz/.br）があればそれを返す
+    return serve_site_file(bundle[1], immutable=True)
+
+@app.route('/healthz')
+def healthz():
+    """死活確認（プロセスが応答できるかだけを返す）"""
+    response = Response('{"status":"ok"}', mimetype='application/json')
+    response.cache_control.no_store = True
+    return response
+
+@app.route('/readyz')
+def readyz():
+    """準備完了確認（メモリ上のデータのバージョンと経過時間を返す。読み込みは行わない）"""
+    snapshot = stats_store.peek()
+    if snapshot is None:
+        # 初回の読み込みはバックグラウンドで始め、完了するまで503を返す
+        stats_store.warm_up()
+        response = jsonify({'status': 'loading'})
+        response.status_code = 503
+    else:
+        response = jsonify({
+            'status': 'ready',
+            'version': snapshot.version,
+            'loaded_at': snapshot.loaded_at,
+            'age_seconds': round(time.time() - snapshot.loaded_at, 3),
+            'last_modified': snapshot.last_modified.isoformat() if snapshot.last_modified else None,
+            'batting_2024': snapshot.batting_2024 is not None,
+            'dodgers_games': snapshot.dodgers_games is not None,
+            'week_chart': snapshot.week_chart is not None,
+            'season_totals': snapshot.season_totals is not None,
+        })
+    response.cache_control.no_store = True
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Prometheusテキスト形式のメトリクス"""
+    return Response(render_latest(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/api/status')
+def api_status():
+    """監視ステータス（メモリ上のシリアライズ済みJSONを返すだけ）"""
+    monitor_state = get_monitor_state()
+    _, status_json = monitor_state.status()
+    response = Response(status_json, mimetype='application/json')
+    response.cache_control.no_store = True
+    return response
+
+@app.route('/api/events')
+def api_events():
+    """監視ステータスの変更をServer-Sent Eventsで配信"""
+    monitor_state = get_monitor_state()
+    # ストリームはスレッドを占有するので上限を超えたら断り、ブラウザには/api/statusをポーリングさせる
+    if not monitor_state.open_stream():
+        response = jsonify({'error': 'ストリーム数が上限に達しています。/api/status を利用してください'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    response = Response(monitor_state.event_stream(), mimetype='text/event-stream')
+    response.call_on_close(monitor_state.close_stream)
+    response.cache_control.no_cache = True
+    response.headers['X-Accel-Buffering'] = 'no'  # nginxでのバッファリングを無効化
+    return response
+
+@app.route('/api/start-monitoring', methods=['POST'])
+def api_start_monitoring():
+    """監視開始"""
+    monitor_state = get_monitor_state()
+    if monitor_state.detector is None:
+        return jsonify({'success': False, 'error': '曲検出モジュールが設定されていません'})
+    if not monitor_state.start_monitoring():
+        return jsonify({'success': False, 'error': '既に監視中です'})
+    return jsonify({'success': True, 'message': '監視を開始しました'})
+
+@app.route('/api/stop-monitoring', methods=['POST'])
+def api_stop_monitoring():
+    """監視停止"""
+    monitor_state = get_monitor_state()
+    if not monitor_state.stop_monitoring():
+        return jsonify({'success': False, 'error': '監視中ではありません'})
+    return jsonify({'success': True, 'message': '監視を停止しました'})
+
+@app.route('/api/test-detection')
+def api_test_detection():
+    """曲検出を一度だけ実行"""
+    monitor_state = get_monitor_state()
+    if monitor_state.detector is None:
+        return jsonify({'success': False, 'error': '曲検出モジュールが設定されていません'})
+    try:
+        song_info, _ = monitor_state.detect()
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'検出エラー: {e}'})
+    return jsonify({'success': True, 'is_playing': bool(song_info), 'song_info': song_info})
+
+@app.route('/api/refresh', methods=['POST'])
+def api_refresh():
+    """レコメンデーション更新"""
+    monitor_state = get_monitor_state()
+    if monitor_state.recommender is None:
+        return jsonify({'success': False, 'error': 'レコメンデーションモジュールが設定されていません'})
+    if not monitor_state.get('current_song'):
+        return jsonify({'success': False, 'error': '再生中の曲が検出されていません'})
+    try:
+        count = monitor_state.refresh_recommendations()
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'レコメンデーション取得エラー: {e}'})
+    return jsonify({'success': True, 'message': f'{count}件のレコメンデーションを取得しました'})
+
+@app.route('/api/create-playlist', methods=['POST'])
+def api_create_playlist():
+    """レコメンデーションからプレイリストを作成"""
+    monitor_state = get_monitor_state()
+    if monitor_state.playlist_creator is None:
+        return jsonify({'success': False, 'error': 'プレイリスト作成モジュールが設定されていません'})
+    recommendations = monitor_state.get('recommendations')
+    if not recommendations:
+        return jsonify({'success': False, 'error': 'レコメンデーションがありません'})
+    name = (request.get_json(silent=True) or {}).get('name')
+    try:
+        playlist_url = monitor_state.playlist_creator(name, recommendations)
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'プレイリスト作成エラー: {e}'})
+    return jsonify({'success': True, 'message': 'プレイリストを作成しました', 'playlist_url': playlist_url})
+
 if __name__ == '__main__':
     # Heroku用の設定
     port = int(os.environ.get('PORT', 8080))
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+rate_limiter.py のテスト
+トークンバケットの補充と、トークンが足りないときの待機を確認
+"""
+
+import time
+
+import pytest
+
+from rate_limiter import TokenBucket
+
+
+def test_burst_then_wait(tmp_path):
+    """容量までは待たずに取れ、超えた分は1トークンずつ 1/rate 秒の待ちになる"""
+    bucket = TokenBucket(str(tmp_path / 'bucket.db'), rate=10, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+    # 待っている予約の後ろに並ぶ
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.02)
+
+
+def test_refill_is_capped_at_burst(tmp_path):
+    """経過時間分だけ補充され、容量を超えては貯まらない"""
+    bucket = TokenBucket(str(tmp_path / 'bucket.db'), rate=20, burst=2)
+    bucket.reserve(2)
+    time.sleep(0.2)  # 4トークン分経過（容量は2）
+    assert bucket.reserve(2) == 0.0
+    assert bucket.reserve() > 0
+
+
+def test_acquire_blocks_until_token_is_available(tmp_path):
+    """acquire()はトークンが使えるようになるまで待ち、待った時間を記録する"""
+    bucket = TokenBucket(str(tmp_path / 'bucket.db'), rate=10, burst=1)
+    bucket.acquire()
+    started = time.monotonic()
+    waited = bucket.acquire()
+    elapsed = time.monotonic() - started
+    assert waited == pytest.approx(0.1, abs=0.02)
+    assert elapsed >= waited
+    assert bucket.wait_stats()['waits'] == 1
+
+
+def test_bucket_is_shared_through_the_file(tmp_path):
+    """同じファイル・名前のバケットは別インスタンス（別プロセス）からも同じトークンを使う"""
+    path = str(tmp_path / 'bucket.db')
+    first = TokenBucket(path, rate=10, burst=1)
+    second = TokenBucket(path, rate=10, burst=1)
+    assert first.reserve() == 0.0
+    assert second.reserve() == pytest.approx(0.1, abs=0.02)
+
+
+def test_rate_must_be_positive(tmp_path):
+    with pytest.raises(ValueError):
+        TokenBucket(str(tmp_path / 'bucket.db'), rate=0)
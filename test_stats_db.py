@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+stats_db.py のテスト
+トリガーで差分更新した集計が rebuild_aggregates() で作り直した集計と一致することを確認
+"""
+
+from stats_db import StatsDB
+
+
+def _batting(game_pk, game_date, at_bats=4, hits=1, home_runs=0, walks=0, hit_by_pitch=0, sac_flies=0):
+    return {'game_pk': game_pk, 'game_date': game_date, 'opponent': 'SD', 'at_bats': at_bats, 'hits': hits,
+            'doubles': 0, 'triples': 0, 'home_runs': home_runs, 'rbi': home_runs, 'runs': home_runs,
+            'walks': walks, 'strikeouts': 1, 'stolen_bases': 1, 'hit_by_pitch': hit_by_pitch,
+            'sac_flies': sac_flies}
+
+
+def _pitching(game_pk, game_date, outs=15, earned_runs=2, wins=0, losses=0):
+    return {'game_pk': game_pk, 'game_date': game_date, 'opponent': 'SF', 'outs': outs,
+            'hits_allowed': 4, 'runs_allowed': earned_runs, 'earned_runs': earned_runs,
+            'walks': 1, 'strikeouts': 6, 'wins': wins, 'losses': losses}
+
+
+def _aggregates(db):
+    conn = db.connect()
+    season = [tuple(row) for row in conn.execute('SELECT * FROM season_stats ORDER BY season, stat_type')]
+    weekly = [tuple(row) for row in conn.execute('SELECT * FROM weekly_stats ORDER BY season, stat_type, week_start')]
+    # 集計の行のid（AUTOINCREMENT）は作り直すと変わるので除く
+    return [row[1:] for row in season], weekly
+
+
+def test_triggers_match_rebuild(tmp_path):
+    """追加・更新・削除のあとのトリガーの集計が作り直した集計と同じ"""
+    db = StatsDB(str(tmp_path / 'stats.db'))
+    db.upsert_games('hitting', [
+        _batting(1, '2026-04-01', hits=2, home_runs=1),
+        _batting(2, '2026-04-02', walks=2, hit_by_pitch=1),
+        _batting(3, '2026-04-08', at_bats=3, sac_flies=1),
+        _batting(4, '2027-04-01', hits=3),
+    ])
+    db.upsert_games('pitching', [
+        _pitching(11, '2026-04-03', wins=1),
+        _pitching(12, '2026-04-10', outs=17, earned_runs=0),
+    ])
+    # 同じ試合の上書きと削除
+    db.upsert_games('hitting', [_batting(2, '2026-04-02', hits=3, walks=1)])
+    db.upsert_games('pitching', [_pitching(12, '2026-04-10', outs=18, earned_runs=1, losses=1)])
+    with db.connect() as conn:
+        conn.execute('DELETE FROM batting_stats WHERE game_pk = 3')
+
+    by_triggers = _aggregates(db)
+    db.rebuild_aggregates()
+    assert _aggregates(db) == by_triggers
+
+    batting = db.season_stats(2026, 'batting')
+    assert (batting['games'], batting['at_bats'], batting['hits'], batting['home_runs']) == (2, 8, 5, 1)
+    pitching = db.season_stats(2026, 'pitching')
+    assert (pitching['games'], pitching['wins'], pitching['losses']) == (2, 1, 1)
+
+
+def test_obp_uses_hit_by_pitch_and_sac_flies(tmp_path):
+    """出塁率は (安打 + 四球 + 死球) / (打数 + 四球 + 死球 + 犠飛)"""
+    db = StatsDB(str(tmp_path / 'stats.db'))
+    db.upsert_games('hitting', [
+        _batting(1, '2026-05-01', at_bats=4, hits=2, walks=1, hit_by_pitch=1),
+        _batting(2, '2026-05-02', at_bats=3, hits=0, sac_flies=1),
+    ])
+    batting = db.season_stats(2026, 'batting')
+    assert batting['obp'] == round((2 + 1 + 1) / (7 + 1 + 1 + 1), 3)
+
+
+def test_rates_are_unknown_while_counts_are_missing(tmp_path):
+    """死球・犠飛・盗塁の無い行（以前から入っている行）がある間は出塁率・OPS・盗塁を不明にする"""
+    db = StatsDB(str(tmp_path / 'stats.db'))
+    db.upsert_games('hitting', [_batting(1, '2026-05-01', hits=2)])
+    with db.connect() as conn:
+        conn.execute("INSERT INTO batting_stats (game_date, opponent, at_bats, hits, walks, obp, ops) "
+                     "VALUES ('2026-05-02', 'SD', 4, 1, 0, 0.400, 0.900)")
+    batting = db.season_stats(2026, 'batting')
+    assert (batting['obp'], batting['ops'], batting['stolen_bases']) == (None, None, None)
+    assert db.games_missing_counts('hitting', 2026) == 1
+
+    # ゲームログの取り込みで同じ日付・対戦相手の行が埋まれば数から計算する
+    db.upsert_games('hitting', [_batting(2, '2026-05-02', hits=1)])
+    batting = db.season_stats(2026, 'batting')
+    assert db.games_missing_counts('hitting', 2026) == 0
+    assert batting['obp'] == round(3 / 8, 3)
+    assert batting['stolen_bases'] == 2
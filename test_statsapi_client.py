@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+statsapi_client.py のテスト
+CoalescedStats が複数の (stats, group) の取得を1回のリクエストにまとめることを
+statsapi_stub.py の合成データで確認
+"""
+
+import threading
+from datetime import date
+
+import pytest
+import requests
+
+from statsapi_client import CoalescedStats, StatsApiClient
+from statsapi_stub import StubConfig, start_server
+
+PATH = 'people/660271/stats'
+QUERIES = [('season', 'hitting'), ('season', 'pitching'), ('gameLog', 'hitting')]
+PARAMS = {'season': 2025}
+
+
+@pytest.fixture
+def stub():
+    config = StubConfig(synthetic=True, today=date(2025, 9, 1))
+    server, base_url = start_server(config)
+    client = StatsApiClient(base_url=base_url, cache_dir=None, rate_limit=0, max_retries=0)
+    yield config, client
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_groups_are_fetched_in_one_request(stub):
+    """全組み合わせを何度・何スレッドから取っても、リクエストは1回だけ"""
+    config, client = stub
+    coalesced = CoalescedStats(client, PATH, QUERIES, PARAMS)
+    results = {}
+
+    def fetch(query):
+        results[query] = coalesced.get(*query)
+
+    threads = [threading.Thread(target=fetch, args=(query,)) for query in QUERIES * 3]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert config.request_count == 1
+
+    # 単独で取得した場合と同じ応答になる
+    for stats_type, group in QUERIES:
+        alone = client.get_json(PATH, params=dict(PARAMS, stats=stats_type, group=group))
+        assert results[(stats_type, group)] == alone
+
+
+def test_unrequested_combination_is_empty(stub):
+    """まとめた取得の応答に含まれても、指定していない組み合わせは返さない"""
+    config, client = stub
+    coalesced = CoalescedStats(client, PATH, QUERIES, PARAMS)
+    assert coalesced.get('gameLog', 'pitching') == {'stats': []}
+    assert config.request_count == 1
+
+
+def test_failed_fetch_is_retried_on_next_get(stub):
+    """取得に失敗した場合は結果を残さず、次のget()でもう一度まとめて取得する"""
+    config, client = stub
+    config.error_rate, config.error_status = 1.0, 400
+    coalesced = CoalescedStats(client, PATH, QUERIES, PARAMS)
+    with pytest.raises(requests.RequestException):
+        coalesced.get('season', 'hitting')
+
+    config.error_rate = 0.0
+    assert coalesced.get('season', 'hitting')['stats']
+    assert coalesced.get('season', 'pitching')['stats']
+    assert config.request_count == 2